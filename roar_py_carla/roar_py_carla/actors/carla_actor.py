@@ -4,6 +4,7 @@ from roar_py_interface.sensors import *
 from roar_py_interface.base import RoarPySensor
 from roar_py_interface.wrappers import roar_py_thread_sync, roar_py_append_item, roar_py_remove_item
 from roar_py_interface.worlds.occupancy_map import RoarPyOccupancyMapProducer
+from roar_py_interface.worlds.bev import RoarPyBEVProducer
 import typing
 import gymnasium as gym
 import carla
@@ -240,18 +241,56 @@ class RoarPyCarlaActor(RoarPyActor, RoarPyCarlaBase):
         width_in_world : float,
         height_in_world : float,
         name: str = "carla_occupancy_map_sensor",
+        batched: bool = False,
+        incremental_max_error_pixels: typing.Optional[float] = None
     ):
         world = self._get_carla_world()
-        new_sensor = RoarPyCarlaOccupancyMapSensor(
-            RoarPyOccupancyMapProducer(
-                world.maneuverable_waypoints,
-                width,
-                height,
-                width_in_world,
-                height_in_world,
+        if batched:
+            # Share one render per tick with the occupancy map sensors of other actors
+            batch = world.get_occupancy_map_batch(width, height, width_in_world, height_in_world)
+            new_sensor = RoarPyCarlaOccupancyMapSensor(batch.producer, self, name, batch=batch)
+        else:
+            new_sensor = RoarPyCarlaOccupancyMapSensor(
+                RoarPyOccupancyMapProducer(
+                    world.maneuverable_waypoints,
+                    width,
+                    height,
+                    width_in_world,
+                    height_in_world,
+                ),
+                self,
+                name,
+                # Shift the last map instead of redrawing it while the vehicle pose stays close
+                incremental_max_error_pixels=incremental_max_error_pixels
+            )
+        self._internal_sensors.append(new_sensor)
+        return new_sensor
+
+    @roar_py_append_item
+    @roar_py_thread_sync
+    def attach_bev_sensor(
+        self,
+        width : int,
+        height : int,
+        width_in_world : float,
+        height_in_world : float,
+        name: str = "carla_bev_sensor",
+    ):
+        world = self._get_carla_world()
+        new_sensor = RoarPyCarlaBEVSensor(
+            RoarPyBEVProducer(
+                RoarPyOccupancyMapProducer(
+                    world.maneuverable_waypoints,
+                    width,
+                    height,
+                    width_in_world,
+                    height_in_world,
+                )
             ),
             self,
-            name
+            # Trace the route up to the farthest corner of the image
+            route_distance=float(np.hypot(width_in_world, height_in_world) / 2),
+            name=name
         )
         self._internal_sensors.append(new_sensor)
         return new_sensor
@@ -0,0 +1,467 @@
+"""
+This module provides a compact, array based representation of the GlobalRoutePlanner graph
+together with numba shortest path kernels over it.
+"""
+
+import math
+import numba
+import numpy as np
+import networkx as nx
+from functools import cached_property
+from typing import Optional
+
+@numba.jit(nopython=True, nogil=True)
+def _heap_sift_up(heap, heap_priorities, position):
+    # Entries are ordered by (priority, entry index), the entry index doubles as the insertion counter
+    entry = heap[position]
+    while position > 0:
+        parent_position = (position - 1) >> 1
+        parent_entry = heap[parent_position]
+        if heap_priorities[entry] < heap_priorities[parent_entry] or (heap_priorities[entry] == heap_priorities[parent_entry] and entry < parent_entry):
+            heap[position] = parent_entry
+            position = parent_position
+        else:
+            break
+    heap[position] = entry
+
+@numba.jit(nopython=True, nogil=True)
+def _heap_sift_down(heap, heap_priorities, heap_size):
+    entry = heap[0]
+    position = 0
+    while True:
+        child_position = 2 * position + 1
+        if child_position >= heap_size:
+            break
+        child_entry = heap[child_position]
+        if child_position + 1 < heap_size:
+            right_entry = heap[child_position + 1]
+            if heap_priorities[right_entry] < heap_priorities[child_entry] or (heap_priorities[right_entry] == heap_priorities[child_entry] and right_entry < child_entry):
+                child_position += 1
+                child_entry = right_entry
+        if heap_priorities[child_entry] < heap_priorities[entry] or (heap_priorities[child_entry] == heap_priorities[entry] and child_entry < entry):
+            heap[position] = child_entry
+            position = child_position
+        else:
+            break
+    heap[position] = entry
+
+@numba.jit(nopython=True, nogil=True)
+def _grow(array, capacity):
+    grown = np.empty(capacity, dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+@numba.jit(nopython=True, nogil=True)
+def _astar_path(
+    indptr : np.ndarray,
+    indices : np.ndarray,
+    weights : np.ndarray,
+    node_xyz : np.ndarray,
+    source : int,
+    target : int
+) -> np.ndarray:
+    # Mirrors networkx.astar_path (including its tie breaking) with an euclidean distance heuristic
+    num_nodes = len(indptr) - 1
+    capacity = max(16, len(indices) + 1)
+    entry_priorities = np.empty(capacity)
+    entry_nodes = np.empty(capacity, dtype=np.int64)
+    entry_costs = np.empty(capacity)
+    entry_parents = np.empty(capacity, dtype=np.int64)
+    heap = np.empty(capacity, dtype=np.int64)
+
+    enqueued = np.zeros(num_nodes, dtype=np.bool_)
+    enqueued_costs = np.empty(num_nodes)
+    enqueued_heuristics = np.empty(num_nodes)
+    explored_parents = np.full(num_nodes, -2, dtype=np.int64) # -2: not explored, -1: explored source
+
+    entry_priorities[0], entry_nodes[0], entry_costs[0], entry_parents[0] = 0.0, source, 0.0, -1
+    heap[0] = 0
+    heap_size = 1
+    num_entries = 1
+
+    while heap_size > 0:
+        entry = heap[0]
+        heap_size -= 1
+        if heap_size > 0:
+            heap[0] = heap[heap_size]
+            _heap_sift_down(heap, entry_priorities, heap_size)
+        current_node, current_cost, parent = entry_nodes[entry], entry_costs[entry], entry_parents[entry]
+
+        if current_node == target:
+            path = [current_node]
+            node = parent
+            while node != -1:
+                path.append(node)
+                node = explored_parents[node]
+            return np.array(path[::-1], dtype=np.int64)
+
+        if explored_parents[current_node] != -2:
+            if explored_parents[current_node] == -1:
+                continue
+            if enqueued_costs[current_node] < current_cost:
+                continue
+        explored_parents[current_node] = parent
+
+        for k in range(indptr[current_node], indptr[current_node + 1]):
+            neighbor = indices[k]
+            neighbor_cost = current_cost + weights[k]
+            if enqueued[neighbor]:
+                if enqueued_costs[neighbor] <= neighbor_cost:
+                    continue
+                heuristic = enqueued_heuristics[neighbor]
+            else:
+                dx = node_xyz[neighbor, 0] - node_xyz[target, 0]
+                dy = node_xyz[neighbor, 1] - node_xyz[target, 1]
+                dz = node_xyz[neighbor, 2] - node_xyz[target, 2]
+                heuristic = math.sqrt(dx * dx + dy * dy + dz * dz)
+            enqueued[neighbor] = True
+            enqueued_costs[neighbor] = neighbor_cost
+            enqueued_heuristics[neighbor] = heuristic
+
+            if num_entries == len(entry_nodes):
+                capacity = 2 * len(entry_nodes)
+                entry_priorities = _grow(entry_priorities, capacity)
+                entry_nodes = _grow(entry_nodes, capacity)
+                entry_costs = _grow(entry_costs, capacity)
+                entry_parents = _grow(entry_parents, capacity)
+                heap = _grow(heap, capacity)
+            entry_priorities[num_entries] = neighbor_cost + heuristic
+            entry_nodes[num_entries] = neighbor
+            entry_costs[num_entries] = neighbor_cost
+            entry_parents[num_entries] = current_node
+            heap[heap_size] = num_entries
+            _heap_sift_up(heap, entry_priorities, heap_size)
+            heap_size += 1
+            num_entries += 1
+
+    return np.empty(0, dtype=np.int64)
+
+@numba.jit(nopython=True, nogil=True)
+def _dijkstra(
+    indptr : np.ndarray,
+    indices : np.ndarray,
+    weights : np.ndarray,
+    source : int
+):
+    # Single source shortest path, returns the distance to (inf if unreachable) and the parent of (-1 for none) every node
+    num_nodes = len(indptr) - 1
+    distances = np.full(num_nodes, np.inf)
+    parents = np.full(num_nodes, -1, dtype=np.int64)
+    settled = np.zeros(num_nodes, dtype=np.bool_)
+
+    capacity = max(16, len(indices) + 1)
+    entry_priorities = np.empty(capacity)
+    entry_nodes = np.empty(capacity, dtype=np.int64)
+    heap = np.empty(capacity, dtype=np.int64)
+
+    distances[source] = 0.0
+    entry_priorities[0], entry_nodes[0] = 0.0, source
+    heap[0] = 0
+    heap_size = 1
+    num_entries = 1
+
+    while heap_size > 0:
+        entry = heap[0]
+        heap_size -= 1
+        if heap_size > 0:
+            heap[0] = heap[heap_size]
+            _heap_sift_down(heap, entry_priorities, heap_size)
+        current_node = entry_nodes[entry]
+        if settled[current_node]:
+            continue
+        settled[current_node] = True
+
+        for k in range(indptr[current_node], indptr[current_node + 1]):
+            neighbor = indices[k]
+            neighbor_distance = distances[current_node] + weights[k]
+            if settled[neighbor] or neighbor_distance >= distances[neighbor]:
+                continue
+            distances[neighbor] = neighbor_distance
+            parents[neighbor] = current_node
+
+            if num_entries == len(entry_nodes):
+                capacity = 2 * len(entry_nodes)
+                entry_priorities = _grow(entry_priorities, capacity)
+                entry_nodes = _grow(entry_nodes, capacity)
+                heap = _grow(heap, capacity)
+            entry_priorities[num_entries] = neighbor_distance
+            entry_nodes[num_entries] = neighbor
+            heap[heap_size] = num_entries
+            _heap_sift_up(heap, entry_priorities, heap_size)
+            heap_size += 1
+            num_entries += 1
+
+    return distances, parents
+
+class CompactRouteGraph(object):
+    """
+    Flat array (CSR adjacency) representation of the GlobalRoutePlanner graph.
+    Nodes are addressed by their compact index 0..N-1, node_ids maps them back to the ids used in the networkx graph.
+    Edges are sorted by source node while keeping the successor order of the networkx graph.
+
+    - node_ids (N,): id of the node in the networkx graph
+    - node_xyz (N, 3): (x,y,z) vertex of the node (CARLA coordinates)
+    - indptr (N+1,), indices (E,): CSR adjacency, the successors of node i are indices[indptr[i]:indptr[i+1]]
+    - edge_lengths (E,): 'length' of every edge (number of waypoints, 0 for lane changes)
+    - edge_distances (E,): length in meters of the waypoint polyline of every edge (the lateral hop for lane changes), derived on first use
+    - edge_types (E,): RoadOption value of every edge
+    - edge_intersection (E,): whether the edge is part of a junction
+    - edge_exit_vectors (E, 3), edge_net_vectors (E, 3): 'exit_vector' and 'net_vector' of every edge, nan where the edge has none
+    - edge_waypoint_indptr (E+1,), edge_waypoint_xyz (W, 3): locations of the entry waypoint, path waypoints and exit waypoint of every edge
+    - edge_waypoint_lanes (W, 3), edge_waypoint_s (W,): (road_id, section_id, lane_id) and OpenDRIVE s of those waypoints,
+      enough to get them back from the map with carla.Map.get_waypoint_xodr
+    - road_keys (K, 3), road_edges (K, 2): (road_id, section_id, lane_id) -> (n1, n2) node ids, see GlobalRoutePlanner._road_id_to_edge
+    - topology_fingerprint: hash of the map topology the graph was built from, see GlobalRoutePlanner._topology_fingerprint
+    """
+    FORMAT_VERSION = 2
+
+    def __init__(
+        self,
+        sampling_resolution : float,
+        node_ids : np.ndarray,
+        node_xyz : np.ndarray,
+        indptr : np.ndarray,
+        indices : np.ndarray,
+        edge_lengths : np.ndarray,
+        edge_types : np.ndarray,
+        edge_intersection : np.ndarray,
+        edge_exit_vectors : np.ndarray,
+        edge_net_vectors : np.ndarray,
+        edge_waypoint_indptr : np.ndarray,
+        edge_waypoint_xyz : np.ndarray,
+        edge_waypoint_lanes : np.ndarray,
+        edge_waypoint_s : np.ndarray,
+        road_keys : np.ndarray,
+        road_edges : np.ndarray,
+        topology_fingerprint : str = ""
+    ):
+        self.sampling_resolution = float(sampling_resolution)
+        self.node_ids = np.asarray(node_ids, dtype=np.int64)
+        self.node_xyz = np.asarray(node_xyz, dtype=np.float64).reshape(-1, 3)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.edge_lengths = np.asarray(edge_lengths, dtype=np.float64)
+        self.edge_types = np.asarray(edge_types, dtype=np.int64)
+        self.edge_intersection = np.asarray(edge_intersection, dtype=bool)
+        self.edge_exit_vectors = np.asarray(edge_exit_vectors, dtype=np.float64).reshape(-1, 3)
+        self.edge_net_vectors = np.asarray(edge_net_vectors, dtype=np.float64).reshape(-1, 3)
+        self.edge_waypoint_indptr = np.asarray(edge_waypoint_indptr, dtype=np.int64)
+        self.edge_waypoint_xyz = np.asarray(edge_waypoint_xyz, dtype=np.float32).reshape(-1, 3)
+        self.edge_waypoint_lanes = np.asarray(edge_waypoint_lanes, dtype=np.int64).reshape(-1, 3)
+        self.edge_waypoint_s = np.asarray(edge_waypoint_s, dtype=np.float64)
+        self.road_keys = np.asarray(road_keys, dtype=np.int64).reshape(-1, 3)
+        self.road_edges = np.asarray(road_edges, dtype=np.int64).reshape(-1, 2)
+        self.topology_fingerprint = str(topology_fingerprint)
+
+        self._node_index = {int(node_id): i for i, node_id in enumerate(self.node_ids)}
+        self._road_key_to_edge = {
+            tuple(int(v) for v in road_key): (int(road_edge[0]), int(road_edge[1]))
+            for road_key, road_edge in zip(self.road_keys, self.road_edges)
+        }
+        edge_sources = np.repeat(self.node_ids, np.diff(self.indptr))
+        self._edge_index = {
+            (int(n1), int(n2)): k
+            for k, (n1, n2) in enumerate(zip(edge_sources, self.node_ids[self.indices]))
+        }
+
+    @staticmethod
+    def from_networkx(graph : nx.DiGraph, road_id_to_edge : dict, sampling_resolution : float, topology_fingerprint : str = "") -> "CompactRouteGraph":
+        node_ids = list(graph.nodes)
+        node_index = {node_id: i for i, node_id in enumerate(node_ids)}
+        node_xyz = [graph.nodes[node_id]['vertex'] for node_id in node_ids]
+
+        indptr = [0]
+        indices, edge_lengths, edge_types, edge_intersection = [], [], [], []
+        edge_exit_vectors, edge_net_vectors = [], []
+        edge_waypoint_indptr, edge_waypoint_xyz, edge_waypoint_lanes, edge_waypoint_s = [0], [], [], []
+        for node_id in node_ids:
+            for neighbor, edge in graph.adj[node_id].items():
+                indices.append(node_index[neighbor])
+                edge_lengths.append(edge['length'])
+                edge_types.append(edge['type'].value)
+                edge_intersection.append(bool(edge['intersection']))
+                # Lane change and loose end edges have no (or None) exit / net vectors
+                for vectors, key in ((edge_exit_vectors, 'exit_vector'), (edge_net_vectors, 'net_vector')):
+                    vector = edge.get(key)
+                    vectors.append(np.full(3, np.nan) if vector is None else vector)
+                for waypoint in [edge['entry_waypoint']] + edge['path'] + [edge['exit_waypoint']]:
+                    location = waypoint.transform.location
+                    edge_waypoint_xyz.append((location.x, location.y, location.z))
+                    edge_waypoint_lanes.append((waypoint.road_id, waypoint.section_id, waypoint.lane_id))
+                    edge_waypoint_s.append(waypoint.s)
+                edge_waypoint_indptr.append(len(edge_waypoint_xyz))
+            indptr.append(len(indices))
+
+        road_keys, road_edges = [], []
+        for road_id, sections in road_id_to_edge.items():
+            for section_id, lanes in sections.items():
+                for lane_id, road_edge in lanes.items():
+                    road_keys.append((road_id, section_id, lane_id))
+                    road_edges.append(road_edge)
+
+        return CompactRouteGraph(
+            sampling_resolution,
+            node_ids,
+            node_xyz,
+            indptr,
+            indices,
+            edge_lengths,
+            edge_types,
+            edge_intersection,
+            edge_exit_vectors,
+            edge_net_vectors,
+            edge_waypoint_indptr,
+            edge_waypoint_xyz,
+            edge_waypoint_lanes,
+            edge_waypoint_s,
+            road_keys,
+            road_edges,
+            topology_fingerprint
+        )
+
+    @staticmethod
+    def load(file_path : str) -> "CompactRouteGraph":
+        with np.load(file_path) as data:
+            if int(data['format_version']) != CompactRouteGraph.FORMAT_VERSION:
+                raise ValueError("Unsupported compact route graph format version {}".format(int(data['format_version'])))
+            return CompactRouteGraph(
+                float(data['sampling_resolution']),
+                data['node_ids'],
+                data['node_xyz'],
+                data['indptr'],
+                data['indices'],
+                data['edge_lengths'],
+                data['edge_types'],
+                data['edge_intersection'],
+                data['edge_exit_vectors'],
+                data['edge_net_vectors'],
+                data['edge_waypoint_indptr'],
+                data['edge_waypoint_xyz'],
+                data['edge_waypoint_lanes'],
+                data['edge_waypoint_s'],
+                data['road_keys'],
+                data['road_edges'],
+                str(data['topology_fingerprint'])
+            )
+
+    def save(self, file_path : str) -> None:
+        np.savez_compressed(
+            file_path,
+            format_version=CompactRouteGraph.FORMAT_VERSION,
+            sampling_resolution=self.sampling_resolution,
+            node_ids=self.node_ids,
+            node_xyz=self.node_xyz,
+            indptr=self.indptr,
+            indices=self.indices,
+            edge_lengths=self.edge_lengths,
+            edge_types=self.edge_types,
+            edge_intersection=self.edge_intersection,
+            edge_exit_vectors=self.edge_exit_vectors,
+            edge_net_vectors=self.edge_net_vectors,
+            edge_waypoint_indptr=self.edge_waypoint_indptr,
+            edge_waypoint_xyz=self.edge_waypoint_xyz,
+            edge_waypoint_lanes=self.edge_waypoint_lanes,
+            edge_waypoint_s=self.edge_waypoint_s,
+            road_keys=self.road_keys,
+            road_edges=self.road_edges,
+            topology_fingerprint=np.array(self.topology_fingerprint)
+        )
+
+    @cached_property
+    def edge_distances(self) -> np.ndarray:
+        segment_lengths = np.linalg.norm(np.diff(self.edge_waypoint_xyz.astype(np.float64), axis=0), axis=1)
+        cumulative_lengths = np.concatenate([[0.0], np.cumsum(segment_lengths)])
+        # Every edge holds at least its entry and exit waypoint, the segments between two edges are skipped
+        return cumulative_lengths[self.edge_waypoint_indptr[1:] - 1] - cumulative_lengths[self.edge_waypoint_indptr[:-1]]
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.indices)
+
+    def road_edge(self, road_id : int, section_id : int, lane_id : int):
+        """
+        Returns the (n1, n2) node ids of the edge of a lane, raises KeyError if the lane is not in the graph
+        """
+        return self._road_key_to_edge[(road_id, section_id, lane_id)]
+
+    def node_index(self, node_id : int) -> int:
+        return self._node_index[node_id]
+
+    def has_edge(self, n1 : int, n2 : int) -> bool:
+        return (n1, n2) in self._edge_index
+
+    def edge_index(self, n1 : int, n2 : int) -> int:
+        return self._edge_index[(n1, n2)]
+
+    def successors(self, node_id : int):
+        """
+        Returns the (neighbor node id, edge index) of every out edge of a node id, in the successor order of the networkx graph
+        """
+        i = self._node_index[node_id]
+        return [(int(self.node_ids[self.indices[k]]), k) for k in range(self.indptr[i], self.indptr[i+1])]
+
+    def edge_waypoint_range(self, n1 : int, n2 : int):
+        """
+        Returns the [start, end) range of the waypoints of an edge in the edge_waypoint_* arrays
+        """
+        k = self._edge_index[(n1, n2)]
+        return int(self.edge_waypoint_indptr[k]), int(self.edge_waypoint_indptr[k+1])
+
+    def edge_waypoint_locations(self, n1 : int, n2 : int) -> np.ndarray:
+        """
+        Returns the (W, 3) locations of [entry_waypoint] + path + [exit_waypoint] of an edge
+        """
+        k = self._edge_index[(n1, n2)]
+        return self.edge_waypoint_xyz[self.edge_waypoint_indptr[k]:self.edge_waypoint_indptr[k+1]]
+
+    def edge_offset(self, n1 : int, n2 : int, location : np.ndarray) -> float:
+        """
+        Distance along the waypoint polyline of an edge from its entry waypoint to the point of the polyline closest to a (3,) location
+        """
+        points = self.edge_waypoint_locations(n1, n2).astype(np.float64)
+        location = np.asarray(location, dtype=np.float64)
+        deltas = np.diff(points, axis=0)
+        segment_lengths = np.linalg.norm(deltas, axis=1)
+        along = np.sum((location - points[:-1]) * deltas, axis=1) / np.maximum(segment_lengths * segment_lengths, 1e-12)
+        along = np.clip(along, 0.0, 1.0)
+        k = int(np.argmin(np.linalg.norm(points[:-1] + along[:, np.newaxis] * deltas - location, axis=1)))
+        return float(np.sum(segment_lengths[:k]) + along[k] * segment_lengths[k])
+
+    def astar_path(self, source : int, target : int):
+        """
+        Shortest path between two node ids with A* and an euclidean distance heuristic,
+        returns the list of node ids, same as networkx.astar_path(graph, source, target, heuristic, weight='length')
+        """
+        if source not in self._node_index:
+            raise nx.NodeNotFound("Source {} is not in G".format(source))
+        if target not in self._node_index:
+            raise nx.NodeNotFound("Target {} is not in G".format(target))
+        path = _astar_path(self.indptr, self.indices, self.edge_lengths, self.node_xyz, self._node_index[source], self._node_index[target])
+        if len(path) == 0:
+            raise nx.NetworkXNoPath("Node {} not reachable from {}".format(target, source))
+        return self.node_ids[path].tolist()
+
+    def shortest_path_tree(self, source : int, weights : Optional[np.ndarray] = None):
+        """
+        Dijkstra from a node id over the (E,) edge weights (edge_lengths if not given),
+        returns the (N,) distances (inf if unreachable) and (N,) parent compact indices (-1 for none)
+        """
+        if source not in self._node_index:
+            raise nx.NodeNotFound("Source {} is not in G".format(source))
+        return _dijkstra(self.indptr, self.indices, self.edge_lengths if weights is None else weights, self._node_index[source])
+
+    def tree_path(self, parents : np.ndarray, target : int):
+        """
+        Reconstructs the list of node ids from the root of a shortest_path_tree to the target node id,
+        the target has to be reachable (finite distance) from the root
+        """
+        node = self._node_index[target]
+        path = [node]
+        while parents[node] != -1:
+            node = parents[node]
+            path.append(node)
+        return self.node_ids[path[::-1]].tolist()
@@ -9,11 +9,16 @@ This module provides GlobalRoutePlanner implementation.
 """
 
 import math
+import os
+import collections
+import hashlib
+import threading
 import numpy as np
 import networkx as nx
 
 import carla
 from ..tools.misc import vector
+from .compact_route_graph import CompactRouteGraph
 from enum import Enum
 
 class RoadOption(Enum):
@@ -34,7 +39,14 @@ class GlobalRoutePlanner(object):
     This class provides a very high level route plan.
     """
 
-    def __init__(self, wmap, sampling_resolution):
+    def __init__(self, wmap, sampling_resolution, cache_file=None, route_cache_size=1024):
+        """
+        cache_file (optional): .npz file of the CompactRouteGraph of this map, it is loaded if it exists and was built from the
+        same topology (see _topology_fingerprint), and written otherwise.
+        Routes are traced on the compact graph alone, so on a cache hit the networkx graph (and the carla.Waypoint lists it holds)
+        is never built.
+        route_cache_size: number of recent (origin edge, destination edge) routes kept in an LRU cache, 0 disables it
+        """
         self._sampling_resolution = sampling_resolution
         self._wmap = wmap
         self._topology = None
@@ -42,20 +54,70 @@ class GlobalRoutePlanner(object):
         self._id_map = None
         self._road_id_to_edge = None
 
-        self._intersection_end_node = -1
-        self._previous_decision = RoadOption.VOID
+        # Turn decision state of the route being traced, thread local so that
+        # several routes can be traced concurrently over the same (read-only) graph
+        self._turn_decision_state = threading.local()
+
+        self._graph_lock = threading.Lock()
+        # Per instance LRU of node routes between localized edges, so that repeated replans skip the search
+        self._route_cache_size = route_cache_size
+        self._route_cache = collections.OrderedDict()
+        self._route_cache_lock = threading.Lock()
+        self._compact_graph = None
+        topology_fingerprint = self._topology_fingerprint(wmap)
+        if cache_file is not None and os.path.exists(cache_file):
+            try:
+                compact_graph = CompactRouteGraph.load(cache_file)
+                if compact_graph.sampling_resolution == float(sampling_resolution) \
+                        and compact_graph.topology_fingerprint == topology_fingerprint:
+                    self._compact_graph = compact_graph
+            except (OSError, ValueError, KeyError):
+                pass
 
-        # Build the graph
-        self._build_topology()
-        self._build_graph()
-        self._find_loose_ends()
-        self._lane_change_link()
+        if self._compact_graph is None:
+            self._ensure_graph()
+            self._compact_graph = CompactRouteGraph.from_networkx(self._graph, self._road_id_to_edge, sampling_resolution, topology_fingerprint)
+            if cache_file is not None:
+                try:
+                    os.makedirs(os.path.dirname(os.path.abspath(cache_file)), exist_ok=True)
+                    self._compact_graph.save(cache_file)
+                except OSError:
+                    pass
+
+    @staticmethod
+    def _topology_fingerprint(wmap):
+        """
+        Hash of the lanes and (rounded) end points of every segment of the map topology
+        """
+        digest = hashlib.sha256()
+        for segment in wmap.get_topology():
+            for waypoint in segment[:2]:
+                location = waypoint.transform.location
+                digest.update(np.array([waypoint.road_id, waypoint.section_id, waypoint.lane_id], dtype=np.int64).tobytes())
+                # + 0.0 folds -0.0 into 0.0
+                digest.update((np.round([location.x, location.y, location.z], 0) + 0.0).astype(np.float64).tobytes())
+        return digest.hexdigest()
+
+    def _ensure_graph(self):
+        """
+        Builds the networkx graph (topology, loose ends and lane change links) if it has not been built yet
+        """
+        with self._graph_lock:
+            if self._graph is not None:
+                return
+            self._build_topology()
+            self._build_graph()
+            self._find_loose_ends()
+            self._lane_change_link()
 
     def trace_route(self, origin, destination):
         """
         This method returns list of (carla.Waypoint, RoadOption)
         from origin to destination
         """
+        self._intersection_end_node = -1
+        self._previous_decision = RoadOption.VOID
+
         route_trace = []
         route = self._path_search(origin, destination)
         current_waypoint = self._wmap.get_waypoint(origin)
@@ -63,37 +125,69 @@ class GlobalRoutePlanner(object):
 
         for i in range(len(route) - 1):
             road_option = self._turn_decision(i, route)
-            edge = self._graph.edges[route[i], route[i+1]]
-            path = []
+            edge = self._compact_graph.edge_index(route[i], route[i+1])
+            # Waypoints of an edge: [entry_waypoint] + path + [exit_waypoint] in the edge_waypoint_* arrays
+            edge_start, edge_end = self._compact_graph.edge_waypoint_range(route[i], route[i+1])
 
-            if edge['type'] != RoadOption.LANEFOLLOW and edge['type'] != RoadOption.VOID:
+            if self._edge_type(edge) != RoadOption.LANEFOLLOW and self._edge_type(edge) != RoadOption.VOID:
                 route_trace.append((current_waypoint, road_option))
-                exit_wp = edge['exit_waypoint']
-                n1, n2 = self._road_id_to_edge[exit_wp.road_id][exit_wp.section_id][exit_wp.lane_id]
-                next_edge = self._graph.edges[n1, n2]
-                if next_edge['path']:
-                    closest_index = self._find_closest_in_list(current_waypoint, next_edge['path'])
-                    closest_index = min(len(next_edge['path'])-1, closest_index+5)
-                    current_waypoint = next_edge['path'][closest_index]
+                road_id, section_id, lane_id = self._compact_graph.edge_waypoint_lanes[edge_end - 1]
+                n1, n2 = self._compact_graph.road_edge(int(road_id), int(section_id), int(lane_id))
+                next_start, next_end = self._compact_graph.edge_waypoint_range(n1, n2)
+                if next_end - next_start > 2:
+                    closest_index = self._find_closest_in_locations(current_waypoint, self._compact_graph.edge_waypoint_xyz[next_start+1:next_end-1])
+                    closest_index = min(next_end - next_start - 3, closest_index+5)
+                    current_waypoint = self._edge_waypoint(next_start + 1 + closest_index)
                 else:
-                    current_waypoint = next_edge['exit_waypoint']
+                    current_waypoint = self._edge_waypoint(next_end - 1)
                 route_trace.append((current_waypoint, road_option))
 
             else:
-                path = path + [edge['entry_waypoint']] + edge['path'] + [edge['exit_waypoint']]
-                closest_index = self._find_closest_in_list(current_waypoint, path)
-                for waypoint in path[closest_index:]:
+                path_locations = self._compact_graph.edge_waypoint_xyz[edge_start:edge_end]
+                closest_index = self._find_closest_in_locations(current_waypoint, path_locations)
+                for waypoint_index in range(edge_start + closest_index, edge_end):
+                    waypoint = self._edge_waypoint(waypoint_index)
                     current_waypoint = waypoint
                     route_trace.append((current_waypoint, road_option))
                     if len(route)-i <= 2 and waypoint.transform.location.distance(destination) < 2*self._sampling_resolution:
                         break
                     elif len(route)-i <= 2 and current_waypoint.road_id == destination_waypoint.road_id and current_waypoint.section_id == destination_waypoint.section_id and current_waypoint.lane_id == destination_waypoint.lane_id:
-                        destination_index = self._find_closest_in_list(destination_waypoint, path)
+                        destination_index = self._find_closest_in_locations(destination_waypoint, path_locations)
                         if closest_index > destination_index:
                             break
 
         return route_trace
 
+    def _edge_type(self, edge):
+        return RoadOption(int(self._compact_graph.edge_types[edge]))
+
+    def _edge_waypoint(self, waypoint_index):
+        """
+        Gets the carla.Waypoint at an index of the edge_waypoint_* arrays of the compact graph back from the map
+        """
+        road_id, _, lane_id = self._compact_graph.edge_waypoint_lanes[waypoint_index]
+        waypoint = self._wmap.get_waypoint_xodr(int(road_id), int(lane_id), float(self._compact_graph.edge_waypoint_s[waypoint_index]))
+        if waypoint is None:
+            x, y, z = self._compact_graph.edge_waypoint_xyz[waypoint_index]
+            waypoint = self._wmap.get_waypoint(carla.Location(x=float(x), y=float(y), z=float(z)))
+        return waypoint
+
+    @property
+    def _intersection_end_node(self):
+        return getattr(self._turn_decision_state, "intersection_end_node", -1)
+
+    @_intersection_end_node.setter
+    def _intersection_end_node(self, value):
+        self._turn_decision_state.intersection_end_node = value
+
+    @property
+    def _previous_decision(self):
+        return getattr(self._turn_decision_state, "previous_decision", RoadOption.VOID)
+
+    @_previous_decision.setter
+    def _previous_decision(self, value):
+        self._turn_decision_state.previous_decision = value
+
     def _build_topology(self):
         """
         This function retrieves topology from the server as a list of
@@ -277,7 +371,10 @@ class GlobalRoutePlanner(object):
         waypoint = self._wmap.get_waypoint(location)
         edge = None
         try:
-            edge = self._road_id_to_edge[waypoint.road_id][waypoint.section_id][waypoint.lane_id]
+            if self._compact_graph is not None:
+                edge = self._compact_graph.road_edge(waypoint.road_id, waypoint.section_id, waypoint.lane_id)
+            else:
+                edge = self._road_id_to_edge[waypoint.road_id][waypoint.section_id][waypoint.lane_id]
         except KeyError:
             pass
         return edge
@@ -287,6 +384,7 @@ class GlobalRoutePlanner(object):
         Distance heuristic calculator for path searching
         in self._graph
         """
+        self._ensure_graph()
         l1 = np.array(self._graph.nodes[n1]['vertex'])
         l2 = np.array(self._graph.nodes[n2]['vertex'])
         return np.linalg.norm(l1-l2)
@@ -301,13 +399,123 @@ class GlobalRoutePlanner(object):
         connecting origin and destination
         """
         start, end = self._localize(origin), self._localize(destination)
+        return list(self._edge_route(start, end))
 
-        route = nx.astar_path(
-            self._graph, source=start[0], target=end[0],
-            heuristic=self._distance_heuristic, weight='length')
-        route.append(end[1])
+    def _edge_route(self, start, end):
+        """
+        Node route between two localized edges, served from the LRU route cache when possible
+        """
+        key = (start, end)
+        if self._route_cache_size > 0:
+            with self._route_cache_lock:
+                route = self._route_cache.get(key)
+                if route is not None:
+                    self._route_cache.move_to_end(key)
+                    return route
+        route = self._search_edge_route(start, end)
+        if self._route_cache_size > 0:
+            with self._route_cache_lock:
+                self._route_cache[key] = route
+                self._route_cache.move_to_end(key)
+                while len(self._route_cache) > self._route_cache_size:
+                    self._route_cache.popitem(last=False)
         return route
 
+    def _search_edge_route(self, start, end):
+        route = self._compact_graph.astar_path(start[0], end[0])
+        route.append(end[1])
+        return tuple(route)
+
+    def route_distance_matrix(self, origins, destinations, return_paths=False):
+        """
+        This method computes the road distance between every origin and every destination
+        with one single source shortest path search per distinct origin edge.
+        origins         :   list of carla.Location
+        destinations    :   list of carla.Location
+        return_paths    :   also reconstruct the routes
+        return          :   (len(origins), len(destinations)) array of distances in meters (np.inf if there is no route
+        or a location is off the road network), and if return_paths is set, a nested list with the route of every pair
+        as node ids (same format as _path_search, None if there is no route)
+
+        Distances are measured from the origin to the destination along the waypoint polylines of the route edges
+        (CompactRouteGraph.edge_distances), so lane changes count their lateral hop instead of nothing.
+        A location lies at an offset along its localized edge (CompactRouteGraph.edge_offset), the route leaves the origin
+        edge through its end node, or through a lane change at its start node keeping the offset along the new lane.
+        A destination behind the origin on the same edge is reached by driving around.
+        The routes minimize that distance, they can differ from the routes of trace_route (where lane changes are free)
+        when a lane change makes the difference.
+        """
+        origin_edges = [self._localize(origin) for origin in origins]
+        destination_edges = [self._localize(destination) for destination in destinations]
+        destination_indices = np.array([
+            self._compact_graph.node_index(edge[0]) if edge is not None else -1 for edge in destination_edges
+        ], dtype=np.int64)
+        valid_destinations = destination_indices >= 0
+        destination_offsets = np.array([
+            self._edge_offset(edge, destination) if edge is not None else 0.0
+            for edge, destination in zip(destination_edges, destinations)
+        ], dtype=np.float64)
+
+        distances = np.full((len(origin_edges), len(destination_edges)), np.inf)
+        paths = [[None] * len(destination_edges) for _ in origin_edges] if return_paths else None
+        origin_trees = {}
+        end_node_trees = {}
+        for i, (origin, origin_edge) in enumerate(zip(origins, origin_edges)):
+            if origin_edge is None:
+                continue
+            origin_offset = self._edge_offset(origin_edge, origin)
+            if origin_edge not in origin_trees:
+                origin_trees[origin_edge] = self._compact_graph.shortest_path_tree(origin_edge[0], self._origin_edge_distances(origin_edge))
+            tree_distances, tree_parents = origin_trees[origin_edge]
+            row = np.full(len(destination_edges), np.inf)
+            row[valid_destinations] = tree_distances[destination_indices[valid_destinations]] - origin_offset + destination_offsets[valid_destinations]
+            row_parents = [tree_parents] * len(destination_edges)
+
+            # Destinations behind the origin (or only reached through its start node again) are reached
+            # by going on to the end node of the origin edge
+            around = valid_destinations & ((row < 0.0) | np.isinf(row))
+            if np.any(around) and self._compact_graph.has_edge(*origin_edge):
+                if origin_edge[1] not in end_node_trees:
+                    end_node_trees[origin_edge[1]] = self._compact_graph.shortest_path_tree(origin_edge[1], self._compact_graph.edge_distances)
+                end_distances, end_parents = end_node_trees[origin_edge[1]]
+                origin_edge_distance = self._compact_graph.edge_distances[self._compact_graph.edge_index(*origin_edge)]
+                row[around] = origin_edge_distance - origin_offset + end_distances[destination_indices[around]] + destination_offsets[around]
+                for j in np.flatnonzero(around):
+                    row_parents[j] = end_parents
+            distances[i] = row
+
+            if return_paths:
+                for j, destination_edge in enumerate(destination_edges):
+                    if not np.isfinite(distances[i, j]):
+                        continue
+                    path = self._compact_graph.tree_path(row_parents[j], destination_edge[0]) + [destination_edge[1]]
+                    paths[i][j] = path if row_parents[j] is tree_parents else [origin_edge[0]] + path
+
+        if return_paths:
+            return distances, paths
+        return distances
+
+    def _edge_offset(self, edge, location):
+        """
+        Distance of a location along the waypoint polyline of its localized edge
+        """
+        try:
+            return self._compact_graph.edge_offset(edge[0], edge[1], np.array([location.x, location.y, location.z]))
+        except KeyError:
+            # Loose ends without any waypoint have no edge, the location counts as at their start node
+            return 0.0
+
+    def _origin_edge_distances(self, origin_edge):
+        """
+        Edge distances for the searches from a location on origin_edge: the other lanes leaving its start node
+        are behind the location, only the origin edge itself and the lane changes stay
+        """
+        weights = self._compact_graph.edge_distances.copy()
+        for neighbor, edge in self._compact_graph.successors(origin_edge[0]):
+            if neighbor != origin_edge[1] and self._edge_type(edge) == RoadOption.LANEFOLLOW:
+                weights[edge] = np.inf
+        return weights
+
     def _successive_last_intersection_edge(self, index, route):
         """
         This method returns the last successive intersection edge
@@ -319,10 +527,10 @@ class GlobalRoutePlanner(object):
         last_intersection_edge = None
         last_node = None
         for node1, node2 in [(route[i], route[i+1]) for i in range(index, len(route)-1)]:
-            candidate_edge = self._graph.edges[node1, node2]
+            candidate_edge = self._compact_graph.edge_index(node1, node2)
             if node1 == route[index]:
                 last_intersection_edge = candidate_edge
-            if candidate_edge['type'] == RoadOption.LANEFOLLOW and candidate_edge['intersection']:
+            if self._edge_type(candidate_edge) == RoadOption.LANEFOLLOW and self._compact_graph.edge_intersection[candidate_edge]:
                 last_intersection_edge = candidate_edge
                 last_node = node2
             else:
@@ -340,33 +548,34 @@ class GlobalRoutePlanner(object):
         previous_node = route[index-1]
         current_node = route[index]
         next_node = route[index+1]
-        next_edge = self._graph.edges[current_node, next_node]
+        next_edge = self._compact_graph.edge_index(current_node, next_node)
+        intersection = self._compact_graph.edge_intersection
         if index > 0:
             if self._previous_decision != RoadOption.VOID \
                     and self._intersection_end_node > 0 \
                     and self._intersection_end_node != previous_node \
-                    and next_edge['type'] == RoadOption.LANEFOLLOW \
-                    and next_edge['intersection']:
+                    and self._edge_type(next_edge) == RoadOption.LANEFOLLOW \
+                    and intersection[next_edge]:
                 decision = self._previous_decision
             else:
                 self._intersection_end_node = -1
-                current_edge = self._graph.edges[previous_node, current_node]
-                calculate_turn = current_edge['type'] == RoadOption.LANEFOLLOW and not current_edge[
-                    'intersection'] and next_edge['type'] == RoadOption.LANEFOLLOW and next_edge['intersection']
+                current_edge = self._compact_graph.edge_index(previous_node, current_node)
+                calculate_turn = self._edge_type(current_edge) == RoadOption.LANEFOLLOW and not intersection[
+                    current_edge] and self._edge_type(next_edge) == RoadOption.LANEFOLLOW and intersection[next_edge]
                 if calculate_turn:
                     last_node, tail_edge = self._successive_last_intersection_edge(index, route)
                     self._intersection_end_node = last_node
                     if tail_edge is not None:
                         next_edge = tail_edge
-                    cv, nv = current_edge['exit_vector'], next_edge['exit_vector']
-                    if cv is None or nv is None:
-                        return next_edge['type']
+                    # A nan exit vector stands for an edge without one
+                    cv, nv = self._compact_graph.edge_exit_vectors[current_edge], self._compact_graph.edge_exit_vectors[next_edge]
+                    if np.isnan(cv).any() or np.isnan(nv).any():
+                        return self._edge_type(next_edge)
                     cross_list = []
-                    for neighbor in self._graph.successors(current_node):
-                        select_edge = self._graph.edges[current_node, neighbor]
-                        if select_edge['type'] == RoadOption.LANEFOLLOW:
+                    for neighbor, select_edge in self._compact_graph.successors(current_node):
+                        if self._edge_type(select_edge) == RoadOption.LANEFOLLOW:
                             if neighbor != route[index+1]:
-                                sv = select_edge['net_vector']
+                                sv = self._compact_graph.edge_net_vectors[select_edge]
                                 cross_list.append(np.cross(cv, sv)[2])
                     next_cross = np.cross(cv, nv)[2]
                     deviation = math.acos(np.clip(
@@ -384,10 +593,10 @@ class GlobalRoutePlanner(object):
                     elif next_cross > 0:
                         decision = RoadOption.RIGHT
                 else:
-                    decision = next_edge['type']
+                    decision = self._edge_type(next_edge)
 
         else:
-            decision = next_edge['type']
+            decision = self._edge_type(next_edge)
 
         self._previous_decision = decision
         return decision
@@ -403,3 +612,11 @@ class GlobalRoutePlanner(object):
                 closest_index = i
 
         return closest_index
+
+    def _find_closest_in_locations(self, current_waypoint, locations):
+        """
+        Vectorized _find_closest_in_list over (W, 3) float32 waypoint locations (see CompactRouteGraph.edge_waypoint_locations)
+        """
+        location = current_waypoint.transform.location
+        deltas = locations - np.array([location.x, location.y, location.z], dtype=np.float32)
+        return int(np.argmin(np.sqrt(np.sum(deltas * deltas, axis=1))))
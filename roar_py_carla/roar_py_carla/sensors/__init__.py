@@ -1,4 +1,5 @@
 from .carla_camera_sensor import RoarPyCarlaCameraSensor
+from .carla_frame_pipeline import RoarPyCarlaFrameConversionPipeline, RoarPyCarlaFrameConversionStats, RoarPyCarlaLatencyCounter
 from .carla_collision_sensor import RoarPyCarlaCollisionSensor
 from .carla_rotation_sensor import RoarPyCarlaRPYSensor
 from .carla_lidar_sensor import RoarPyCarlaLiDARSensor
@@ -7,5 +8,6 @@ from .carla_accelerometer_sensor import RoarPyCarlaAccelerometerSensor
 from .carla_gyroscope_sensor import RoarPyCarlaGyroscopeSensor
 from .carla_location_in_world_sensor import RoarPyCarlaLocationInWorldSensor
 from .carla_velocimeter_sensor import RoarPyCarlaVelocimeterSensor, RoarPyCarlaLocalVelocimeterSensor
-from .carla_occupancy_map_sensor import RoarPyCarlaOccupancyMapSensor
+from .carla_occupancy_map_sensor import RoarPyCarlaOccupancyMapSensor, RoarPyCarlaOccupancyMapBatch
+from .carla_bev_sensor import RoarPyCarlaBEVSensor
 from .carla_radar_sensor import RoarPyCarlaRadarSensor
\ No newline at end of file
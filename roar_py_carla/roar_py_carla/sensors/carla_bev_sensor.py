@@ -0,0 +1,108 @@
+from roar_py_interface.sensors.bev_sensor import RoarPyBEVSensor, RoarPyBEVSensorData
+from roar_py_interface.worlds.bev import RoarPyBEVProducer, box_quads
+from roar_py_interface.worlds.waypoint import RoarPyWaypointsTracker
+from ..utils import transforms_from_carla
+import typing
+import gymnasium as gym
+import numpy as np
+
+class RoarPyCarlaBEVSensor(RoarPyBEVSensor):
+    def __init__(
+        self,
+        producer : RoarPyBEVProducer,
+        actor : "RoarPyCarlaActor",
+        route_distance : float,
+        route_resolution : float = 1.0,
+        name: str = "carla_bev_sensor",
+        route_search_radius : int = RoarPyWaypointsTracker.DEFAULT_SEARCH_RADIUS
+    ):
+        super().__init__(name)
+        self._closed = False
+        self.producer = producer
+        self.actor = actor
+        self.route_distance = route_distance
+        self.route_resolution = route_resolution
+        # The vehicle moves a few waypoints per tick, trace it within a window around the last traced index
+        self.route_tracker = RoarPyWaypointsTracker(producer.occupancy_map_producer.waypoints, search_radius=route_search_radius)
+        self._traced_index : typing.Optional[int] = None
+        self._last_data : typing.Optional[RoarPyBEVSensorData] = None
+        # Ids of the other vehicles and their (N, 4) bounding boxes (center x / y, half extent x / y), only refreshed
+        # when the set of actors in the world snapshot changes (an actor spawned or despawned)
+        self._snapshot_actor_ids : typing.Optional[typing.FrozenSet[int]] = None
+        self._vehicle_ids : typing.List[int] = []
+        self._vehicle_bounding_boxes = np.zeros((0, 4))
+
+    @property
+    def channel_names(self) -> typing.Tuple[str, ...]:
+        return RoarPyBEVProducer.CHANNELS
+
+    def get_gym_observation_spec(self) -> gym.Space:
+        return RoarPyBEVSensorData.gym_observation_space(self.producer.width, self.producer.height, self.producer.num_channels)
+
+    def _refresh_vehicles(self, actor_ids : typing.FrozenSet[int]) -> None:
+        native_vehicles = [
+            vehicle for vehicle in self.actor._get_native_carla_world().get_actors().filter("vehicle.*")
+            if vehicle.id != self.actor.carla_id and vehicle.id in actor_ids
+        ]
+        self._vehicle_ids = [vehicle.id for vehicle in native_vehicles]
+        # Bounding boxes are given in the (carla) frame of their actor
+        self._vehicle_bounding_boxes = np.array([
+            (bb.location.x, -bb.location.y, abs(bb.extent.x), abs(bb.extent.y))
+            for bb in (vehicle.bounding_box for vehicle in native_vehicles)
+        ], dtype=np.float64).reshape(-1, 4)
+        self._snapshot_actor_ids = actor_ids
+
+    def _other_vehicle_quads(self, location_2d : np.ndarray) -> np.ndarray:
+        # The client keeps the snapshot of the last tick, reading the transforms from it costs no RPC per vehicle
+        snapshot = self.actor._get_native_carla_world().get_snapshot()
+        actor_ids = frozenset(actor_snapshot.id for actor_snapshot in snapshot)
+        if actor_ids != self._snapshot_actor_ids:
+            self._refresh_vehicles(actor_ids)
+        if len(self._vehicle_ids) == 0:
+            return np.zeros((0, 4, 2))
+        locations, rotations = transforms_from_carla([snapshot.find(vehicle_id).get_transform() for vehicle_id in self._vehicle_ids])
+        bounding_boxes = self._vehicle_bounding_boxes
+        yaws = rotations[:, 2]
+        cos_y, sin_y = np.cos(yaws), np.sin(yaws)
+        centers = locations[:, :2] + np.stack([
+            cos_y * bounding_boxes[:, 0] - sin_y * bounding_boxes[:, 1],
+            sin_y * bounding_boxes[:, 0] + cos_y * bounding_boxes[:, 1]
+        ], axis=1)
+        # Only build the quads of the boxes that can reach into the image (its circumscribed circle around location_2d)
+        occupancy_map_producer = self.producer.occupancy_map_producer
+        image_radius = np.hypot(occupancy_map_producer.width_world, occupancy_map_producer.height_world) / 2
+        visible = np.linalg.norm(centers - location_2d, axis=1) <= image_radius + np.hypot(bounding_boxes[:, 2], bounding_boxes[:, 3])
+        return box_quads(centers[visible], bounding_boxes[visible, 2:], yaws[visible])
+
+    async def receive_observation(self) -> RoarPyBEVSensorData:
+        location = self.actor.get_3d_location()
+        yaw = self.actor.get_roll_pitch_yaw()[2]
+
+        projection = self.route_tracker.trace_point(location, self._traced_index)
+        self._traced_index = int(projection.waypoint_idx)
+        route = self.route_tracker.get_interpolated_waypoints(self.route_tracker.trace_forward_projections(
+            np.array([projection.waypoint_idx]),
+            np.array([projection.distance_from_waypoint]),
+            np.arange(0.0, self.route_distance + self.route_resolution, self.route_resolution)
+        ))
+
+        bev = self.producer.plot_bev(
+            location[:2].astype(np.float64),
+            yaw,
+            route=route,
+            vehicle_quads=self._other_vehicle_quads(location[:2].astype(np.float64))
+        )
+        self._last_data = RoarPyBEVSensorData(bev, list(self.channel_names))
+        return self._last_data
+
+    def get_last_observation(self) -> typing.Optional[RoarPyBEVSensorData]:
+        return self._last_data
+
+    def convert_obs_to_gym_obs(self, obs: RoarPyBEVSensorData):
+        return obs.convert_obs_to_gym_obs()
+
+    def close(self):
+        self._closed = True
+
+    def is_closed(self) -> bool:
+        return self._closed
@@ -1,11 +1,13 @@
-from roar_py_interface import RoarPyCameraSensor, RoarPyCameraSensorDataRGB, RoarPyCameraSensorDataDepth, RoarPyCameraSensorDataGreyscale, RoarPyCameraSensorDataSemanticSegmentation, RoarPyCameraSensorData, roar_py_thread_sync
+from roar_py_interface import RoarPyCameraSensor, RoarPyCameraSensorDataRGB, RoarPyCameraSensorDataDepth, RoarPyCameraSensorDataGreyscale, RoarPyCameraSensorDataSemanticSegmentation, RoarPyCameraSensorDataInstanceSegmentation, RoarPyCameraSensorData, RoarPyFrameNotifier, roar_py_thread_sync
 import typing
 import gymnasium as gym
 import carla
 import asyncio
 import numpy as np
 from PIL import Image
+from roar_py_interface.base.depth_codec import unpack_depth24, CARLA_DEPTH_MAX_METERS
 from ..base import RoarPyCarlaBase
+from .carla_frame_pipeline import RoarPyCarlaFrameConversionPipeline, RoarPyCarlaFrameConversionStats
 
 def __convert_carla_image_to_bgra_array(
     carla_data: carla.Image,
@@ -21,15 +23,15 @@ def __depth_meters_from_carla_bgra(
     bgra_carla: np.ndarray
 ) -> np.ndarray: #np.NDArray[np.float32]:
     assert bgra_carla.ndim == 3
-    assert bgra_carla.shape[-1] >= 3
-    #bgra_carla = bgra_carla.astype(np.float32)
-    # Apply (R + G * 256 + B * 256 * 256) <= This would be in mm
-    normalized_depth = np.dot(bgra_carla[:, :, :3], [65536.0, 256.0, 1.0])
-    # We omit the following normalizing step in carla
-    normalized_depth /= 16777215.0  # (256.0 * 256.0 * 256.0 - 1.0)
-    # Then we transform the depth in meters
-    normalized_depth *= 1000.0
-    return normalized_depth
+    assert bgra_carla.shape[-1] == 4
+    # Depth is packed as R + G * 256 + B * 256 * 256 (normalized to 1000m).
+    # Read as big endian uint32, each BGRA pixel is B << 24 | G << 16 | R << 8 | A, shift out A.
+    # The frame owns its depth array, so every frame allocates one float32 array:
+    # the packed integers are written into it and converted to meters in place, without an intermediate array
+    out = np.empty((*bgra_carla.shape[:2], 1), dtype=np.float32)
+    packed = out.view(np.uint32)
+    np.right_shift(bgra_carla.view(">u4"), 8, out=packed)
+    return unpack_depth24(packed, CARLA_DEPTH_MAX_METERS, out=out)
 
 #https://carla.readthedocs.io/en/0.9.14/ref_sensors/#semantic-segmentation-camera
 #Valid version: 0.9.12 - 0.9.14
@@ -60,16 +62,23 @@ __carla_semantic_segmentation_color_map = {
 }
 
 def _convert_carla_to_roarpy_image(blueprint_id : str, width : int, height : int, target_data_type : typing.Type[RoarPyCameraSensorData], carla_data: carla.Image) -> RoarPyCameraSensorData:
+    return _convert_bgra_to_roarpy_image(
+        blueprint_id,
+        target_data_type,
+        __convert_carla_image_to_bgra_array(carla_data, width, height)
+    )
+
+def _convert_bgra_to_roarpy_image(blueprint_id : str, target_data_type : typing.Type[RoarPyCameraSensorData], ret_image_bgra : np.ndarray) -> RoarPyCameraSensorData:
     #https://github.com/carla-simulator/carla/blob/master/LibCarla/source/carla/image/ColorConverter.h
     #https://github.com/carla-simulator/data-collector/blob/master/carla/image_converter.py
 
     assert blueprint_id in ["sensor.camera.depth", "sensor.camera.semantic_segmentation", "sensor.camera.rgb", "sensor.camera.instance_segmentation"], "Unsupported blueprint_id: {} for carla camera sensor support".format(blueprint_id)
 
-    ret_image_bgra = __convert_carla_image_to_bgra_array(carla_data, width, height)
     if target_data_type == RoarPyCameraSensorDataRGB:
         assert blueprint_id == "sensor.camera.rgb", "Cannot convert {} to RoarPyCameraSensorDataRGB".format(blueprint_id)
+        # Copy, the bgra buffer may be reused for the next frame
         return RoarPyCameraSensorDataRGB(
-            ret_image_bgra[:,:,2::-1] #[:,:,:3][:,:,::-1]
+            np.ascontiguousarray(ret_image_bgra[:,:,2::-1]) #[:,:,:3][:,:,::-1]
         )
     elif target_data_type == RoarPyCameraSensorDataGreyscale:
         assert blueprint_id == "sensor.camera.rgb", "Cannot convert {} to RoarPyCameraSensorDataGreyscale".format(blueprint_id)
@@ -92,12 +101,23 @@ def _convert_carla_to_roarpy_image(blueprint_id : str, width : int, height : int
         # label encoded in the red channel: A pixel with a red value of x belongs to an object with tag x
         # for instance segmentation sensor, The green and blue values of the pixel define the object's unique ID. 
         # Code cross-checked with https://github.com/carla-simulator/data-collector/blob/master/carla/image_converter.py, should be ok
-        ret_labels = ret_image_bgra[:,:,2:3].astype(np.uint64)
+        # Copy, the bgra buffer may be reused for the next frame
+        ret_labels = ret_image_bgra[:,:,2:3].copy()
 
         return RoarPyCameraSensorDataSemanticSegmentation(
             ret_labels,
             __carla_semantic_segmentation_color_map
         )
+    elif target_data_type == RoarPyCameraSensorDataInstanceSegmentation:
+        assert blueprint_id == "sensor.camera.instance_segmentation", "Cannot convert {} to RoarPyCameraSensorDataInstanceSegmentation".format(blueprint_id)
+        # Red channel holds the semantic tag, green / blue the low / high byte of the object id.
+        # Read as big endian uint16, the leading (B, G) bytes of each BGRA pixel are exactly B << 8 | G
+        ret_instances = ret_image_bgra.view(">u2")[:,:,0:1].astype(np.uint16)
+        return RoarPyCameraSensorDataInstanceSegmentation(
+            ret_image_bgra[:,:,2:3].copy(),
+            __carla_semantic_segmentation_color_map,
+            ret_instances
+        )
     else:
         raise NotImplementedError("Unsupported target_data_type: {}".format(target_data_type))
 
@@ -107,13 +127,15 @@ class RoarPyCarlaCameraSensor(RoarPyCameraSensor,RoarPyCarlaBase):
         "sensor.camera.rgb": [RoarPyCameraSensorDataRGB, RoarPyCameraSensorDataGreyscale],
         "sensor.camera.depth": [RoarPyCameraSensorDataDepth],
         "sensor.camera.semantic_segmentation": [RoarPyCameraSensorDataSemanticSegmentation],
-        "sensor.camera.instance_segmentation": [RoarPyCameraSensorDataSemanticSegmentation]
+        # The first entry is the default target type, instance ids are opt-in through target_data_type
+        "sensor.camera.instance_segmentation": [RoarPyCameraSensorDataSemanticSegmentation, RoarPyCameraSensorDataInstanceSegmentation]
     }
     SUPPORTED_TARGET_DATA_TO_BLUEPRINT = {
         RoarPyCameraSensorDataRGB: "sensor.camera.rgb",
         RoarPyCameraSensorDataGreyscale: "sensor.camera.rgb",
         RoarPyCameraSensorDataDepth: "sensor.camera.depth",
-        RoarPyCameraSensorDataSemanticSegmentation: "sensor.camera.semantic_segmentation"
+        RoarPyCameraSensorDataSemanticSegmentation: "sensor.camera.semantic_segmentation",
+        RoarPyCameraSensorDataInstanceSegmentation: "sensor.camera.instance_segmentation"
     }
     def __init__(
         self, 
@@ -121,6 +143,7 @@ class RoarPyCarlaCameraSensor(RoarPyCameraSensor,RoarPyCarlaBase):
         sensor: carla.Sensor,
         target_data_type: typing.Optional[typing.Type[RoarPyCameraSensorData]] = None,
         name: str = "carla_camera",
+        max_pending_frames: int = 2,
     ):
         RoarPyCarlaBase.__init__(self, carla_instance, sensor)
         assert sensor.type_id in __class__.SUPPORTED_BLUEPRINT_TO_TARGET_DATA.keys(), "Unsupported blueprint_id: {} for carla camera sensor support".format(sensor.type_id)
@@ -130,10 +153,25 @@ class RoarPyCarlaCameraSensor(RoarPyCameraSensor,RoarPyCarlaBase):
 
         RoarPyCameraSensor.__init__(self, name = name, control_timestep = 0.0, target_data_type = target_data_type)
         self.sensordata_type = target_data_type
+        self.received_data : typing.Optional[RoarPyCameraSensorData] = None
+        self.received_frame_notifier = RoarPyFrameNotifier()
+        # Frame count of the last observation handed out by receive_observation / receive_next_observation
+        self._consumed_frame = 0
+        # Set when the newest frame failed to convert, raised by the next receive_observation
+        self._conversion_error : typing.Optional[Exception] = None
+        # Conversion runs off the CARLA callback thread, see RoarPyCarlaFrameConversionPipeline
+        blueprint_id = sensor.type_id
+        width, height = self.image_size_width, self.image_size_height
+        self.conversion_pipeline : RoarPyCarlaFrameConversionPipeline[RoarPyCameraSensorData] = RoarPyCarlaFrameConversionPipeline(
+            lambda bgra_buffer: _convert_bgra_to_roarpy_image(blueprint_id, target_data_type, bgra_buffer.reshape(height, width, 4)),
+            width * height * 4,
+            on_converted = self._on_frame_converted,
+            max_pending_frames = max_pending_frames,
+            on_failed = self._on_frame_failed
+        )
         sensor.listen(
             self.listen_carla_data
         )
-        self.received_data : typing.Optional[RoarPyCameraSensorData] = None
 
     @property
     def control_timestep(self) -> float:
@@ -152,21 +190,44 @@ class RoarPyCarlaCameraSensor(RoarPyCameraSensor,RoarPyCarlaBase):
         return int(self._base_actor.attributes["image_size_y"])
     
     def listen_carla_data(self, carla_data: carla.Image) -> None:
-        self.received_data = _convert_carla_to_roarpy_image(
-            self._base_actor.type_id,
-            self.image_size_width,
-            self.image_size_height,
-            self.sensordata_type,
-            carla_data
-        )
+        self.conversion_pipeline.submit(carla_data.raw_data)
+
+    def _on_frame_converted(self, converted_data: RoarPyCameraSensorData) -> None:
+        self.received_data = converted_data
+        self._conversion_error = None
+        self.received_frame_notifier.notify()
+
+    def _on_frame_failed(self, error: Exception) -> None:
+        # Wake up the waiters so that they see the failure instead of waiting for the next good frame
+        self._conversion_error = error
+        self.received_frame_notifier.notify()
+
+    def get_conversion_stats(self) -> RoarPyCarlaFrameConversionStats:
+        return self.conversion_pipeline.get_stats()
 
     def get_gym_observation_spec(self) -> gym.Space:
         return self.sensordata_type.gym_observation_space(self.image_size_width, self.image_size_height)
     
     async def receive_observation(self) -> RoarPyCameraSensorData:
-        while self.received_data is None:
-            await asyncio.sleep(0.001)
-        return self.received_data
+        # Only waits for the first frame, a sensor ticking slower than the world hands out its latest frame again
+        return await self._receive_frame(1)
+
+    async def receive_next_observation(self) -> RoarPyCameraSensorData:
+        """
+        Like receive_observation, but waits for a frame newer than the last one handed out by receive_observation / receive_next_observation.
+        """
+        return await self._receive_frame(self._consumed_frame + 1)
+
+    async def _receive_frame(self, frame : int) -> RoarPyCameraSensorData:
+        while True:
+            self._consumed_frame = await self.received_frame_notifier.wait_for_frame(frame)
+            conversion_error, self._conversion_error = self._conversion_error, None
+            if conversion_error is not None:
+                raise RuntimeError("Failed to convert the frame of camera sensor {}".format(self.name)) from conversion_error
+            if self.received_data is not None:
+                return self.received_data
+            # Every frame so far failed to convert and the failure was already raised
+            frame = self._consumed_frame + 1
     
     def get_last_observation(self) -> typing.Optional[RoarPyCameraSensorData]:
         return self.received_data
@@ -175,6 +236,7 @@ class RoarPyCarlaCameraSensor(RoarPyCameraSensor,RoarPyCarlaBase):
     def close(self):
         if self._base_actor is not None and self._base_actor.is_listening:
             self._base_actor.stop()
+        self.conversion_pipeline.close()
         RoarPyCarlaBase.close(self)
     
     @roar_py_thread_sync
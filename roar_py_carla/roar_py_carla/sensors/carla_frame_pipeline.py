@@ -0,0 +1,184 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+import collections
+import copy
+import logging
+import os
+import threading
+import time
+import typing
+import numpy as np
+
+_ConvertedT = typing.TypeVar("_ConvertedT")
+
+_logger = logging.getLogger(__name__)
+
+@dataclass
+class RoarPyCarlaLatencyCounter:
+    count: int = 0
+    # In seconds
+    total: float = 0.0
+    last: float = 0.0
+    max: float = 0.0
+
+    def record(self, seconds : float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.last = seconds
+        self.max = max(self.max, seconds)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count > 0 else 0.0
+
+@dataclass
+class RoarPyCarlaFrameConversionStats:
+    frames_received: int = 0
+    frames_converted: int = 0
+    # Frames pushed out of a full queue before being converted
+    frames_dropped: int = 0
+    # Frames for which convert_fn raised, reported through on_failed
+    frames_failed: int = 0
+    # Copy of the raw buffer in the callback thread
+    copy_latency: RoarPyCarlaLatencyCounter = field(default_factory=RoarPyCarlaLatencyCounter)
+    # Time spent in the queue waiting for a worker
+    queue_latency: RoarPyCarlaLatencyCounter = field(default_factory=RoarPyCarlaLatencyCounter)
+    convert_latency: RoarPyCarlaLatencyCounter = field(default_factory=RoarPyCarlaLatencyCounter)
+    # From the callback to the converted frame being published
+    total_latency: RoarPyCarlaLatencyCounter = field(default_factory=RoarPyCarlaLatencyCounter)
+
+_shared_conversion_executor : typing.Optional[ThreadPoolExecutor] = None
+_shared_conversion_executor_lock = threading.Lock()
+
+def get_shared_conversion_executor() -> ThreadPoolExecutor:
+    """
+    Worker pool shared by the conversion pipelines of all sensors, bounded to the number of cores (at most 4).
+    """
+    global _shared_conversion_executor
+    with _shared_conversion_executor_lock:
+        if _shared_conversion_executor is None:
+            _shared_conversion_executor = ThreadPoolExecutor(
+                max_workers=max(1, min(4, os.cpu_count() or 1)),
+                thread_name_prefix="roar_py_carla_conversion"
+            )
+        return _shared_conversion_executor
+
+class RoarPyCarlaFrameConversionPipeline(typing.Generic[_ConvertedT]):
+    """
+    Moves the conversion of raw sensor frames out of the CARLA callback thread.
+
+    submit() only copies the raw buffer into a pooled array and queues it, the conversion runs on a worker pool.
+    At most max_pending_frames frames wait in the queue, the oldest is dropped when a new one arrives on a full queue.
+    Frames of one pipeline are converted in order, one at a time, so the published frame is always the newest converted one.
+    The buffer passed to convert_fn is reused afterwards, converted frames must not keep references to it.
+    Exceptions raised by convert_fn are logged, counted in frames_failed and handed to on_failed (on the worker thread).
+    """
+    def __init__(
+        self,
+        convert_fn : typing.Callable[[np.ndarray], _ConvertedT],
+        frame_num_bytes : int,
+        on_converted : typing.Optional[typing.Callable[[_ConvertedT], None]] = None,
+        max_pending_frames : int = 2,
+        executor : typing.Optional[ThreadPoolExecutor] = None,
+        on_failed : typing.Optional[typing.Callable[[Exception], None]] = None
+    ):
+        assert max_pending_frames >= 1
+        self.convert_fn = convert_fn
+        self.frame_num_bytes = frame_num_bytes
+        self.on_converted = on_converted
+        self.on_failed = on_failed
+        self.max_pending_frames = max_pending_frames
+        self._executor = executor
+        self._lock = threading.Lock()
+        self._pending : typing.Deque[typing.Tuple[np.ndarray, float, float]] = collections.deque()
+        self._free_buffers : typing.List[np.ndarray] = []
+        self._draining = False
+        self._closed = False
+        self._latest : typing.Optional[_ConvertedT] = None
+        self._stats = RoarPyCarlaFrameConversionStats()
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        return self._executor if self._executor is not None else get_shared_conversion_executor()
+
+    @property
+    def latest(self) -> typing.Optional[_ConvertedT]:
+        return self._latest
+
+    def get_stats(self) -> RoarPyCarlaFrameConversionStats:
+        with self._lock:
+            return copy.deepcopy(self._stats)
+
+    def _acquire_buffer(self) -> np.ndarray:
+        with self._lock:
+            if len(self._free_buffers) > 0:
+                return self._free_buffers.pop()
+        return np.empty(self.frame_num_bytes, dtype=np.uint8)
+
+    def submit(self, raw_data : typing.Any) -> None:
+        """
+        Called from the sensor callback with the raw frame bytes (any buffer object).
+        """
+        received_time = time.perf_counter()
+        buffer = self._acquire_buffer()
+        np.copyto(buffer, np.frombuffer(raw_data, dtype=np.uint8))
+        copied_time = time.perf_counter()
+
+        with self._lock:
+            if self._closed:
+                self._free_buffers.append(buffer)
+                return
+            self._stats.frames_received += 1
+            self._stats.copy_latency.record(copied_time - received_time)
+            if len(self._pending) >= self.max_pending_frames:
+                dropped_buffer, _, _ = self._pending.popleft()
+                self._free_buffers.append(dropped_buffer)
+                self._stats.frames_dropped += 1
+            self._pending.append((buffer, received_time, copied_time))
+            start_draining = not self._draining
+            self._draining = True
+
+        if start_draining:
+            try:
+                self.executor.submit(self._drain)
+            except RuntimeError:
+                # The executor is shut down (interpreter exit)
+                with self._lock:
+                    self._draining = False
+
+    def _drain(self) -> None:
+        while True:
+            with self._lock:
+                if len(self._pending) == 0 or self._closed:
+                    self._draining = False
+                    return
+                buffer, received_time, copied_time = self._pending.popleft()
+
+            convert_start_time = time.perf_counter()
+            try:
+                converted = self.convert_fn(buffer)
+            except Exception as e:
+                _logger.exception("Failed to convert sensor frame")
+                with self._lock:
+                    self._free_buffers.append(buffer)
+                    self._stats.frames_failed += 1
+                if self.on_failed is not None:
+                    self.on_failed(e)
+                continue
+            convert_end_time = time.perf_counter()
+
+            with self._lock:
+                self._free_buffers.append(buffer)
+                self._stats.frames_converted += 1
+                self._stats.queue_latency.record(convert_start_time - copied_time)
+                self._stats.convert_latency.record(convert_end_time - convert_start_time)
+                self._stats.total_latency.record(convert_end_time - received_time)
+                self._latest = converted
+            if self.on_converted is not None:
+                self.on_converted(converted)
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            self._pending.clear()
+            self._free_buffers.clear()
@@ -1,4 +1,4 @@
-from roar_py_interface import RoarPyGNSSSensor, RoarPyGNSSSensorData, roar_py_thread_sync
+from roar_py_interface import RoarPyGNSSSensor, RoarPyGNSSSensorData, RoarPyFrameNotifier, roar_py_thread_sync
 from dataclasses import dataclass
 import typing
 import asyncio
@@ -18,6 +18,9 @@ class RoarPyCarlaGNSSSensor(RoarPyGNSSSensor, RoarPyCarlaBase):
         RoarPyCarlaBase.__init__(self, carla_instance, sensor)
         RoarPyCarlaGNSSSensor.__init__(self, name, control_timestep = 0.0)
         self.received_data : typing.Optional[RoarPyGNSSSensorData] = None
+        self.received_frame_notifier = RoarPyFrameNotifier()
+        # Frame count of the last observation handed out by receive_observation / receive_next_observation
+        self._consumed_frame = 0
         sensor.listen(
             self.listen_carla_data
         )
@@ -55,8 +58,15 @@ class RoarPyCarlaGNSSSensor(RoarPyGNSSSensor, RoarPyCarlaBase):
         return float(self._base_actor.attributes["sensor_tick"])
     
     async def receive_observation(self) -> RoarPyGNSSSensorData:
-        while self.received_data is None:
-            await asyncio.sleep(0.001)
+        # Only waits for the first frame, a sensor ticking slower than the world hands out its latest frame again
+        self._consumed_frame = await self.received_frame_notifier.wait_for_frame(1)
+        return self.received_data
+
+    async def receive_next_observation(self) -> RoarPyGNSSSensorData:
+        """
+        Like receive_observation, but waits for a frame newer than the last one handed out by receive_observation / receive_next_observation.
+        """
+        self._consumed_frame = await self.received_frame_notifier.wait_for_frame(self._consumed_frame + 1)
         return self.received_data
     
     def listen_carla_data(self, gnss_data: carla.GnssMeasurement) -> None:
@@ -65,6 +75,7 @@ class RoarPyCarlaGNSSSensor(RoarPyGNSSSensor, RoarPyCarlaBase):
             gnss_data.latitude,
             gnss_data.longitude
         )
+        self.received_frame_notifier.notify()
 
     def get_last_observation(self) -> typing.Optional[RoarPyGNSSSensorData]:
         return self.received_data
@@ -1,4 +1,4 @@
-from roar_py_interface import RoarPyLiDARSensor, RoarPyLiDARSensorData, roar_py_thread_sync
+from roar_py_interface import RoarPyLiDARSensor, RoarPyLiDARSensorData, RoarPyFrameNotifier, roar_py_thread_sync
 import typing
 import gymnasium as gym
 import carla
@@ -35,6 +35,9 @@ class RoarPyCarlaLiDARSensor(RoarPyLiDARSensor, RoarPyCarlaBase):
         RoarPyLiDARSensor.__init__(self, name, control_timestep = 0.0)
         RoarPyCarlaBase.__init__(self, carla_instance, sensor)
         self.received_data : typing.Optional[RoarPyLiDARSensorData] = None
+        self.received_frame_notifier = RoarPyFrameNotifier()
+        # Frame count of the last observation handed out by receive_observation / receive_next_observation
+        self._consumed_frame = 0
         sensor.listen(
             self.listen_carla_data
         )
@@ -79,12 +82,20 @@ class RoarPyCarlaLiDARSensor(RoarPyLiDARSensor, RoarPyCarlaBase):
         return int(self._base_actor.attributes["horizontal_fov"])
 
     async def receive_observation(self) -> RoarPyLiDARSensorData:
-        while self.received_data is None:
-            await asyncio.sleep(0.001)
+        # Only waits for the first frame, a sensor ticking slower than the world hands out its latest frame again
+        self._consumed_frame = await self.received_frame_notifier.wait_for_frame(1)
+        return self.received_data
+
+    async def receive_next_observation(self) -> RoarPyLiDARSensorData:
+        """
+        Like receive_observation, but waits for a frame newer than the last one handed out by receive_observation / receive_next_observation.
+        """
+        self._consumed_frame = await self.received_frame_notifier.wait_for_frame(self._consumed_frame + 1)
         return self.received_data
     
     def listen_carla_data(self, carla_data: carla.LidarMeasurement) -> None:
         self.received_data = __convert_carla_lidar_raw_to_roar_py(carla_data)
+        self.received_frame_notifier.notify()
 
     def get_last_observation(self) -> typing.Optional[RoarPyLiDARSensorData]:
         return self.received_data
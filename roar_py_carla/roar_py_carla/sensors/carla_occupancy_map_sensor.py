@@ -1,24 +1,108 @@
-from roar_py_interface.sensors.occupancy_map_sensor import RoarPyOccupancyMapSensor, RoarPyOccupancyMapSensorData
-from roar_py_interface.worlds.occupancy_map import RoarPyOccupancyMapProducer
+from roar_py_interface.sensors.occupancy_map_sensor import RoarPyOccupancyMapSensor, RoarPyOccupancyMapSensorData, RoarPyOccupancyMapBufferPool
+from roar_py_interface.worlds.occupancy_map import RoarPyOccupancyMapProducer, RoarPyIncrementalOccupancyMap
 import typing
 import gymnasium as gym
+import numpy as np
+
+class RoarPyCarlaOccupancyMapBatch:
+    """
+    Groups the occupancy map sensors of different actors that share one producer,
+    the first sensor read after each world tick renders the maps of all of them with a single plot_occupancy_maps call.
+
+    Sensors are registered under a stable handle, the rendered set (and the size of the buffer pool) only changes when a new tick is rendered,
+    so the maps handed out for the last tick stay untouched while the current one is read.
+    Sensors registered after the render of the current tick are not part of it, get_occupancy_map returns None for them until the next tick.
+    """
+    def __init__(self, producer : RoarPyOccupancyMapProducer, world : "RoarPyCarlaWorld"):
+        self.producer = producer
+        self.world = world
+        self._sensors : typing.Dict[int, "RoarPyCarlaOccupancyMapSensor"] = {}
+        self._next_handle = 0
+        self._rendered_tick : typing.Optional[int] = None
+        self._buffer_pool : typing.Optional[RoarPyOccupancyMapBufferPool] = None
+        self._rendered_maps : typing.Optional[np.ndarray] = None
+        self._rendered_rows : typing.Dict[int, int] = {}
+
+    @property
+    def sensors(self) -> typing.List["RoarPyCarlaOccupancyMapSensor"]:
+        return list(self._sensors.values())
+
+    def add_sensor(self, sensor : "RoarPyCarlaOccupancyMapSensor") -> int:
+        """
+        Registers a sensor, returns its handle in this batch
+        """
+        handle = self._next_handle
+        self._next_handle += 1
+        self._sensors[handle] = sensor
+        return handle
+
+    def remove_sensor(self, handle : int) -> None:
+        self._sensors.pop(handle, None)
+
+    def _render(self) -> None:
+        handles = [handle for handle, sensor in self._sensors.items() if not sensor.is_closed()]
+        self._rendered_rows = {handle: i for i, handle in enumerate(handles)}
+        if len(handles) == 0:
+            self._rendered_maps = None
+            return
+        sensors = [self._sensors[handle] for handle in handles]
+        locations = np.stack([sensor.actor.get_3d_location()[:2] for sensor in sensors], axis=0)
+        yaws = np.array([sensor.actor.get_roll_pitch_yaw()[2] for sensor in sensors])
+        # Double buffered, the maps handed out for the last tick stay untouched while this tick is rendered.
+        # A new pool leaves the buffers of the old one to the maps already handed out.
+        if self._buffer_pool is None or self._buffer_pool.shape[0] != len(handles):
+            self._buffer_pool = RoarPyOccupancyMapBufferPool((len(handles), self.producer.height, self.producer.width))
+        self._rendered_maps = self.producer.plot_occupancy_maps(locations, yaws, out=self._buffer_pool.next_buffer())
+
+    def get_occupancy_map(self, handle : int) -> typing.Optional[np.ndarray]:
+        """
+        Map of the sensor registered under handle for the current world tick, None if the sensor is not part of this tick's render
+        """
+        tick = self.world.tick_count
+        if tick != self._rendered_tick:
+            self._render()
+            self._rendered_tick = tick
+        row = self._rendered_rows.get(handle)
+        return self._rendered_maps[row] if row is not None else None
 
 class RoarPyCarlaOccupancyMapSensor(RoarPyOccupancyMapSensor):
-    def __init__(self, producer : RoarPyOccupancyMapProducer, actor : "RoarPyCarlaActor", name: str = "carla_occupancy_map_sensor"):
+    def __init__(
+        self,
+        producer : RoarPyOccupancyMapProducer,
+        actor : "RoarPyCarlaActor",
+        name: str = "carla_occupancy_map_sensor",
+        batch : typing.Optional[RoarPyCarlaOccupancyMapBatch] = None,
+        incremental_max_error_pixels : typing.Optional[float] = None
+    ):
         super().__init__(name)
         self._closed = False
         self.producer = producer
         self.actor = actor
+        self.batch = batch
+        self._batch_handle = batch.add_sensor(self) if batch is not None else None
+        self.incremental_map = RoarPyIncrementalOccupancyMap(producer, incremental_max_error_pixels) if incremental_max_error_pixels is not None else None
+        self._buffer_pool = RoarPyOccupancyMapBufferPool((producer.height, producer.width))
         self._last_data : typing.Optional[RoarPyOccupancyMapSensorData] = None
     
     def get_gym_observation_spec(self) -> gym.Space:
         return RoarPyOccupancyMapSensorData.gym_observation_space(self.producer.width, self.producer.height)
     
-    async def receive_observation(self) -> RoarPyOccupancyMapSensorData:
+    def _render_occupancy_map(self) -> np.ndarray:
         location = self.actor.get_3d_location()[:2]
         yaw = self.actor.get_roll_pitch_yaw()[2]
-        occupancy_map = self.producer.plot_occupancy_map(location, yaw)
-        self._last_data = RoarPyOccupancyMapSensorData.from_image(occupancy_map)
+        if self.incremental_map is not None:
+            # The incremental map keeps updating its buffer, hand out a pooled copy
+            occupancy_map = self._buffer_pool.next_buffer()
+            np.copyto(occupancy_map, self.incremental_map.update(location, yaw))
+            return occupancy_map
+        return self.producer.plot_occupancy_map_array(location, yaw, out=self._buffer_pool.next_buffer())
+
+    async def receive_observation(self) -> RoarPyOccupancyMapSensorData:
+        occupancy_map = self.batch.get_occupancy_map(self._batch_handle) if self.batch is not None else None
+        if occupancy_map is None:
+            # Not batched, or the sensor joined its batch after the current tick was rendered
+            occupancy_map = self._render_occupancy_map()
+        self._last_data = RoarPyOccupancyMapSensorData(occupancy_map)
         return self._last_data
     
     def get_last_observation(self) -> typing.Optional[RoarPyOccupancyMapSensorData]:
@@ -29,6 +113,8 @@ class RoarPyCarlaOccupancyMapSensor(RoarPyOccupancyMapSensor):
     
     def close(self):
         self._closed = True
+        if self.batch is not None:
+            self.batch.remove_sensor(self._batch_handle)
     
     def is_closed(self) -> bool:
         return self._closed
@@ -1,4 +1,4 @@
-from roar_py_interface import RoarPyRadarSensor, RoarPyRadarSensorData, roar_py_thread_sync
+from roar_py_interface import RoarPyRadarSensor, RoarPyRadarSensorData, RoarPyFrameNotifier, roar_py_thread_sync
 import typing
 import gymnasium as gym
 import carla
@@ -26,6 +26,9 @@ class RoarPyCarlaRadarSensor(RoarPyRadarSensor, RoarPyCarlaBase):
         RoarPyRadarSensor.__init__(self, name, control_timestep = 0.0)
         RoarPyCarlaBase.__init__(self, carla_instance, sensor)
         self.received_data : typing.Optional[RoarPyRadarSensorData] = None
+        self.received_frame_notifier = RoarPyFrameNotifier()
+        # Frame count of the last observation handed out by receive_observation / receive_next_observation
+        self._consumed_frame = 0
         sensor.listen(
             self.listen_carla_data
         )
@@ -54,12 +57,20 @@ class RoarPyCarlaRadarSensor(RoarPyRadarSensor, RoarPyCarlaBase):
         return float(self._base_actor.attributes["vertical_fov"])
     
     async def receive_observation(self) -> RoarPyRadarSensorData:
-        while self.received_data is None:
-            await asyncio.sleep(0.001)
+        # Only waits for the first frame, a sensor ticking slower than the world hands out its latest frame again
+        self._consumed_frame = await self.received_frame_notifier.wait_for_frame(1)
+        return self.received_data
+
+    async def receive_next_observation(self) -> RoarPyRadarSensorData:
+        """
+        Like receive_observation, but waits for a frame newer than the last one handed out by receive_observation / receive_next_observation.
+        """
+        self._consumed_frame = await self.received_frame_notifier.wait_for_frame(self._consumed_frame + 1)
         return self.received_data
     
     def listen_carla_data(self, carla_data: carla.RadarMeasurement) -> None:
         self.received_data = __convert_carla_radar_raw_to_roar_py(carla_data)
+        self.received_frame_notifier.notify()
     
     def get_last_observation(self) -> typing.Optional[RoarPyRadarSensorData]:
         return self.received_data
@@ -1 +1,2 @@
-from .convert_coordinate import *
\ No newline at end of file
+from .convert_coordinate import *
+from .waypoint_cache import *
\ No newline at end of file
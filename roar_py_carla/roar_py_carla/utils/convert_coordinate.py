@@ -29,4 +29,14 @@ def transform_to_carla(location : np.ndarray, rotation : np.ndarray) -> carla.Tr
     location = location_to_carla(location)
     rotation = rotation_to_carla(rotation)
     return carla.Transform(location=location, rotation=rotation)
-    
\ No newline at end of file
+    
+
+def transforms_from_carla(transforms : typing.Iterable[carla.Transform]) -> typing.Tuple[np.ndarray, np.ndarray]:
+    # Batched transform_from_carla, returns (N, 3) locations and (N, 3) rotations
+    raw = np.array([
+        (t.location.x, t.location.y, t.location.z, t.rotation.roll, t.rotation.pitch, t.rotation.yaw)
+        for t in transforms
+    ], dtype=np.float64).reshape(-1, 6)
+    locations = np.stack([raw[:, 0], -raw[:, 1], raw[:, 2]], axis=1).astype(np.float32)
+    rotations = np.deg2rad(np.stack([raw[:, 3], -raw[:, 4], -raw[:, 5]], axis=1))
+    return locations, rotations
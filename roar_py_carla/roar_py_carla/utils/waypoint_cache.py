@@ -0,0 +1,65 @@
+from roar_py_interface import RoarPyWaypointArray, roar_py_cache_dir, roar_py_cache_load_arrays, roar_py_cache_save_arrays
+import numpy as np
+import typing
+import hashlib
+import os
+
+# Bump whenever the generation logic or the on-disk layout of the cached waypoints changes
+WAYPOINT_CACHE_VERSION = 2
+_WAYPOINT_KEYS = ('locations', 'rotations', 'lane_widths')
+
+def waypoint_cache_dir() -> str:
+    # Directory of the generated waypoint cache, see roar_py_cache_dir for how it is resolved
+    return roar_py_cache_dir()
+
+def waypoint_cache_key(map_name : str, opendrive_content : str, waypoints_distance : float) -> str:
+    opendrive_hash = hashlib.sha256(opendrive_content.encode("utf-8")).hexdigest()[:16]
+    return "{}_{}_{:g}_v{}".format(map_name, opendrive_hash, waypoints_distance, WAYPOINT_CACHE_VERSION)
+
+def route_graph_cache_file(cache_key : str) -> str:
+    # The compact route graph manages its own .npz file (see CompactRouteGraph.save / load)
+    return os.path.join(waypoint_cache_dir(), "route_graph", cache_key + ".npz")
+
+def _waypoint_cache_entry(kind : str, cache_key : str) -> str:
+    return os.path.join(waypoint_cache_dir(), kind, cache_key)
+
+def _load_cache_entry(kind : str, cache_key : str, keys : typing.Iterable[str]) -> typing.Optional[typing.Dict[str, np.ndarray]]:
+    return roar_py_cache_load_arrays(_waypoint_cache_entry(kind, cache_key), keys)
+
+def _save_cache_entry(kind : str, cache_key : str, data : typing.Dict[str, np.ndarray]) -> None:
+    roar_py_cache_save_arrays(_waypoint_cache_entry(kind, cache_key), data)
+
+def load_cached_waypoints(kind : str, cache_key : str) -> typing.Optional[RoarPyWaypointArray]:
+    cached = _load_cache_entry(kind, cache_key, _WAYPOINT_KEYS)
+    if cached is None:
+        return None
+    return RoarPyWaypointArray.load_waypoint_list(cached)
+
+def save_cached_waypoints(kind : str, cache_key : str, waypoints : RoarPyWaypointArray) -> None:
+    _save_cache_entry(kind, cache_key, RoarPyWaypointArray.save_waypoint_list(waypoints))
+
+def load_cached_waypoint_groups(kind : str, cache_key : str) -> typing.Optional[typing.Dict[typing.Any, RoarPyWaypointArray]]:
+    cached = _load_cache_entry(kind, cache_key, _WAYPOINT_KEYS + ("group_keys", "group_indptr"))
+    if cached is None:
+        return None
+    all_waypoints = RoarPyWaypointArray.load_waypoint_list(cached)
+    group_keys = cached["group_keys"]
+    group_indptr = cached["group_indptr"]
+    return {
+        group_keys[i].item(): all_waypoints[group_indptr[i]:group_indptr[i+1]]
+        for i in range(len(group_keys))
+    }
+
+def save_cached_waypoint_groups(kind : str, cache_key : str, waypoint_groups : typing.Dict[typing.Any, RoarPyWaypointArray]) -> None:
+    # All groups are concatenated into one array, group i spans [group_indptr[i], group_indptr[i+1])
+    groups = [RoarPyWaypointArray.from_waypoints(waypoints) for waypoints in waypoint_groups.values()]
+    group_indptr = np.zeros(len(groups) + 1, dtype=np.int64)
+    group_indptr[1:] = np.cumsum([len(group) for group in groups])
+    data = {
+        'locations': np.concatenate([group.locations for group in groups], axis=0) if len(groups) > 0 else np.zeros((0, 3)),
+        'rotations': np.concatenate([group.roll_pitch_yaws for group in groups], axis=0) if len(groups) > 0 else np.zeros((0, 3)),
+        'lane_widths': np.concatenate([group.lane_widths for group in groups], axis=0) if len(groups) > 0 else np.zeros((0,)),
+        'group_keys': np.asarray(list(waypoint_groups.keys())),
+        'group_indptr': group_indptr
+    }
+    _save_cache_entry(kind, cache_key, data)
@@ -4,10 +4,13 @@ from ..carla_agents.navigation.global_route_planner import GlobalRoutePlanner as
 import typing
 import asyncio
 import numpy as np
+import os
 import os.path
+import concurrent.futures
 
-from roar_py_interface import RoarPyActor, RoarPySensor, roar_py_thread_sync, roar_py_append_item, roar_py_remove_item, RoarPyWaypoint
+from roar_py_interface import RoarPyActor, RoarPySensor, roar_py_thread_sync, roar_py_append_item, roar_py_remove_item, RoarPyWaypoint, RoarPyWaypointArray
 from roar_py_interface.sensors import *
+from roar_py_interface.worlds.occupancy_map import RoarPyOccupancyMapProducer
 from ..actors import RoarPyCarlaVehicle, RoarPyCarlaActor
 from ..sensors import *
 from functools import cached_property
@@ -30,8 +33,10 @@ class RoarPyCarlaWorld(RoarPyWorld):
         self.carla_instance = carla_instance
         self.tick_callback_id : typing.Optional[int] = None
         self._last_tick_time : float = 0.0
+        self._tick_count : int = 0
         self._actors : typing.List[RoarPyCarlaActor] = []
         self._sensors : typing.List[RoarPySensor] = []
+        self._occupancy_map_batches : typing.Dict[typing.Tuple[int, int, float, float], RoarPyCarlaOccupancyMapBatch] = {}
 
         carla_settings = carla_world.get_settings()
         self._control_timestep = carla_settings.fixed_delta_seconds
@@ -66,8 +71,18 @@ class RoarPyCarlaWorld(RoarPyWorld):
             if isinstance(carlabase, RoarPySensor):
                 yield carlabase
 
-    @property
-    def comprehensive_waypoints(self) -> typing.Dict[typing.Any,typing.List[RoarPyWaypoint]]:
+    @cached_property
+    @roar_py_thread_sync
+    def _waypoint_cache_key(self) -> str:
+        return waypoint_cache_key(self.map_name, self._native_carla_map.to_opendrive(), __class__.WAYPOINTS_DISTANCE)
+
+    @cached_property
+    @roar_py_thread_sync
+    def comprehensive_waypoints(self) -> typing.Dict[typing.Any,RoarPyWaypointArray]:
+        cached = load_cached_waypoint_groups("comprehensive_waypoints", self._waypoint_cache_key)
+        if cached is not None:
+            return cached
+
         ret = {}
         for waypoint in self._native_carla_waypoints:
             transform_w = transform_from_carla(waypoint.transform)
@@ -79,36 +94,54 @@ class RoarPyCarlaWorld(RoarPyWorld):
             if waypoint.road_id not in ret:
                 ret[waypoint.road_id] = []
             ret[waypoint.road_id].append(new_waypoint)
+        ret = {road_id: RoarPyWaypointArray.from_waypoints(waypoints) for road_id, waypoints in ret.items()}
+        save_cached_waypoint_groups("comprehensive_waypoints", self._waypoint_cache_key, ret)
         return ret
 
     @cached_property
     @roar_py_thread_sync
-    def maneuverable_waypoints(self) -> typing.Optional[typing.List[RoarPyWaypoint]]:
+    def maneuverable_waypoints(self) -> typing.Optional[RoarPyWaypointArray]:
         waypoint_asset_dir = __class__.ASSET_DIR + "/waypoints"
+        # Assets are directories of uncompressed .npy files that get memory mapped (shared between processes)
+        waypoint_dir = waypoint_asset_dir + "/" + self.map_name
+        if os.path.isdir(waypoint_dir):
+            return RoarPyWaypointArray.load_waypoint_dir(waypoint_dir)
         waypoint_file = waypoint_asset_dir + "/" + self.map_name + ".npz"
         if os.path.exists(waypoint_file):
             way_points = np.load(waypoint_file)
-            return RoarPyWaypoint.load_waypoint_list(way_points)
+            return RoarPyWaypointArray.load_waypoint_list(way_points)
         
+        cached = load_cached_waypoints("maneuverable_waypoints", self._waypoint_cache_key)
+        if cached is not None:
+            return cached
+
+        waypoints = self.generate_maneuverable_waypoints()
+        if waypoints is not None:
+            save_cached_waypoints("maneuverable_waypoints", self._waypoint_cache_key, waypoints)
+        return waypoints
+
+    def generate_maneuverable_waypoints(
+        self,
+        progress_callback : typing.Optional[typing.Callable[[int, int], None]] = None,
+        max_workers : typing.Optional[int] = None
+    ) -> typing.Optional[RoarPyWaypointArray]:
+        """
+        Traces a closed loop of waypoints through all spawn points (ignoring assets and the on-disk cache).
+        Routes between consecutive spawn points are traced concurrently on up to max_workers threads (os.cpu_count() by default) and stitched in order.
+        progress_callback(num_traced, num_total) is called from the calling thread after each route is traced.
+        """
         spawn_points = self.spawn_points
         num_spawn_points = len(spawn_points)
 
         waypoints = None
         if num_spawn_points > 1:
-            waypoints = []
-            for i in range(num_spawn_points):
-                curr_start = spawn_points[i][0]
-                curr_end = spawn_points[(i+1)%num_spawn_points][0]
-                # print("Tracing from {} to {}".format(curr_start, curr_end))
-                current_traced = self._trace_waypoint(
-                    curr_start,
-                    curr_end
-                )
-                if current_traced is not None:
-                    waypoints.extend(current_traced)
-                else:
-                    waypoints = None
-                    break
+            traced = self._trace_waypoints(
+                [(spawn_points[i][0], spawn_points[(i+1)%num_spawn_points][0]) for i in range(num_spawn_points)],
+                progress_callback,
+                max_workers
+            )
+            if all(current_traced is not None for current_traced in traced):
+                waypoints = RoarPyWaypointArray.concatenate(traced)
                 
         if num_spawn_points == 1 or (num_spawn_points > 1 and waypoints is None):
             init_pos = spawn_points[0][0]
@@ -117,10 +150,13 @@ class RoarPyCarlaWorld(RoarPyWorld):
             pos_y = np.array([1.0,0.0,0.0]) # Go forward 1m and set as next waypoint
 
             second_pos = init_pos + tr3d.euler.euler2mat(*init_rot).dot(pos_y)
-            first_to_second = self._trace_waypoint(init_pos, second_pos)
-            second_to_first = self._trace_waypoint(second_pos, init_pos)
+            first_to_second, second_to_first = self._trace_waypoints(
+                [(init_pos, second_pos), (second_pos, init_pos)],
+                progress_callback,
+                max_workers
+            )
             if first_to_second is not None and second_to_first is not None:
-                waypoints = list(first_to_second) + list(second_to_first)
+                waypoints = RoarPyWaypointArray.concatenate([first_to_second, second_to_first])
             else:
                 waypoints = None
             
@@ -129,24 +165,51 @@ class RoarPyCarlaWorld(RoarPyWorld):
     @cached_property
     @roar_py_thread_sync
     def _native_route_tracer(self):
-        return CarlaGlobalRoutePlanner(self._native_carla_map, self.WAYPOINTS_DISTANCE)
+        return CarlaGlobalRoutePlanner(self._native_carla_map, self.WAYPOINTS_DISTANCE, route_graph_cache_file(self._waypoint_cache_key))
 
-    def _trace_waypoint(self, from_location : np.ndarray, to_location : np.ndarray) -> typing.Optional[typing.Iterable[RoarPyWaypoint]]:
+    def _trace_waypoints(
+        self,
+        location_pairs : typing.List[typing.Tuple[np.ndarray, np.ndarray]],
+        progress_callback : typing.Optional[typing.Callable[[int, int], None]] = None,
+        max_workers : typing.Optional[int] = None
+    ) -> typing.List[typing.Optional[RoarPyWaypointArray]]:
+        # Build the planner graph once before fanning out, the workers only read it
+        self._native_route_tracer
+        traced : typing.List[typing.Optional[RoarPyWaypointArray]] = [None] * len(location_pairs)
+        # Only the route searches (numba kernels compiled with nogil) run in parallel, the rest of trace_route holds the GIL,
+        # so more threads than cores only add contention and a single core traces on the calling thread
+        num_workers = min(len(location_pairs), max_workers if max_workers is not None else (os.cpu_count() or 1))
+        if num_workers <= 1:
+            for i, (from_location, to_location) in enumerate(location_pairs):
+                traced[i] = self._trace_waypoint(from_location, to_location)
+                if progress_callback is not None:
+                    progress_callback(i + 1, len(location_pairs))
+            return traced
+        with concurrent.futures.ThreadPoolExecutor(max_workers=num_workers) as executor:
+            future_to_index = {
+                executor.submit(self._trace_waypoint, from_location, to_location): i
+                for i, (from_location, to_location) in enumerate(location_pairs)
+            }
+            for num_traced, future in enumerate(concurrent.futures.as_completed(future_to_index), 1):
+                traced[future_to_index[future]] = future.result()
+                if progress_callback is not None:
+                    progress_callback(num_traced, len(location_pairs))
+        return traced
+
+    def _trace_waypoint(self, from_location : np.ndarray, to_location : np.ndarray) -> typing.Optional[RoarPyWaypointArray]:
         location_carla = location_to_carla(from_location)
         destination_carla = location_to_carla(to_location)
         try:
             native_waypoints = self._native_route_tracer.trace_route(location_carla, destination_carla)
         except nx.NetworkXNoPath:
             return None
-        for native_waypoint, native_waypoint_road_option in native_waypoints:
-            transform_w = transform_from_carla(native_waypoint.transform)
-            # Interestingly carla's waypoint also has x axis pointing to the "forward" of the road
-            real_w = RoarPyWaypoint(
-                transform_w[0],
-                transform_w[1],
-                native_waypoint.lane_width
-            )
-            yield real_w
+        # Interestingly carla's waypoint also has x axis pointing to the "forward" of the road
+        locations, rotations = transforms_from_carla([native_waypoint.transform for native_waypoint, _ in native_waypoints])
+        return RoarPyWaypointArray(
+            locations,
+            rotations,
+            np.array([native_waypoint.lane_width for native_waypoint, _ in native_waypoints])
+        )
 
     @cached_property
     def map_name(self):
@@ -225,6 +288,7 @@ class RoarPyCarlaWorld(RoarPyWorld):
 
     def __on_tick_recv(self, world_snapshot : carla.WorldSnapshot):
         self._last_tick_time = world_snapshot.timestamp.elapsed_seconds
+        self._tick_count += 1
     
     @roar_py_thread_sync
     async def step(self) -> float:
@@ -243,12 +307,19 @@ class RoarPyCarlaWorld(RoarPyWorld):
             self.carla_world.tick(seconds=60.0) # server waits 60s for client to finish the tick
             # self._last_tick_time = self.carla_world.get_snapshot().timestamp.elapsed_seconds # get the timestamp of the last tick
             self._last_tick_time += self.control_timestep
+            self._tick_count += 1
             return self.control_timestep
     
     @property
     def last_tick_elapsed_seconds(self) -> float:
         return self._last_tick_time
 
+    # Number of world ticks seen by this client, it only ever increases
+    # (last_tick_elapsed_seconds does not advance in synchronous mode with a variable timestep)
+    @property
+    def tick_count(self) -> int:
+        return self._tick_count
+
     @roar_py_thread_sync
     def _get_weather(self) -> carla.WeatherParameters:
         return self.carla_world.get_weather()
@@ -269,9 +340,18 @@ class RoarPyCarlaWorld(RoarPyWorld):
     def spawn_points(self) -> typing.List[typing.Tuple[np.ndarray, np.ndarray]]:
         # Check if there exists any overriding asset
         spawn_point_asset_dir = __class__.ASSET_DIR + "/spawn_points"
+        spawn_point_dir = spawn_point_asset_dir + "/" + self.map_name
         spawn_point_file = spawn_point_asset_dir + "/" + self.map_name + ".npz"
-        if os.path.exists(spawn_point_file):
+        spawn_points = None
+        if os.path.isdir(spawn_point_dir):
+            spawn_points = {
+                key: np.load(spawn_point_dir + "/" + key + ".npy", mmap_mode="r")
+                for key in ("locations", "rotations")
+            }
+        elif os.path.exists(spawn_point_file):
             spawn_points = np.load(spawn_point_file)
+        
+        if spawn_points is not None:
             ret = []
             for i in range(len(spawn_points["locations"])):
                 location = spawn_points["locations"][i]
@@ -352,6 +432,32 @@ class RoarPyCarlaWorld(RoarPyWorld):
         self._actors.append(new_vehicle)
         return new_vehicle
 
+    @roar_py_thread_sync
+    def get_occupancy_map_batch(
+        self,
+        width : int,
+        height : int,
+        width_in_world : float,
+        height_in_world : float
+    ) -> RoarPyCarlaOccupancyMapBatch:
+        """
+        Returns the batch shared by all occupancy map sensors of this world with the same image and world size,
+        sensors that join it are rendered together once per tick.
+        """
+        key = (width, height, float(width_in_world), float(height_in_world))
+        if key not in self._occupancy_map_batches:
+            self._occupancy_map_batches[key] = RoarPyCarlaOccupancyMapBatch(
+                RoarPyOccupancyMapProducer(
+                    self.maneuverable_waypoints,
+                    width,
+                    height,
+                    width_in_world,
+                    height_in_world
+                ),
+                self
+            )
+        return self._occupancy_map_batches[key]
+
     @roar_py_append_item
     @roar_py_thread_sync
     def attach_camera_sensor(
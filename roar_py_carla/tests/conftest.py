@@ -0,0 +1,122 @@
+import math
+import numpy as np
+import networkx as nx
+from types import SimpleNamespace
+from typing import Dict, List, Tuple
+from roar_py_carla.carla_agents.navigation.global_route_planner import RoadOption
+
+class FakeLocation:
+    """
+    Stand in for carla.Location
+    """
+    def __init__(self, x : float = 0.0, y : float = 0.0, z : float = 0.0):
+        self.x, self.y, self.z = float(x), float(y), float(z)
+
+    def distance(self, other : "FakeLocation") -> float:
+        return math.dist((self.x, self.y, self.z), (other.x, other.y, other.z))
+
+class FakeLane:
+    """
+    Straight one way lane of a FakeMap from start to end, in section 0 of its road
+    """
+    def __init__(self, road_id : int, lane_id : int, start, end, is_junction : bool = False):
+        self.road_id, self.section_id, self.lane_id = road_id, 0, lane_id
+        self.start, self.end = np.asarray(start, dtype=np.float64), np.asarray(end, dtype=np.float64)
+        self.length = float(np.linalg.norm(self.end - self.start))
+        self.is_junction = is_junction
+
+    def waypoint(self, s : float) -> "FakeWaypoint":
+        return FakeWaypoint(self, min(max(s, 0.0), self.length))
+
+class FakeWaypoint:
+    """
+    Stand in for carla.Waypoint at OpenDRIVE s of a FakeLane
+    """
+    def __init__(self, lane : FakeLane, s : float):
+        self.road_id, self.section_id, self.lane_id = lane.road_id, lane.section_id, lane.lane_id
+        self.s = float(s)
+        self.is_junction = lane.is_junction
+        self.lane_width = 3.5
+        location = lane.start + (lane.end - lane.start) * (self.s / lane.length)
+        yaw = math.degrees(math.atan2(lane.end[1] - lane.start[1], lane.end[0] - lane.start[0]))
+        self.transform = SimpleNamespace(location=FakeLocation(*location), rotation=SimpleNamespace(roll=0.0, pitch=0.0, yaw=yaw))
+
+class FakeMap:
+    """
+    Stand in for the parts of carla.Map a GlobalRoutePlanner uses once its compact route graph is cached
+    """
+    def __init__(self, lanes : List[FakeLane]):
+        self.lanes = lanes
+        self._lanes = {(lane.road_id, lane.lane_id): lane for lane in lanes}
+
+    def get_topology(self):
+        return [(lane.waypoint(0.0), lane.waypoint(lane.length)) for lane in self.lanes]
+
+    def get_waypoint_xodr(self, road_id : int, lane_id : int, s : float):
+        lane = self._lanes.get((road_id, lane_id))
+        if lane is None or not 0.0 <= s <= lane.length:
+            return None
+        return lane.waypoint(s)
+
+    def get_waypoint(self, location):
+        # Projects the location onto the closest lane
+        point = np.array([location.x, location.y, location.z])
+        closest_distance, closest_waypoint = np.inf, None
+        for lane in self.lanes:
+            direction = (lane.end - lane.start) / lane.length
+            s = float(np.clip(np.dot(point - lane.start, direction), 0.0, lane.length))
+            distance = np.linalg.norm(lane.start + direction * s - point)
+            if distance < closest_distance:
+                closest_distance, closest_waypoint = distance, lane.waypoint(s)
+        return closest_waypoint
+
+def grid_map(size : int = 4, spacing : float = 20.0) -> FakeMap:
+    """
+    size x size grid of one way lanes between neighbouring nodes, rows and columns alternate their direction
+    (even rows go +x, odd rows -x, odd columns +y, even columns -y) so that every node reaches every other node.
+    """
+    lanes = []
+    road_id = 0
+    for j in range(size):
+        for i in range(size - 1):
+            start, end = (i * spacing, j * spacing, 0.0), ((i + 1) * spacing, j * spacing, 0.0)
+            lanes.append(FakeLane(road_id, -1, start, end) if j % 2 == 0 else FakeLane(road_id, -1, end, start))
+            road_id += 1
+    for i in range(size):
+        for j in range(size - 1):
+            start, end = (i * spacing, j * spacing, 0.0), (i * spacing, (j + 1) * spacing, 0.0)
+            lanes.append(FakeLane(road_id, -1, start, end) if i % 2 == 1 else FakeLane(road_id, -1, end, start))
+            road_id += 1
+    return FakeMap(lanes)
+
+def build_route_graph(fake_map : FakeMap, sampling_resolution : float) -> Tuple[nx.DiGraph, Dict]:
+    """
+    networkx graph and road_id_to_edge of a FakeMap, laid out like GlobalRoutePlanner._build_topology / _build_graph
+    """
+    graph = nx.DiGraph()
+    id_map = {}
+    road_id_to_edge = {}
+    for lane, (entry_wp, exit_wp) in zip(fake_map.lanes, fake_map.get_topology()):
+        path = []
+        s = sampling_resolution
+        while lane.length - s > sampling_resolution:
+            path.append(lane.waypoint(s))
+            s += sampling_resolution
+        node_ids = []
+        for waypoint in entry_wp, exit_wp:
+            location = waypoint.transform.location
+            vertex = tuple(np.round([location.x, location.y, location.z], 0))
+            if vertex not in id_map:
+                id_map[vertex] = len(id_map)
+                graph.add_node(id_map[vertex], vertex=vertex)
+            node_ids.append(id_map[vertex])
+        n1, n2 = node_ids
+        road_id_to_edge.setdefault(lane.road_id, {}).setdefault(lane.section_id, {})[lane.lane_id] = (n1, n2)
+        direction = (lane.end - lane.start) / lane.length
+        graph.add_edge(
+            n1, n2,
+            length=len(path) + 1, path=path,
+            entry_waypoint=entry_wp, exit_waypoint=exit_wp,
+            entry_vector=direction, exit_vector=direction, net_vector=direction,
+            intersection=lane.is_junction, type=RoadOption.LANEFOLLOW)
+    return graph, road_id_to_edge
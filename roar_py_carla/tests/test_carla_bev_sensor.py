@@ -0,0 +1,98 @@
+import fnmatch
+import numpy as np
+from types import SimpleNamespace
+from roar_py_interface import RoarPyOccupancyMapProducer, RoarPyWaypointArray
+from roar_py_interface.worlds.bev import RoarPyBEVProducer, box_quads
+from roar_py_carla.sensors.carla_bev_sensor import RoarPyCarlaBEVSensor
+
+def _carla_transform(x : float, y : float, yaw_degrees : float):
+    return SimpleNamespace(
+        location=SimpleNamespace(x=x, y=y, z=0.0),
+        rotation=SimpleNamespace(roll=0.0, pitch=0.0, yaw=yaw_degrees)
+    )
+
+class FakeActor:
+    def __init__(self, actor_id : int, type_id : str, transform, bounding_box=None):
+        self.id = actor_id
+        self.type_id = type_id
+        self.transform = transform
+        self.bounding_box = bounding_box
+
+    def get_transform(self):
+        raise AssertionError("per actor transform RPC")
+
+class FakeActorList(list):
+    def filter(self, pattern : str) -> "FakeActorList":
+        return FakeActorList(actor for actor in self if fnmatch.fnmatch(actor.type_id, pattern))
+
+class FakeSnapshot:
+    def __init__(self, actors):
+        self._actors = {actor.id: SimpleNamespace(id=actor.id, get_transform=lambda actor=actor: actor.transform) for actor in actors}
+
+    def __iter__(self):
+        return iter(self._actors.values())
+
+    def find(self, actor_id : int):
+        return self._actors.get(actor_id)
+
+class FakeWorld:
+    def __init__(self, actors):
+        self.actors = actors
+        self.get_actors_calls = 0
+
+    def get_snapshot(self):
+        return FakeSnapshot(self.actors)
+
+    def get_actors(self):
+        self.get_actors_calls += 1
+        return FakeActorList(self.actors)
+
+def _vehicle(actor_id : int, x : float, y : float, yaw_degrees : float) -> FakeActor:
+    bounding_box = SimpleNamespace(location=SimpleNamespace(x=0.5, y=0.2), extent=SimpleNamespace(x=2.0, y=1.0))
+    return FakeActor(actor_id, "vehicle.tesla.model3", _carla_transform(x, y, yaw_degrees), bounding_box)
+
+def _expected_quads(vehicles):
+    # ROAR frame: y and yaw flip, the box center is offset in the frame of its vehicle
+    yaws = np.array([-np.deg2rad(vehicle.transform.rotation.yaw) for vehicle in vehicles])
+    centers = np.array([
+        (vehicle.transform.location.x + np.cos(yaw) * 0.5 + np.sin(yaw) * 0.2, -vehicle.transform.location.y + np.sin(yaw) * 0.5 - np.cos(yaw) * 0.2)
+        for vehicle, yaw in zip(vehicles, yaws)
+    ])
+    return box_quads(centers, np.tile([2.0, 1.0], (len(vehicles), 1)), yaws)
+
+def test_other_vehicle_quads_read_the_snapshot():
+    angles = np.linspace(0.0, 2 * np.pi, 100, endpoint=False)
+    waypoints = RoarPyWaypointArray(
+        np.stack([30 * np.cos(angles), 30 * np.sin(angles), np.zeros_like(angles)], axis=1),
+        np.stack([np.zeros_like(angles), np.zeros_like(angles), angles + np.pi / 2], axis=1),
+        np.full(100, 4.0)
+    )
+    producer = RoarPyBEVProducer(RoarPyOccupancyMapProducer(waypoints, 64, 64, 40.0, 40.0))
+    ego = _vehicle(1, 0.0, 0.0, 0.0)
+    near, far = _vehicle(2, 5.0, -3.0, 30.0), _vehicle(3, 500.0, 0.0, 0.0)
+    world = FakeWorld([ego, near, far, FakeActor(4, "walker.pedestrian.0001", _carla_transform(1.0, 1.0, 0.0))])
+    actor = SimpleNamespace(carla_id=ego.id, _get_native_carla_world=lambda: world)
+    sensor = RoarPyCarlaBEVSensor(producer, actor, route_distance=10.0)
+
+    location_2d = np.zeros(2)
+    quads = sensor._other_vehicle_quads(location_2d)
+    # The ego vehicle and the walker are skipped, the far vehicle is out of view
+    np.testing.assert_allclose(quads, _expected_quads([near]), atol=1e-5)
+    assert world.get_actors_calls == 1
+
+    # Moving vehicles are read from the next snapshot without refreshing the vehicle list
+    near.transform = _carla_transform(8.0, 2.0, -45.0)
+    np.testing.assert_allclose(sensor._other_vehicle_quads(location_2d), _expected_quads([near]), atol=1e-5)
+    assert world.get_actors_calls == 1
+
+    # A spawn refreshes it
+    spawned = _vehicle(5, -4.0, 6.0, 90.0)
+    world.actors.append(spawned)
+    np.testing.assert_allclose(sensor._other_vehicle_quads(location_2d), _expected_quads([near, spawned]), atol=1e-5)
+    assert world.get_actors_calls == 2
+
+    # So does a despawn
+    world.actors.remove(near)
+    world.actors.remove(spawned)
+    assert sensor._other_vehicle_quads(location_2d).shape == (0, 4, 2)
+    assert world.get_actors_calls == 3
@@ -0,0 +1,167 @@
+import threading
+import numpy as np
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from roar_py_carla.sensors.carla_frame_pipeline import RoarPyCarlaFrameConversionPipeline, RoarPyCarlaLatencyCounter
+
+FRAME_NUM_BYTES = 8
+
+class ManualExecutor:
+    """
+    Executor that queues the submitted calls until run_pending() runs them on the calling thread
+    """
+    def __init__(self):
+        self.calls = []
+        self.shut_down = False
+
+    def submit(self, fn, *args):
+        if self.shut_down:
+            raise RuntimeError("cannot schedule new futures after shutdown")
+        self.calls.append((fn, args))
+
+    def run_pending(self):
+        calls, self.calls = self.calls, []
+        for fn, args in calls:
+            fn(*args)
+
+def _frame(value : int) -> bytes:
+    return bytes([value]) * FRAME_NUM_BYTES
+
+def _convert(buffer : np.ndarray) -> int:
+    # The buffer is reused after the conversion, keep a value only
+    assert np.all(buffer == buffer[0])
+    return int(buffer[0])
+
+def test_converts_frames_in_order_on_the_executor():
+    executor = ManualExecutor()
+    converted = []
+    pipeline = RoarPyCarlaFrameConversionPipeline(_convert, FRAME_NUM_BYTES, on_converted=converted.append, executor=executor)
+
+    raw = bytearray(_frame(1))
+    pipeline.submit(raw)
+    # The frame is copied in submit, changing the raw buffer afterwards does not change it
+    raw[:] = _frame(9)
+    pipeline.submit(_frame(2))
+    assert converted == [] and pipeline.latest is None
+    # One drain handles the whole queue
+    assert len(executor.calls) == 1
+
+    executor.run_pending()
+    assert converted == [1, 2]
+    assert pipeline.latest == 2
+
+    pipeline.submit(_frame(3))
+    executor.run_pending()
+    assert converted == [1, 2, 3]
+
+def test_full_queue_drops_the_oldest_frames():
+    executor = ManualExecutor()
+    converted = []
+    pipeline = RoarPyCarlaFrameConversionPipeline(_convert, FRAME_NUM_BYTES, on_converted=converted.append, max_pending_frames=2, executor=executor)
+    for value in range(1, 6):
+        pipeline.submit(_frame(value))
+    executor.run_pending()
+
+    assert converted == [4, 5]
+    stats = pipeline.get_stats()
+    assert stats.frames_received == 5
+    assert stats.frames_dropped == 3
+    assert stats.frames_converted == 2
+    assert stats.frames_failed == 0
+    # Dropped and converted frames hand their buffers back to the pool, so a full queue plus the frame
+    # being copied in is all that is ever allocated
+    assert len(pipeline._free_buffers) == 3
+
+def test_stats_counters_and_latencies():
+    executor = ManualExecutor()
+    pipeline = RoarPyCarlaFrameConversionPipeline(_convert, FRAME_NUM_BYTES, executor=executor)
+    for value in range(3):
+        pipeline.submit(_frame(value))
+        executor.run_pending()
+
+    stats = pipeline.get_stats()
+    assert (stats.frames_received, stats.frames_converted, stats.frames_dropped, stats.frames_failed) == (3, 3, 0, 0)
+    assert stats.copy_latency.count == 3
+    for latency in (stats.queue_latency, stats.convert_latency, stats.total_latency):
+        assert latency.count == 3
+        assert 0.0 <= latency.mean <= latency.max
+    assert stats.total_latency.max >= stats.convert_latency.max
+    # get_stats hands out a snapshot
+    stats.frames_received = 100
+    assert pipeline.get_stats().frames_received == 3
+
+def test_failed_conversion_reaches_on_failed_and_the_worker_goes_on():
+    executor = ManualExecutor()
+    error = ValueError("corrupt frame")
+    def convert(buffer):
+        if buffer[0] == 2:
+            raise error
+        return _convert(buffer)
+    converted, failures = [], []
+    pipeline = RoarPyCarlaFrameConversionPipeline(
+        convert, FRAME_NUM_BYTES, on_converted=converted.append, max_pending_frames=3, executor=executor, on_failed=failures.append
+    )
+    for value in (1, 2, 3):
+        pipeline.submit(_frame(value))
+    executor.run_pending()
+
+    assert failures == [error]
+    assert converted == [1, 3]
+    assert pipeline.latest == 3
+    stats = pipeline.get_stats()
+    assert stats.frames_failed == 1
+    assert stats.frames_converted == 2
+
+    # The pipeline keeps draining new frames after a failure
+    pipeline.submit(_frame(4))
+    executor.run_pending()
+    assert converted == [1, 3, 4]
+
+def test_closed_pipeline_ignores_frames():
+    executor = ManualExecutor()
+    converted = []
+    pipeline = RoarPyCarlaFrameConversionPipeline(_convert, FRAME_NUM_BYTES, on_converted=converted.append, executor=executor)
+    pipeline.submit(_frame(1))
+    pipeline.close()
+    pipeline.submit(_frame(2))
+    executor.run_pending()
+    assert converted == []
+    assert pipeline.get_stats().frames_received == 1
+
+def test_shut_down_executor_does_not_wedge_the_pipeline():
+    executor = ManualExecutor()
+    executor.shut_down = True
+    pipeline = RoarPyCarlaFrameConversionPipeline(_convert, FRAME_NUM_BYTES, executor=executor)
+    pipeline.submit(_frame(1))
+    assert not pipeline._draining
+
+    executor.shut_down = False
+    pipeline.submit(_frame(2))
+    executor.run_pending()
+    assert pipeline.latest == 2
+
+def test_thread_pool_executor():
+    done = threading.Event()
+    converted = []
+    def on_converted(value):
+        converted.append(value)
+        if value == 9:
+            done.set()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        pipeline = RoarPyCarlaFrameConversionPipeline(_convert, FRAME_NUM_BYTES, on_converted=on_converted, max_pending_frames=10, executor=executor)
+        for value in range(10):
+            pipeline.submit(_frame(value))
+        assert done.wait(5.0)
+    # Never more than one drain runs, so the frames come out in order
+    assert converted == list(range(10))
+
+def test_latency_counter():
+    counter = RoarPyCarlaLatencyCounter()
+    assert counter.mean == 0.0
+    for seconds in (0.3, 0.1, 0.2):
+        counter.record(seconds)
+    assert counter.count == 3
+    assert counter.total == pytest.approx(0.6)
+    assert counter.mean == pytest.approx(0.2)
+    assert counter.last == 0.2
+    assert counter.max == 0.3
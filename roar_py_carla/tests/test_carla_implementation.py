@@ -47,7 +47,8 @@ def carla_vehicle(carla_instance: RoarPyCarlaInstance) -> RoarPyCarlaVehicle:
     roar_py_interface.RoarPyCameraSensorDataRGB,
     roar_py_interface.RoarPyCameraSensorDataGreyscale,
     roar_py_interface.RoarPyCameraSensorDataDepth,
-    roar_py_interface.RoarPyCameraSensorDataSemanticSegmentation
+    roar_py_interface.RoarPyCameraSensorDataSemanticSegmentation,
+    roar_py_interface.RoarPyCameraSensorDataInstanceSegmentation
 ])
 @pytest.mark.parametrize("image_size", [
     (64, 64),
@@ -178,6 +179,42 @@ async def test_lidar_sensor(
 
     lidar_sensor.close()
 
+@pytest.mark.parametrize("is_async", [
+    True,
+    False
+])
+@pytest.mark.parametrize("image_size", [
+    (64, 64),
+    (256, 256)
+])
+@pytest.mark.asyncio
+async def test_bev_sensor(
+    carla_instance : RoarPyCarlaInstance,
+    carla_vehicle : RoarPyCarlaVehicle,
+    is_async : bool,
+    image_size : Tuple[int, int],
+    num_frames : int = 10
+):
+    carla_instance.world.set_asynchronous(is_async)
+    carla_instance.world.set_control_steps(0.1, 0.05)
+
+    bev_sensor = carla_vehicle.attach_bev_sensor(
+        image_size[0],
+        image_size[1],
+        50.0,
+        50.0
+    )
+
+    assert bev_sensor is not None
+    obs_spec = bev_sensor.get_gym_observation_spec()
+    for _ in range(num_frames):
+        await carla_instance.world.step()
+        bev : roar_py_interface.RoarPyBEVSensorData = await bev_sensor.receive_observation()
+        assert bev.bev.shape == (image_size[1], image_size[0], len(bev.channel_names))
+        assert obs_spec.contains(bev_sensor.get_last_gym_observation())
+
+    bev_sensor.close()
+
 @pytest.mark.parametrize("is_async", [
     True,
     False
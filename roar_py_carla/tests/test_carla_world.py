@@ -0,0 +1,160 @@
+import os
+import threading
+import numpy as np
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from roar_py_interface import RoarPyWaypointArray
+from roar_py_carla.carla_agents.navigation.compact_route_graph import CompactRouteGraph
+from roar_py_carla.carla_agents.navigation.global_route_planner import GlobalRoutePlanner
+from roar_py_carla.worlds import carla_world
+from roar_py_carla.worlds.carla_world import RoarPyCarlaWorld
+from conftest import FakeLane, FakeLocation, FakeMap, grid_map, build_route_graph
+
+BUNDLED_ASSET_DIR = RoarPyCarlaWorld.ASSET_DIR
+
+def _world(map_name : str) -> RoarPyCarlaWorld:
+    # Only the asset / waypoint code paths are exercised, which need no CARLA connection
+    world = RoarPyCarlaWorld.__new__(RoarPyCarlaWorld)
+    world.map_name = map_name
+    return world
+
+@pytest.fixture(autouse=True)
+def no_generation(monkeypatch : pytest.MonkeyPatch, tmp_path):
+    monkeypatch.setenv("ROAR_PY_CACHE_DIR", str(tmp_path / "cache"))
+    def generate(self, *args, **kwargs):
+        raise AssertionError("waypoints generated instead of loaded")
+    monkeypatch.setattr(RoarPyCarlaWorld, "generate_maneuverable_waypoints", generate)
+
+def _buffer_owner(array : np.ndarray) -> np.ndarray:
+    while array.base is not None and isinstance(array.base, np.ndarray) and not isinstance(array, np.memmap):
+        array = array.base
+    return array
+
+def _waypoint_arrays(num_waypoints : int, offset : float) -> dict:
+    return {
+        "locations": np.arange(num_waypoints * 3, dtype=np.float64).reshape(-1, 3) + offset,
+        "rotations": np.zeros((num_waypoints, 3)),
+        "lane_widths": np.full(num_waypoints, 4.0)
+    }
+
+@pytest.mark.parametrize("map_name", ["Monza", "BerkMajor"])
+def test_bundled_waypoint_assets_are_memory_mapped(map_name : str):
+    asset_dir = os.path.join(BUNDLED_ASSET_DIR, "waypoints", map_name)
+    assert sorted(os.listdir(asset_dir)) == ["lane_widths.npy", "locations.npy", "rotations.npy"]
+
+    waypoints = _world(map_name).maneuverable_waypoints
+    assert isinstance(waypoints, RoarPyWaypointArray)
+    assert len(waypoints) > 1000
+    assert waypoints.locations.shape == waypoints.roll_pitch_yaws.shape == (len(waypoints), 3)
+    assert waypoints.lane_widths.shape == (len(waypoints),)
+    # Read-only views of memory maps of the asset files, not copies
+    assert not waypoints.locations.flags.writeable
+    assert isinstance(_buffer_owner(waypoints.locations), np.memmap)
+    np.testing.assert_array_equal(waypoints.locations, np.load(os.path.join(asset_dir, "locations.npy")))
+    assert np.all(np.isfinite(waypoints.locations)) and np.all(waypoints.lane_widths > 0)
+
+def test_bundled_spawn_point_assets():
+    spawn_points = _world("BerkMajor").spawn_points
+    locations = np.load(os.path.join(BUNDLED_ASSET_DIR, "spawn_points", "BerkMajor", "locations.npy"))
+    assert len(spawn_points) == len(locations) > 0
+    for (location, rotation), expected_location in zip(spawn_points, locations):
+        assert location.shape == rotation.shape == (3,)
+        np.testing.assert_array_equal(location, expected_location)
+
+def test_waypoint_directory_takes_precedence_over_npz(monkeypatch : pytest.MonkeyPatch, tmp_path):
+    monkeypatch.setattr(RoarPyCarlaWorld, "ASSET_DIR", str(tmp_path))
+    RoarPyWaypointArray.save_waypoint_dir(RoarPyWaypointArray.load_waypoint_list(_waypoint_arrays(5, 0.0)), str(tmp_path / "waypoints" / "Town01"))
+    np.savez(str(tmp_path / "waypoints" / "Town01.npz"), **_waypoint_arrays(7, 100.0))
+    np.savez(str(tmp_path / "waypoints" / "Town02.npz"), **_waypoint_arrays(7, 100.0))
+
+    from_dir = _world("Town01").maneuverable_waypoints
+    assert len(from_dir) == 5
+    np.testing.assert_array_equal(from_dir.locations, _waypoint_arrays(5, 0.0)["locations"])
+    # An .npz file dropped into the asset directory still loads
+    from_npz = _world("Town02").maneuverable_waypoints
+    assert len(from_npz) == 7
+    np.testing.assert_array_equal(from_npz.locations, _waypoint_arrays(7, 100.0)["locations"])
+
+SAMPLING_RESOLUTION = 2.0
+
+def _route_map() -> FakeMap:
+    # The grid plus a lane that cannot be reached from it, nor reach it
+    return FakeMap(grid_map().lanes + [FakeLane(100, -1, (200.0, 200.0, 0.0), (240.0, 200.0, 0.0))])
+
+def _planner(fake_map : FakeMap, tmp_path) -> GlobalRoutePlanner:
+    graph, road_id_to_edge = build_route_graph(fake_map, SAMPLING_RESOLUTION)
+    cache_file = str(tmp_path / "route_graph.npz")
+    CompactRouteGraph.from_networkx(
+        graph, road_id_to_edge, SAMPLING_RESOLUTION, GlobalRoutePlanner._topology_fingerprint(fake_map)
+    ).save(cache_file)
+    return GlobalRoutePlanner(fake_map, SAMPLING_RESOLUTION, cache_file)
+
+@pytest.fixture
+def tracing_world(monkeypatch : pytest.MonkeyPatch, tmp_path) -> RoarPyCarlaWorld:
+    # ROAR locations have the y axis of CARLA flipped
+    monkeypatch.setattr(carla_world, "location_to_carla", lambda location: FakeLocation(location[0], -location[1], location[2]))
+    world = _world("Grid")
+    world._native_route_tracer = _planner(_route_map(), tmp_path)
+    return world
+
+def _location_pairs() -> list:
+    rng = np.random.default_rng(0)
+    # Points along random lanes of the grid, in the ROAR frame
+    lanes = grid_map().lanes
+    points = []
+    for lane_idx, fraction in zip(rng.integers(0, len(lanes), 16), rng.uniform(0.0, 1.0, 16)):
+        location = lanes[lane_idx].start + (lanes[lane_idx].end - lanes[lane_idx].start) * fraction
+        points.append(np.array([location[0], -location[1], location[2]]))
+    pairs = [(points[i], points[(i + 1) % len(points)]) for i in range(len(points))]
+    # No route to the isolated lane
+    pairs.insert(5, (points[0], np.array([220.0, -200.0, 0.0])))
+    return pairs
+
+@pytest.mark.parametrize("max_workers", [2, 4, 32])
+def test_parallel_trace_matches_serial(tracing_world : RoarPyCarlaWorld, max_workers : int):
+    pairs = _location_pairs()
+    serial_progress, parallel_progress = [], []
+    serial = tracing_world._trace_waypoints(pairs, lambda *progress: serial_progress.append(progress), max_workers=1)
+    progress_threads = set()
+    def on_progress(*progress):
+        parallel_progress.append(progress)
+        progress_threads.add(threading.get_ident())
+    parallel = tracing_world._trace_waypoints(pairs, on_progress, max_workers=max_workers)
+
+    assert len(serial) == len(parallel) == len(pairs)
+    assert serial[5] is None and parallel[5] is None
+    for serial_waypoints, parallel_waypoints in zip(serial, parallel):
+        if serial_waypoints is None:
+            assert parallel_waypoints is None
+            continue
+        assert len(serial_waypoints) > 0
+        np.testing.assert_array_equal(parallel_waypoints.locations, serial_waypoints.locations)
+        np.testing.assert_array_equal(parallel_waypoints.roll_pitch_yaws, serial_waypoints.roll_pitch_yaws)
+        np.testing.assert_array_equal(parallel_waypoints.lane_widths, serial_waypoints.lane_widths)
+    # Progress is reported once per route, from the calling thread
+    expected_progress = [(i, len(pairs)) for i in range(1, len(pairs) + 1)]
+    assert serial_progress == parallel_progress == expected_progress
+    assert progress_threads == {threading.get_ident()}
+
+def test_concurrent_trace_route_keeps_turn_decisions_apart(tmp_path):
+    # trace_route keeps its turn decision state per thread, interleaved traces on one planner match sequential ones
+    fake_map = FakeMap([
+        FakeLane(0, -1, (0.0, 0.0, 0.0), (20.0, 0.0, 0.0)),
+        FakeLane(1, -1, (20.0, 0.0, 0.0), (40.0, 0.0, 0.0), is_junction=True),
+        FakeLane(2, -1, (20.0, 0.0, 0.0), (20.0, 20.0, 0.0), is_junction=True),
+        FakeLane(3, -1, (20.0, 0.0, 0.0), (20.0, -20.0, 0.0), is_junction=True),
+        FakeLane(4, -1, (40.0, 0.0, 0.0), (60.0, 0.0, 0.0)),
+        FakeLane(5, -1, (20.0, 20.0, 0.0), (20.0, 40.0, 0.0)),
+        FakeLane(6, -1, (20.0, -20.0, 0.0), (20.0, -40.0, 0.0)),
+    ])
+    planner = _planner(fake_map, tmp_path)
+    origin = FakeLocation(10.0, 0.0, 0.0)
+    destinations = [FakeLocation(*destination, 0.0) for destination in ((50.0, 0.0), (20.0, 30.0), (20.0, -30.0))] * 8
+
+    def trace(destination):
+        return [(waypoint.road_id, waypoint.lane_id, waypoint.s, road_option) for waypoint, road_option in planner.trace_route(origin, destination)]
+    sequential = [trace(destination) for destination in destinations]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        concurrent = list(executor.map(trace, destinations))
+    assert concurrent == sequential
+    assert len(set(map(tuple, sequential))) == 3
@@ -0,0 +1,108 @@
+import numpy as np
+import networkx as nx
+import pytest
+from roar_py_carla.carla_agents.navigation.compact_route_graph import CompactRouteGraph
+from roar_py_carla.carla_agents.navigation.global_route_planner import RoadOption
+from conftest import grid_map, build_route_graph
+
+SAMPLING_RESOLUTION = 2.0
+
+@pytest.fixture
+def route_graph():
+    graph, road_id_to_edge = build_route_graph(grid_map(), SAMPLING_RESOLUTION)
+    # A zero length lane change link, a cheap diagonal shortcut and a node nothing reaches
+    for n1, n2, length, road_option in ((0, 5, 0, RoadOption.CHANGELANELEFT), (5, 15, 3, RoadOption.LANEFOLLOW)):
+        entry_wp = graph.edges[next(iter(graph.out_edges(n1)))]['entry_waypoint']
+        exit_wp = graph.edges[next(iter(graph.in_edges(n2)))]['exit_waypoint']
+        graph.add_edge(
+            n1, n2, length=length, path=[], entry_waypoint=entry_wp, exit_waypoint=exit_wp,
+            exit_vector=None, intersection=False, type=road_option)
+    graph.add_node(len(graph), vertex=(100.0, 100.0, 0.0))
+    return graph, road_id_to_edge
+
+def _distance_heuristic(graph):
+    def heuristic(n1, n2):
+        return np.linalg.norm(np.array(graph.nodes[n1]['vertex']) - np.array(graph.nodes[n2]['vertex']))
+    return heuristic
+
+def test_astar_path_matches_networkx(route_graph):
+    graph, road_id_to_edge = route_graph
+    compact_graph = CompactRouteGraph.from_networkx(graph, road_id_to_edge, SAMPLING_RESOLUTION)
+    isolated_node = len(graph) - 1
+    for source in range(isolated_node):
+        for target in range(isolated_node):
+            expected = nx.astar_path(graph, source, target, heuristic=_distance_heuristic(graph), weight='length')
+            path = compact_graph.astar_path(source, target)
+            assert path == expected
+            assert nx.path_weight(graph, path, 'length') == nx.path_weight(graph, expected, 'length')
+        with pytest.raises(nx.NetworkXNoPath):
+            compact_graph.astar_path(source, isolated_node)
+    with pytest.raises(nx.NodeNotFound):
+        compact_graph.astar_path(0, 1000)
+
+def test_shortest_path_tree_matches_networkx(route_graph):
+    graph, road_id_to_edge = route_graph
+    compact_graph = CompactRouteGraph.from_networkx(graph, road_id_to_edge, SAMPLING_RESOLUTION)
+    for source in (0, 5, 10):
+        expected = nx.single_source_dijkstra_path_length(graph, source, weight='length')
+        distances, parents = compact_graph.shortest_path_tree(source)
+        for node_id in graph.nodes:
+            assert distances[compact_graph.node_index(node_id)] == expected.get(node_id, np.inf)
+            if node_id in expected:
+                path = compact_graph.tree_path(parents, node_id)
+                assert path[0] == source and path[-1] == node_id
+                assert nx.path_weight(graph, path, 'length') == expected[node_id]
+
+def test_edges_keep_networkx_attributes(route_graph):
+    graph, road_id_to_edge = route_graph
+    compact_graph = CompactRouteGraph.from_networkx(graph, road_id_to_edge, SAMPLING_RESOLUTION)
+    for n1, n2, edge in graph.edges(data=True):
+        k = compact_graph.edge_index(n1, n2)
+        assert compact_graph.edge_types[k] == edge['type'].value
+        waypoints = [edge['entry_waypoint']] + edge['path'] + [edge['exit_waypoint']]
+        start, end = compact_graph.edge_waypoint_range(n1, n2)
+        assert end - start == len(waypoints)
+        np.testing.assert_allclose(compact_graph.edge_waypoint_locations(n1, n2), [
+            (waypoint.transform.location.x, waypoint.transform.location.y, waypoint.transform.location.z) for waypoint in waypoints
+        ], atol=1e-5)
+        np.testing.assert_array_equal(compact_graph.edge_waypoint_lanes[start:end], [
+            (waypoint.road_id, waypoint.section_id, waypoint.lane_id) for waypoint in waypoints
+        ])
+        np.testing.assert_array_equal(compact_graph.edge_waypoint_s[start:end], [waypoint.s for waypoint in waypoints])
+        if edge['exit_vector'] is None:
+            assert np.isnan(compact_graph.edge_exit_vectors[k]).all()
+            assert np.isnan(compact_graph.edge_net_vectors[k]).all()
+        else:
+            np.testing.assert_array_equal(compact_graph.edge_exit_vectors[k], edge['exit_vector'])
+            np.testing.assert_array_equal(compact_graph.edge_net_vectors[k], edge['net_vector'])
+    for n1 in graph.nodes:
+        assert [neighbor for neighbor, _ in compact_graph.successors(n1)] == list(graph.successors(n1))
+
+def test_npz_round_trip(route_graph, tmp_path):
+    graph, road_id_to_edge = route_graph
+    compact_graph = CompactRouteGraph.from_networkx(graph, road_id_to_edge, SAMPLING_RESOLUTION, "topology hash")
+    cache_file = str(tmp_path / "route_graph.npz")
+    compact_graph.save(cache_file)
+    loaded = CompactRouteGraph.load(cache_file)
+
+    assert loaded.sampling_resolution == SAMPLING_RESOLUTION
+    assert loaded.topology_fingerprint == "topology hash"
+    for name in (
+        'node_ids', 'node_xyz', 'indptr', 'indices', 'edge_lengths', 'edge_types', 'edge_intersection',
+        'edge_exit_vectors', 'edge_net_vectors', 'edge_waypoint_indptr', 'edge_waypoint_xyz',
+        'edge_waypoint_lanes', 'edge_waypoint_s', 'road_keys', 'road_edges'
+    ):
+        np.testing.assert_array_equal(getattr(loaded, name), getattr(compact_graph, name))
+    assert loaded.road_edge(3, 0, -1) == road_id_to_edge[3][0][-1]
+    assert loaded.astar_path(0, 15) == compact_graph.astar_path(0, 15)
+
+def test_load_rejects_other_format_version(route_graph, tmp_path):
+    graph, road_id_to_edge = route_graph
+    cache_file = str(tmp_path / "route_graph.npz")
+    CompactRouteGraph.from_networkx(graph, road_id_to_edge, SAMPLING_RESOLUTION).save(cache_file)
+    with np.load(cache_file) as data:
+        arrays = dict(data)
+    arrays['format_version'] = np.array(CompactRouteGraph.FORMAT_VERSION - 1)
+    np.savez(cache_file, **arrays)
+    with pytest.raises(ValueError):
+        CompactRouteGraph.load(cache_file)
@@ -0,0 +1,200 @@
+import numpy as np
+import networkx as nx
+import pytest
+from roar_py_carla.carla_agents.navigation.compact_route_graph import CompactRouteGraph
+from roar_py_carla.carla_agents.navigation.global_route_planner import GlobalRoutePlanner, RoadOption
+from conftest import FakeLane, FakeLocation, FakeMap, grid_map, build_route_graph
+
+SAMPLING_RESOLUTION = 2.0
+
+@pytest.fixture
+def fake_map():
+    return grid_map()
+
+def _cached_planner(fake_map, tmp_path, monkeypatch, route_graph=None):
+    """
+    GlobalRoutePlanner loaded from a cached compact graph of the map (or of the given graph and road_id_to_edge),
+    building the networkx graph fails the test
+    """
+    graph, road_id_to_edge = build_route_graph(fake_map, SAMPLING_RESOLUTION) if route_graph is None else route_graph
+    cache_file = str(tmp_path / "route_graph.npz")
+    CompactRouteGraph.from_networkx(
+        graph, road_id_to_edge, SAMPLING_RESOLUTION, GlobalRoutePlanner._topology_fingerprint(fake_map)
+    ).save(cache_file)
+
+    def ensure_graph(planner):
+        raise AssertionError("networkx graph built on a cache hit")
+    monkeypatch.setattr(GlobalRoutePlanner, "_ensure_graph", ensure_graph)
+    return GlobalRoutePlanner(fake_map, SAMPLING_RESOLUTION, cache_file)
+
+@pytest.fixture
+def cached_planner(fake_map, tmp_path, monkeypatch):
+    return _cached_planner(fake_map, tmp_path, monkeypatch)
+
+def test_trace_route_from_cache_without_networkx(fake_map, cached_planner):
+    origin, destination = FakeLocation(10.0, 0.0, 0.0), FakeLocation(50.0, 60.0, 0.0)
+    route_trace = cached_planner.trace_route(origin, destination)
+    assert cached_planner._graph is None
+    assert all(road_option == RoadOption.LANEFOLLOW for _, road_option in route_trace)
+
+    # The waypoints of the edges along the networkx route, from the origin to the first one close to the destination
+    graph, _ = build_route_graph(fake_map, SAMPLING_RESOLUTION)
+    node_at = {tuple(graph.nodes[n]['vertex']): n for n in graph.nodes}
+    def heuristic(n1, n2):
+        return np.linalg.norm(np.array(graph.nodes[n1]['vertex']) - np.array(graph.nodes[n2]['vertex']))
+    # The destination lies on the lane from (60, 60) to (40, 60)
+    route = nx.astar_path(graph, node_at[(0.0, 0.0, 0.0)], node_at[(60.0, 60.0, 0.0)], heuristic=heuristic, weight='length')
+    route.append(node_at[(40.0, 60.0, 0.0)])
+    expected = []
+    for n1, n2 in zip(route[:-1], route[1:]):
+        edge = graph.edges[n1, n2]
+        expected += [edge['entry_waypoint']] + edge['path'] + [edge['exit_waypoint']]
+    expected = expected[5:]
+    end = next(i for i, waypoint in enumerate(expected) if waypoint.transform.location.distance(destination) < 2 * SAMPLING_RESOLUTION)
+    expected = expected[:end + 1]
+
+    assert len(route_trace) == len(expected)
+    for (waypoint, _), expected_waypoint in zip(route_trace, expected):
+        assert (waypoint.road_id, waypoint.lane_id, waypoint.s) == (expected_waypoint.road_id, expected_waypoint.lane_id, expected_waypoint.s)
+
+def test_trace_route_turn_decisions(tmp_path, monkeypatch):
+    # A lane ending in a junction that goes straight, to +y or to -y
+    fake_map = FakeMap([
+        FakeLane(0, -1, (0.0, 0.0, 0.0), (20.0, 0.0, 0.0)),
+        FakeLane(1, -1, (20.0, 0.0, 0.0), (40.0, 0.0, 0.0), is_junction=True),
+        FakeLane(2, -1, (20.0, 0.0, 0.0), (20.0, 20.0, 0.0), is_junction=True),
+        FakeLane(3, -1, (20.0, 0.0, 0.0), (20.0, -20.0, 0.0), is_junction=True),
+        FakeLane(4, -1, (40.0, 0.0, 0.0), (60.0, 0.0, 0.0)),
+        FakeLane(5, -1, (20.0, 20.0, 0.0), (20.0, 40.0, 0.0)),
+        FakeLane(6, -1, (20.0, -20.0, 0.0), (20.0, -40.0, 0.0)),
+    ])
+    planner = _cached_planner(fake_map, tmp_path, monkeypatch)
+    origin = FakeLocation(10.0, 0.0, 0.0)
+    # CARLA's y axis points to the right of +x
+    for destination, turn in (((50.0, 0.0), RoadOption.STRAIGHT), ((20.0, 30.0), RoadOption.RIGHT), ((20.0, -30.0), RoadOption.LEFT)):
+        route_trace = planner.trace_route(origin, FakeLocation(*destination, 0.0))
+        road_options = [road_option for _, road_option in route_trace]
+        junction_options = [road_option for waypoint, road_option in route_trace if waypoint.road_id in (1, 2, 3)]
+        assert set(junction_options) == {turn}
+        assert set(road_options) == {RoadOption.LANEFOLLOW, turn}
+    assert planner._graph is None
+
+def test_cache_of_other_topology_is_rebuilt(fake_map, tmp_path, monkeypatch):
+    graph, road_id_to_edge = build_route_graph(fake_map, SAMPLING_RESOLUTION)
+    cache_file = str(tmp_path / "route_graph.npz")
+    CompactRouteGraph.from_networkx(graph, road_id_to_edge, SAMPLING_RESOLUTION, "other topology").save(cache_file)
+
+    def ensure_graph(planner):
+        planner._graph, planner._road_id_to_edge = graph, road_id_to_edge
+    monkeypatch.setattr(GlobalRoutePlanner, "_ensure_graph", ensure_graph)
+    planner = GlobalRoutePlanner(fake_map, SAMPLING_RESOLUTION, cache_file)
+
+    assert planner._graph is graph
+    fingerprint = GlobalRoutePlanner._topology_fingerprint(fake_map)
+    assert planner._compact_graph.topology_fingerprint == fingerprint
+    assert CompactRouteGraph.load(cache_file).topology_fingerprint == fingerprint
+
+def test_topology_fingerprint_tracks_the_lanes(fake_map):
+    fingerprint = GlobalRoutePlanner._topology_fingerprint(fake_map)
+    assert fingerprint == GlobalRoutePlanner._topology_fingerprint(grid_map())
+    assert fingerprint != GlobalRoutePlanner._topology_fingerprint(grid_map(spacing=25.0))
+    assert fingerprint != GlobalRoutePlanner._topology_fingerprint(grid_map(size=3))
+
+def _lane_location(lane, s):
+    return FakeLocation(*(lane.start + (lane.end - lane.start) * (s / lane.length)))
+
+def _reference_distance(graph, road_id_to_edge, origin_lane, origin_s, destination_lane, destination_s):
+    # Every lane of the grid is straight, so the edge distances are the lane lengths
+    a, b = road_id_to_edge[origin_lane.road_id][0][-1]
+    c, _ = road_id_to_edge[destination_lane.road_id][0][-1]
+    if (origin_lane is destination_lane) and destination_s >= origin_s:
+        return destination_s - origin_s
+    lane_length = lambda n1, n2, edge: np.linalg.norm(np.subtract(graph.nodes[n1]['vertex'], graph.nodes[n2]['vertex']))
+    return origin_lane.length - origin_s + nx.shortest_path_length(graph, b, c, weight=lane_length) + destination_s
+
+def test_route_distance_matrix_counts_the_offsets_along_the_edges(fake_map, cached_planner):
+    graph, road_id_to_edge = build_route_graph(fake_map, SAMPLING_RESOLUTION)
+    rng = np.random.default_rng(0)
+    lanes = [fake_map.lanes[k] for k in rng.choice(len(fake_map.lanes), 6, replace=False)]
+    # Points inside the lanes (the nodes are shared by several lanes), the first two on the same lane in both orders
+    points = [(lanes[0], 4.0), (lanes[0], 14.0)] + [(lane, float(rng.uniform(1.0, 19.0))) for lane in lanes[1:]]
+    locations = [_lane_location(lane, s) for lane, s in points]
+
+    distances, paths = cached_planner.route_distance_matrix(locations, locations, return_paths=True)
+    assert distances[0, 1] == pytest.approx(10.0)
+    assert distances[1, 0] > 10.0
+    np.testing.assert_allclose(np.diag(distances), 0.0, atol=1e-9)
+    compact_graph = cached_planner._compact_graph
+    for i, (origin_lane, origin_s) in enumerate(points):
+        for j, (destination_lane, destination_s) in enumerate(points):
+            expected = _reference_distance(graph, road_id_to_edge, origin_lane, origin_s, destination_lane, destination_s)
+            assert distances[i, j] == pytest.approx(expected, abs=1e-6)
+
+            path = paths[i][j]
+            assert tuple(path[:2]) == road_id_to_edge[origin_lane.road_id][0][-1]
+            assert tuple(path[-2:]) == road_id_to_edge[destination_lane.road_id][0][-1]
+            path_distance = sum(compact_graph.edge_distances[compact_graph.edge_index(n1, n2)] for n1, n2 in zip(path[:-2], path[1:-1]))
+            assert path_distance - origin_s + destination_s == pytest.approx(distances[i, j], abs=1e-6)
+
+def test_route_distance_matrix_keeps_the_offset_across_a_lane_change(tmp_path, monkeypatch):
+    left_lane = FakeLane(0, -1, (0.0, 0.0, 0.0), (40.0, 0.0, 0.0))
+    right_lane = FakeLane(0, -2, (0.0, 3.5, 0.0), (40.0, 3.5, 0.0))
+    fake_map = FakeMap([left_lane, right_lane])
+    graph, road_id_to_edge = build_route_graph(fake_map, SAMPLING_RESOLUTION)
+    (n1, _), (n2, _) = road_id_to_edge[0][0][-1], road_id_to_edge[0][0][-2]
+    graph.add_edge(
+        n1, n2, entry_waypoint=left_lane.waypoint(2.0), exit_waypoint=right_lane.waypoint(2.0), intersection=False,
+        exit_vector=None, path=[], length=0, type=RoadOption.CHANGELANERIGHT, change_waypoint=right_lane.waypoint(2.0))
+    planner = _cached_planner(fake_map, tmp_path, monkeypatch, (graph, road_id_to_edge))
+
+    origin = _lane_location(left_lane, 10.0)
+    distances = planner.route_distance_matrix([origin], [_lane_location(right_lane, 25.0), _lane_location(right_lane, 5.0)])
+    assert distances[0, 0] == pytest.approx(3.5 + 25.0 - 10.0)
+    # Behind the origin on the other lane, and nothing leads back
+    assert np.isinf(distances[0, 1])
+
+def test_route_distance_matrix_off_the_network(fake_map, cached_planner, monkeypatch):
+    on_road = FakeLocation(10.0, 0.0, 0.0)
+    monkeypatch.setattr(cached_planner, "_localize", lambda location: None if location is not on_road else GlobalRoutePlanner._localize(cached_planner, location))
+    distances, paths = cached_planner.route_distance_matrix([on_road, FakeLocation(500.0, 0.0, 0.0)], [on_road, FakeLocation(500.0, 0.0, 0.0)], return_paths=True)
+    assert distances[0, 0] == 0.0
+    assert np.isinf(distances[0, 1]) and np.isinf(distances[1, 0]) and np.isinf(distances[1, 1])
+    assert paths[0][1] is None and paths[1][0] is None
+
+def _count_searches(planner, monkeypatch):
+    searches = []
+    search_edge_route = planner._search_edge_route
+    def counted_search_edge_route(start, end):
+        searches.append((start, end))
+        return search_edge_route(start, end)
+    monkeypatch.setattr(planner, "_search_edge_route", counted_search_edge_route)
+    return searches
+
+def test_route_cache_hits_and_eviction(fake_map, cached_planner, monkeypatch):
+    cached_planner._route_cache_size = 2
+    searches = _count_searches(cached_planner, monkeypatch)
+    first, second, third = FakeLocation(10.0, 0.0, 0.0), FakeLocation(50.0, 60.0, 0.0), FakeLocation(0.0, 30.0, 0.0)
+    first_edge, second_edge, third_edge = (cached_planner._localize(location) for location in (first, second, third))
+
+    route = cached_planner._path_search(first, second)
+    assert cached_planner._path_search(first, second) == route
+    assert searches == [(first_edge, second_edge)]
+
+    cached_planner._path_search(first, third)
+    # Hitting the first route makes the second one the least recently used
+    cached_planner._path_search(first, second)
+    cached_planner._path_search(second, third)
+    assert list(cached_planner._route_cache) == [(first_edge, second_edge), (second_edge, third_edge)]
+    assert len(searches) == 3
+
+    cached_planner._path_search(first, third)
+    assert len(searches) == 4
+    assert list(cached_planner._route_cache) == [(second_edge, third_edge), (first_edge, third_edge)]
+
+def test_route_cache_disabled(fake_map, cached_planner, monkeypatch):
+    cached_planner._route_cache_size = 0
+    searches = _count_searches(cached_planner, monkeypatch)
+    origin, destination = FakeLocation(10.0, 0.0, 0.0), FakeLocation(50.0, 60.0, 0.0)
+    assert cached_planner._path_search(origin, destination) == cached_planner._path_search(origin, destination)
+    assert len(searches) == 2
+    assert len(cached_planner._route_cache) == 0
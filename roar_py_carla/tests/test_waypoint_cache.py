@@ -0,0 +1,78 @@
+import os
+import numpy as np
+import pytest
+from roar_py_interface import RoarPyWaypointArray
+from roar_py_carla.utils import waypoint_cache
+from roar_py_carla.utils.waypoint_cache import (
+    waypoint_cache_dir, waypoint_cache_key, route_graph_cache_file,
+    load_cached_waypoints, save_cached_waypoints, load_cached_waypoint_groups, save_cached_waypoint_groups
+)
+
+@pytest.fixture(autouse=True)
+def cache_dir(monkeypatch : pytest.MonkeyPatch, tmp_path) -> str:
+    monkeypatch.setenv("ROAR_PY_CACHE_DIR", str(tmp_path / "cache"))
+    return str(tmp_path / "cache")
+
+def _waypoints(num_waypoints : int, offset : float = 0.0) -> RoarPyWaypointArray:
+    return RoarPyWaypointArray(
+        np.arange(num_waypoints * 3, dtype=np.float64).reshape(-1, 3) + offset,
+        np.zeros((num_waypoints, 3)),
+        np.full(num_waypoints, 3.5)
+    )
+
+def test_cache_files_follow_the_cache_dir(cache_dir : str):
+    assert waypoint_cache_dir() == cache_dir
+    key = waypoint_cache_key("Town01", "<OpenDRIVE/>", 1.0)
+    assert route_graph_cache_file(key) == os.path.join(cache_dir, "route_graph", key + ".npz")
+
+def test_cache_key_invalidation(monkeypatch : pytest.MonkeyPatch):
+    key = waypoint_cache_key("Town01", "<OpenDRIVE/>", 1.0)
+    assert key == waypoint_cache_key("Town01", "<OpenDRIVE/>", 1.0)
+    # Any change of the map, its OpenDRIVE content, the waypoint spacing or the cache version misses the cache
+    assert key != waypoint_cache_key("Town02", "<OpenDRIVE/>", 1.0)
+    assert key != waypoint_cache_key("Town01", "<OpenDRIVE><road/></OpenDRIVE>", 1.0)
+    assert key != waypoint_cache_key("Town01", "<OpenDRIVE/>", 0.5)
+    monkeypatch.setattr(waypoint_cache, "WAYPOINT_CACHE_VERSION", waypoint_cache.WAYPOINT_CACHE_VERSION + 1)
+    assert key != waypoint_cache_key("Town01", "<OpenDRIVE/>", 1.0)
+
+def test_waypoints_round_trip():
+    key = waypoint_cache_key("Town01", "<OpenDRIVE/>", 1.0)
+    assert load_cached_waypoints("maneuverable_waypoints", key) is None
+    waypoints = _waypoints(10)
+    save_cached_waypoints("maneuverable_waypoints", key, waypoints)
+
+    loaded = load_cached_waypoints("maneuverable_waypoints", key)
+    assert isinstance(loaded, RoarPyWaypointArray)
+    np.testing.assert_array_equal(loaded.locations, waypoints.locations)
+    np.testing.assert_array_equal(loaded.roll_pitch_yaws, waypoints.roll_pitch_yaws)
+    np.testing.assert_array_equal(loaded.lane_widths, waypoints.lane_widths)
+    # Kinds and keys are separate entries
+    assert load_cached_waypoints("comprehensive_waypoints", key) is None
+    assert load_cached_waypoints("maneuverable_waypoints", waypoint_cache_key("Town01", "<OpenDRIVE/>", 2.0)) is None
+
+def test_waypoint_groups_round_trip():
+    key = waypoint_cache_key("Town01", "<OpenDRIVE/>", 1.0)
+    groups = {12: _waypoints(3), 7: _waypoints(5, 100.0), 30: _waypoints(1, -50.0)}
+    save_cached_waypoint_groups("comprehensive_waypoints", key, groups)
+
+    loaded = load_cached_waypoint_groups("comprehensive_waypoints", key)
+    # Road ids come back as python ints, in the saved order
+    assert list(loaded.keys()) == [12, 7, 30]
+    assert all(type(road_id) is int for road_id in loaded.keys())
+    for road_id, waypoints in groups.items():
+        np.testing.assert_array_equal(loaded[road_id].locations, waypoints.locations)
+        np.testing.assert_array_equal(loaded[road_id].lane_widths, waypoints.lane_widths)
+
+def test_empty_waypoint_groups_round_trip():
+    key = waypoint_cache_key("Empty", "<OpenDRIVE/>", 1.0)
+    save_cached_waypoint_groups("comprehensive_waypoints", key, {})
+    assert load_cached_waypoint_groups("comprehensive_waypoints", key) == {}
+
+def test_broken_entry_is_regenerated(cache_dir : str):
+    key = waypoint_cache_key("Town01", "<OpenDRIVE/>", 1.0)
+    save_cached_waypoints("maneuverable_waypoints", key, _waypoints(10))
+    os.remove(os.path.join(cache_dir, "maneuverable_waypoints", key, "lane_widths.npy"))
+    assert load_cached_waypoints("maneuverable_waypoints", key) is None
+
+    save_cached_waypoints("maneuverable_waypoints", key, _waypoints(4))
+    assert len(load_cached_waypoints("maneuverable_waypoints", key)) == 4
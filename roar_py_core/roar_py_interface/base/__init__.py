@@ -1 +1,5 @@
-from .sensor import RoarPyRemoteSupportedSensorData, RoarPyRemoteSupportedSensorSerializationScheme, RoarPySensor
\ No newline at end of file
+from .sensor import RoarPyRemoteSupportedSensorData, RoarPyRemoteSupportedSensorSerializationScheme, RoarPySensor
+from .cache import roar_py_cache_dir, roar_py_cache_load_arrays, roar_py_cache_save_arrays
+from .mask_codec import encode_mask_array, decode_mask_array, is_mask_codec_data
+from .depth_codec import encode_depth_array, decode_depth_array, pack_depth24, unpack_depth24, DEPTH_FORMAT_FLOAT32, DEPTH_FORMAT_PACKED24, DEPTH_FORMAT_LOG16
+from .frame_notifier import RoarPyFrameNotifier
\ No newline at end of file
@@ -0,0 +1,53 @@
+import numpy as np
+import typing
+import os
+import tempfile
+import shutil
+
+def roar_py_cache_dir() -> str:
+    """
+    Root directory of the on-disk caches of roar_py (generated waypoints, route graphs, occupancy rasters...).
+    Can be overridden by the ROAR_PY_CACHE_DIR environment variable, defaults to $XDG_CACHE_HOME/roar_py (~/.cache/roar_py).
+    """
+    if "ROAR_PY_CACHE_DIR" in os.environ:
+        return os.environ["ROAR_PY_CACHE_DIR"]
+    xdg_cache_home = os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache"))
+    return os.path.join(xdg_cache_home, "roar_py")
+
+def roar_py_cache_load_arrays(
+    cache_entry : str,
+    keys : typing.Iterable[str],
+    mmap_mode : typing.Optional[str] = "r"
+) -> typing.Optional[typing.Dict[str, np.ndarray]]:
+    """
+    Loads a cache entry written by roar_py_cache_save_arrays (a directory of uncompressed .npy files),
+    memory mapped by default so that processes share one copy. Returns None if the entry is missing or broken,
+    broken entries are removed so that the next roar_py_cache_save_arrays can replace them.
+    """
+    if not os.path.isdir(cache_entry):
+        return None
+    try:
+        return {key: np.load(os.path.join(cache_entry, key + ".npy"), mmap_mode=mmap_mode) for key in keys}
+    except (OSError, ValueError):
+        # Corrupted / truncated cache entries are simply regenerated, os.replace cannot overwrite a non-empty directory
+        shutil.rmtree(cache_entry, ignore_errors=True)
+        return None
+
+def roar_py_cache_save_arrays(cache_entry : str, data : typing.Dict[str, np.ndarray]) -> None:
+    """
+    Writes arrays as a directory of .npy files. The cache is best effort, errors are swallowed.
+    """
+    try:
+        os.makedirs(os.path.dirname(cache_entry), exist_ok=True)
+        # Write into a temporary directory first so that concurrent readers never see a partial entry
+        tmp_entry = tempfile.mkdtemp(prefix=os.path.basename(cache_entry) + ".", dir=os.path.dirname(cache_entry))
+        for key, value in data.items():
+            np.save(os.path.join(tmp_entry, key + ".npy"), np.ascontiguousarray(value))
+        try:
+            os.replace(tmp_entry, cache_entry)
+        except OSError:
+            # Another process finished the same entry first
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+    except OSError:
+        # A read-only home directory should not break anything
+        pass
@@ -0,0 +1,100 @@
+"""
+Transport encoding of depth frames (in meters).
+
+Encoded data starts with DEPTH_CODEC_MAGIC followed by a format marker and the parameters needed to decode it,
+the payload is zlib compressed and decoded back to float32 meters by decode_depth_array.
+"""
+import numpy as np
+import struct
+import zlib
+from typing import Optional
+
+DEPTH_CODEC_MAGIC = b"RPDP"
+# zlib of the raw float32 depth, lossless for any depth
+DEPTH_FORMAT_FLOAT32 = 0
+# zlib of 3 byte fixed point depth (depth / max_depth * (2^24 - 1)), the packing used by CARLA depth cameras.
+# Lossless for frames decoded with unpack_depth24 (e.g. CARLA depth frames), other depths are rounded to max_depth / (2^24 - 1)
+DEPTH_FORMAT_PACKED24 = 1
+# zlib of 16 bit log-quantized depth between min_depth and max_depth, relative error below log(max_depth / min_depth) / 2^17
+DEPTH_FORMAT_LOG16 = 2
+
+DEPTH_PACKED24_MAX = (1 << 24) - 1
+# Far plane of CARLA depth cameras in meters
+CARLA_DEPTH_MAX_METERS = 1000.0
+
+# Magic, format, ndim, min depth, max depth, followed by ndim uint32 dimensions
+_DEPTH_HEADER = struct.Struct("<4sBBff")
+
+def _depth24_scale(max_depth : float) -> np.float32:
+    return np.float32(max_depth / DEPTH_PACKED24_MAX)
+
+def unpack_depth24(packed : np.ndarray, max_depth : float = CARLA_DEPTH_MAX_METERS, out : Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Converts 24 bit fixed point depth (any unsigned integer array) to float32 meters,
+    out may be a preallocated float32 buffer, including a float32 view of the packed buffer itself.
+    """
+    return np.multiply(packed, _depth24_scale(max_depth), out=out, dtype=np.float32)
+
+def pack_depth24(depth : np.ndarray, max_depth : float = CARLA_DEPTH_MAX_METERS) -> np.ndarray:
+    """
+    Converts depth in meters to 24 bit fixed point (as uint32), inverse of unpack_depth24.
+    """
+    depth = np.asarray(depth, dtype=np.float32)
+    scale = _depth24_scale(max_depth)
+    packed = np.clip(np.rint(depth.astype(np.float64) / np.float64(scale)), 0, DEPTH_PACKED24_MAX).astype(np.uint32)
+    # float32 depths are coarser than 24 bits close to max_depth, rounding may land on a neighbour decoding to another float32
+    wrong = np.flatnonzero(unpack_depth24(packed, max_depth) != depth)
+    for offset in (-1, 1):
+        if len(wrong) == 0:
+            break
+        candidates = np.clip(packed.flat[wrong].astype(np.int64) + offset, 0, DEPTH_PACKED24_MAX).astype(np.uint32)
+        fixed = unpack_depth24(candidates, max_depth) == depth.flat[wrong]
+        packed.flat[wrong[fixed]] = candidates[fixed]
+        wrong = wrong[~fixed]
+    return packed
+
+def encode_depth_array(
+    depth : np.ndarray,
+    data_format : int = DEPTH_FORMAT_PACKED24,
+    max_depth : float = CARLA_DEPTH_MAX_METERS,
+    min_depth : float = 0.01,
+    level : int = 6
+) -> bytes:
+    """
+    Encodes a depth frame in meters, min_depth is only used by DEPTH_FORMAT_LOG16.
+    """
+    depth = np.ascontiguousarray(depth, dtype=np.float32)
+    if data_format == DEPTH_FORMAT_FLOAT32:
+        payload = depth.astype("<f4", copy=False).tobytes()
+    elif data_format == DEPTH_FORMAT_PACKED24:
+        # Lowest 3 bytes of the little endian uint32
+        payload = pack_depth24(depth, max_depth).astype("<u4", copy=False).reshape(-1, 1).view(np.uint8)[:, :3].tobytes()
+    elif data_format == DEPTH_FORMAT_LOG16:
+        log_range = np.log(max_depth / min_depth)
+        normalized = np.log(np.clip(depth, min_depth, max_depth) / np.float32(min_depth)) / np.float32(log_range)
+        payload = np.rint(normalized * 65535).astype("<u2").tobytes()
+    else:
+        raise ValueError("Unknown depth codec format {}".format(data_format))
+    header = _DEPTH_HEADER.pack(DEPTH_CODEC_MAGIC, data_format, depth.ndim, min_depth, max_depth)
+    return header + struct.pack("<{}I".format(depth.ndim), *depth.shape) + zlib.compress(payload, level)
+
+def decode_depth_array(data : bytes) -> np.ndarray:
+    """
+    Decodes data written by encode_depth_array to float32 meters.
+    """
+    magic, data_format, ndim, min_depth, max_depth = _DEPTH_HEADER.unpack_from(data)
+    if magic != DEPTH_CODEC_MAGIC:
+        raise ValueError("Not depth codec data")
+    shape = struct.unpack_from("<{}I".format(ndim), data, _DEPTH_HEADER.size)
+    payload = zlib.decompress(data[_DEPTH_HEADER.size + 4 * ndim:])
+    if data_format == DEPTH_FORMAT_FLOAT32:
+        return np.frombuffer(payload, dtype="<f4").astype(np.float32).reshape(shape)
+    elif data_format == DEPTH_FORMAT_PACKED24:
+        packed = np.zeros((int(np.prod(shape)), 4), dtype=np.uint8)
+        packed[:, :3] = np.frombuffer(payload, dtype=np.uint8).reshape(-1, 3)
+        return unpack_depth24(packed.view("<u4").reshape(shape), max_depth)
+    elif data_format == DEPTH_FORMAT_LOG16:
+        normalized = np.frombuffer(payload, dtype="<u2").astype(np.float32) / np.float32(65535)
+        return (np.float32(min_depth) * np.exp(normalized * np.float32(np.log(max_depth / min_depth)))).reshape(shape)
+    else:
+        raise ValueError("Unknown depth codec format {}".format(data_format))
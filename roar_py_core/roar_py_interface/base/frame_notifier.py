@@ -0,0 +1,61 @@
+import asyncio
+import threading
+from typing import List, Tuple
+
+class RoarPyFrameNotifier:
+    """
+    Per-sensor frame counter that sensor callbacks bump from any thread (e.g. the CARLA client threads)
+    and that coroutines await on their own event loop.
+
+    Waiters park on a future of their running loop, notify() hands the wake up to that loop with loop.call_soon_threadsafe,
+    so waiting on many sensors costs nothing until a frame lands.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._frame = 0
+        self._waiters : List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    @property
+    def frame(self) -> int:
+        return self._frame
+
+    def notify(self) -> int:
+        """
+        Marks that a new frame has landed and wakes up all waiters, safe to call from any thread.
+        Returns the new frame count.
+        """
+        with self._lock:
+            self._frame += 1
+            frame = self._frame
+            waiters, self._waiters = self._waiters, []
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(__class__._wake_up, future)
+            except RuntimeError:
+                # The waiting loop has been closed
+                pass
+        return frame
+
+    @staticmethod
+    def _wake_up(future : asyncio.Future) -> None:
+        if not future.done():
+            future.set_result(None)
+
+    async def wait_for_frame(self, frame : int = 1) -> int:
+        """
+        Waits until at least `frame` frames have landed and returns the current frame count.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                if self._frame >= frame:
+                    return self._frame
+                future = loop.create_future()
+                self._waiters.append((loop, future))
+            await future
+
+    async def wait_for_next_frame(self) -> int:
+        """
+        Waits for the frame after the current one.
+        """
+        return await self.wait_for_frame(self._frame + 1)
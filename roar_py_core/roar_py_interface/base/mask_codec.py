@@ -0,0 +1,62 @@
+"""
+Lossless transport encoding of mask-like uint8 / uint16 sensor data (occupancy maps, BEV rasters, segmentation labels...).
+
+Encoded data starts with MASK_CODEC_MAGIC followed by a format marker, so decoders can tell it apart from
+other encodings (e.g. the JPEG used by older versions) and pick the matching decoder.
+"""
+import numpy as np
+import struct
+import zlib
+
+MASK_CODEC_MAGIC = b"RPMK"
+# zlib of the raw bytes, any uint8 values
+MASK_FORMAT_RAW = 0
+# zlib of np.packbits(array != 0), for arrays whose values are 0 and one fill value
+MASK_FORMAT_PACKBITS = 1
+# zlib of the raw little endian bytes of a uint16 array (e.g. instance ids)
+MASK_FORMAT_RAW_UINT16 = 2
+
+# Magic, format, fill value, ndim, followed by ndim uint32 dimensions
+_MASK_HEADER = struct.Struct("<4sBBB")
+
+def is_mask_codec_data(data : bytes) -> bool:
+    return data[:len(MASK_CODEC_MAGIC)] == MASK_CODEC_MAGIC
+
+def encode_mask_array(array : np.ndarray, level : int = 6) -> bytes:
+    """
+    Encodes a uint8 (or uint16) array losslessly. Binary masks (values 0 and one fill value) are bit packed
+    before the zlib stage, which is ~10x smaller and cheaper than JPEG for occupancy maps.
+    """
+    if np.asarray(array).dtype == np.uint16:
+        array = np.ascontiguousarray(array, dtype="<u2")
+        header = _MASK_HEADER.pack(MASK_CODEC_MAGIC, MASK_FORMAT_RAW_UINT16, 0, array.ndim)
+        return header + struct.pack("<{}I".format(array.ndim), *array.shape) + zlib.compress(array.tobytes(), level)
+    array = np.ascontiguousarray(array, dtype=np.uint8)
+    nonzero_values = array[array != 0]
+    if len(nonzero_values) == 0 or nonzero_values.min() == nonzero_values.max():
+        fill_value = int(nonzero_values[0]) if len(nonzero_values) > 0 else 255
+        header = _MASK_HEADER.pack(MASK_CODEC_MAGIC, MASK_FORMAT_PACKBITS, fill_value, array.ndim)
+        payload = np.packbits(array != 0).tobytes()
+    else:
+        header = _MASK_HEADER.pack(MASK_CODEC_MAGIC, MASK_FORMAT_RAW, 0, array.ndim)
+        payload = array.tobytes()
+    return header + struct.pack("<{}I".format(array.ndim), *array.shape) + zlib.compress(payload, level)
+
+def decode_mask_array(data : bytes) -> np.ndarray:
+    """
+    Decodes data written by encode_mask_array.
+    """
+    magic, data_format, fill_value, ndim = _MASK_HEADER.unpack_from(data)
+    if magic != MASK_CODEC_MAGIC:
+        raise ValueError("Not mask codec data")
+    shape = struct.unpack_from("<{}I".format(ndim), data, _MASK_HEADER.size)
+    payload = zlib.decompress(data[_MASK_HEADER.size + 4 * ndim:])
+    if data_format == MASK_FORMAT_PACKBITS:
+        bits = np.unpackbits(np.frombuffer(payload, dtype=np.uint8), count=int(np.prod(shape)))
+        return (bits * np.uint8(fill_value)).reshape(shape)
+    elif data_format == MASK_FORMAT_RAW:
+        return np.frombuffer(payload, dtype=np.uint8).reshape(shape).copy()
+    elif data_format == MASK_FORMAT_RAW_UINT16:
+        return np.frombuffer(payload, dtype="<u2").astype(np.uint16).reshape(shape)
+    else:
+        raise ValueError("Unknown mask codec format {}".format(data_format))
@@ -52,13 +52,26 @@ class RoarPyRemoteSupportedSensorData:
 
         return ret
     
+    def to_legacy_data(self, scheme : RoarPyRemoteSupportedSensorSerializationScheme) -> typing.Any:
+        """
+        Encoding for remote peers that did not negotiate the array codecs (mask_codec / depth_codec),
+        data types that moved to one of them override this with their previous encoding.
+        """
+        return self.to_data(scheme)
+
     @classmethod
     def from_data(cls: typing.Type["RoarPyRemoteSupportedSensorData"], data: bytes, scheme: RoarPyRemoteSupportedSensorSerializationScheme) -> "RoarPyRemoteSupportedSensorData":
-        # Not compressed data types
         if hasattr(cls, "from_data_custom"):
             ret = cls.from_data_custom(data, scheme)
             return ret
-        
+        return cls.from_serde_data(data, scheme)
+
+    @classmethod
+    def from_serde_data(cls: typing.Type["RoarPyRemoteSupportedSensorData"], data: bytes, scheme: RoarPyRemoteSupportedSensorSerializationScheme) -> "RoarPyRemoteSupportedSensorData":
+        """
+        Decodes the default (serde) encoding of to_data, also used by data types with a custom encoding to read what older peers sent.
+        """
+        # Not compressed data types
         if scheme == RoarPyRemoteSupportedSensorSerializationScheme.DICT:
             ret = serde.from_dict(cls, data)
             return ret
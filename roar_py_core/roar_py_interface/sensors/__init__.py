@@ -1,12 +1,14 @@
 from .accelerometer_sensor import RoarPyAccelerometerSensor, RoarPyAccelerometerSensorData
-from .camera_sensor import RoarPyCameraSensor, RoarPyCameraSensorData, RoarPyCameraSensorDataGreyscale, RoarPyCameraSensorDataRGB, RoarPyCameraSensorDataDepth, RoarPyCameraSensorDataSemanticSegmentation
+from .camera_sensor import RoarPyCameraSensor, RoarPyCameraSensorData, RoarPyCameraSensorDataGreyscale, RoarPyCameraSensorDataRGB, RoarPyCameraSensorDataDepth, RoarPyCameraSensorDataSemanticSegmentation, RoarPyCameraSensorDataInstanceSegmentation
 from .collision_sensor import RoarPyCollisionSensor, RoarPyCollisionSensorData
 from .gnss_sensor import RoarPyGNSSSensor, RoarPyGNSSSensorData
 from .gyroscope_sensor import RoarPyGyroscopeSensor, RoarPyGyroscopeSensorData
 from .rotation_sensor import RoarPyFrameQuatSensor, RoarPyFrameQuatSensorData, RoarPyRollPitchYawSensor, RoarPyRollPitchYawSensorData, RoarPyFrameQuatSensorFromRollPitchYaw, RoarPyRollPitchYawSensorFromFrameQuat
 from .lidar_sensor import RoarPyLiDARSensor, RoarPyLiDARSensorData
+from .depth_point_cloud import camera_ray_grid, depth_to_point_cloud
 from .location_in_world_sensor import RoarPyLocationInWorldSensor, RoarPyLocationInWorldSensorData
-from .occupancy_map_sensor import RoarPyOccupancyMapSensor, RoarPyOccupancyMapSensorData, RoarPyOccupancyMapSensorImpl
+from .occupancy_map_sensor import RoarPyOccupancyMapSensor, RoarPyOccupancyMapSensorData, RoarPyOccupancyMapSensorImpl, RoarPyOccupancyMapBufferPool
 from .velocimeter_sensor import RoarPyVelocimeterSensor, RoarPyVelocimeterSensorData
 from .custom_lambda_sensor import RoarPyCustomLambdaSensor, RoarPyCustomLambdaSensorData
-from .radar_sensor import RoarPyRadarSensor, RoarPyRadarSensorData
\ No newline at end of file
+from .radar_sensor import RoarPyRadarSensor, RoarPyRadarSensorData
+from .bev_sensor import RoarPyBEVSensor, RoarPyBEVSensorData
\ No newline at end of file
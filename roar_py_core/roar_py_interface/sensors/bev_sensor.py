@@ -0,0 +1,51 @@
+from ..base import RoarPySensor, RoarPyRemoteSupportedSensorData
+from ..base.sensor import remote_support_sensor_data_register, RoarPyRemoteSupportedSensorSerializationScheme
+from ..base.mask_codec import encode_mask_array, decode_mask_array
+from serde import serde
+from dataclasses import dataclass
+import numpy as np
+import gymnasium as gym
+import struct
+from typing import List, Tuple
+
+@remote_support_sensor_data_register
+@serde
+@dataclass
+class RoarPyBEVSensorData(RoarPyRemoteSupportedSensorData):
+    # Bird's-eye-view raster H*W*C, each channel is a 0 / 255 mask
+    bev: np.ndarray #np.NDArray[np.uint8]
+    # Name of each of the C channels, e.g. RoarPyBEVProducer.CHANNELS
+    channel_names: List[str]
+
+    # Byte length of the channel names
+    _HEADER = struct.Struct("<I")
+
+    @staticmethod
+    def gym_observation_space(width : int, height : int, num_channels : int) -> gym.Space:
+        return gym.spaces.Box(low=0, high=255, shape=(height, width, num_channels), dtype=np.uint8)
+
+    def get_gym_observation_spec(self) -> gym.Space:
+        return __class__.gym_observation_space(self.bev.shape[1], self.bev.shape[0], self.bev.shape[2])
+
+    def convert_obs_to_gym_obs(self):
+        return self.bev
+
+    def to_data(self, scheme: RoarPyRemoteSupportedSensorSerializationScheme) -> bytes:
+        channel_names = "\n".join(self.channel_names).encode("utf-8")
+        return __class__._HEADER.pack(len(channel_names)) + channel_names + encode_mask_array(self.bev)
+
+    @staticmethod
+    def from_data_custom(data : bytes, scheme : RoarPyRemoteSupportedSensorSerializationScheme):
+        names_length, = __class__._HEADER.unpack_from(data)
+        names_start = __class__._HEADER.size
+        channel_names = data[names_start:names_start + names_length].decode("utf-8").split("\n") if names_length > 0 else []
+        return __class__(decode_mask_array(data[names_start + names_length:]), channel_names)
+
+class RoarPyBEVSensor(RoarPySensor[RoarPyBEVSensorData]):
+    sensordata_type = RoarPyBEVSensorData
+    def __init__(self, name: str = "bev_sensor"):
+        super().__init__(name, 0.0)
+
+    @property
+    def channel_names(self) -> Tuple[str, ...]:
+        raise NotImplementedError()
@@ -1,6 +1,10 @@
 from roar_py_interface.base.sensor import RoarPyRemoteSupportedSensorSerializationScheme
 from ..base import RoarPySensor, RoarPyRemoteSupportedSensorData, RoarPyRemoteSupportedSensorSerializationScheme
 from ..base.sensor import remote_support_sensor_data_register
+from ..base.mask_codec import encode_mask_array, decode_mask_array
+from .lidar_sensor import RoarPyLiDARSensorData
+from .depth_point_cloud import depth_to_point_cloud
+from ..base.depth_codec import encode_depth_array, decode_depth_array, DEPTH_CODEC_MAGIC, DEPTH_FORMAT_FLOAT32, DEPTH_FORMAT_PACKED24, CARLA_DEPTH_MAX_METERS
 from serde import serde
 from dataclasses import dataclass
 from PIL import Image
@@ -8,6 +12,8 @@ import numpy as np
 import typing
 import gymnasium as gym
 import io
+import json
+import struct
 
 class RoarPyCameraSensorData(RoarPyRemoteSupportedSensorData):
     """
@@ -114,17 +120,26 @@ class RoarPyCameraSensorDataGreyscale(RoarPyCameraSensorData):
 @serde
 @dataclass
 class RoarPyCameraSensorDataDepth(RoarPyCameraSensorData):
-    # unit in m, W*H*1
+    # unit in m, H*W*1
     image_depth: np.ndarray #np.NDArray[np.float32]
     is_log_scale: bool
 
+    # Encoding used by to_data (per frame, set by whoever produces it), DEPTH_FORMAT_PACKED24 is lossless for CARLA depth frames, DEPTH_FORMAT_LOG16 is smaller
+    transport_format: int = DEPTH_FORMAT_PACKED24
+    transport_max_depth: float = CARLA_DEPTH_MAX_METERS
+    # Nearest depth DEPTH_FORMAT_LOG16 can represent
+    transport_log16_min_depth: float = 0.01
+
+    # is_log_scale
+    _HEADER = struct.Struct("<?")
+
     def get_image(self) -> Image:
         # we have to normalize this to [0,1]
         # we should rarely call this function
         min, max = np.min(self.image_depth), np.max(self.image_depth)
         normalized_image = (self.image_depth) / (max-min)
         normalized_image = (normalized_image * 255).astype(np.uint8)
-        return Image.fromarray(normalized_image,mode="L")
+        return Image.fromarray(normalized_image.reshape(self.image_depth.shape[:2]),mode="L")
     
     def to_gym(self) -> np.ndarray:
         return self.image_depth
@@ -132,6 +147,55 @@ class RoarPyCameraSensorDataDepth(RoarPyCameraSensorData):
     def get_size(self) -> typing.Tuple[int, int]:
         return self.image_depth.shape[1::-1]
 
+    def to_point_cloud(
+        self,
+        fov : float,
+        location : typing.Optional[np.ndarray] = None,
+        roll_pitch_yaw : typing.Optional[np.ndarray] = None,
+        stride : int = 1,
+        min_depth : float = 0.0,
+        max_depth : typing.Optional[float] = None
+    ) -> RoarPyLiDARSensorData:
+        """
+        Unprojects the depth frame into a point cloud in the LiDAR data layout, see depth_to_point_cloud.
+        Each unprojected row of the frame counts as a channel.
+        """
+        assert not self.is_log_scale, "Cannot unproject log scale depth"
+        return RoarPyLiDARSensorData(
+            (self.image_depth.shape[0] + stride - 1) // stride,
+            0.0,
+            depth_to_point_cloud(self.image_depth, fov, location, roll_pitch_yaw, stride, min_depth, max_depth)
+        )
+
+    def to_data(self, scheme: RoarPyRemoteSupportedSensorSerializationScheme) -> bytes:
+        data_format = self.transport_format
+        if self.is_log_scale:
+            # Not in meters, keep the exact values
+            data_format = DEPTH_FORMAT_FLOAT32
+        elif data_format == DEPTH_FORMAT_PACKED24 and not (
+            np.all(np.isfinite(self.image_depth)) and np.min(self.image_depth, initial=0.0) >= 0 and np.max(self.image_depth, initial=0.0) <= self.transport_max_depth
+        ):
+            data_format = DEPTH_FORMAT_FLOAT32
+        return __class__._HEADER.pack(self.is_log_scale) + encode_depth_array(
+            self.image_depth,
+            data_format,
+            max_depth=self.transport_max_depth,
+            min_depth=self.transport_log16_min_depth
+        )
+
+    def to_legacy_data(self, scheme: RoarPyRemoteSupportedSensorSerializationScheme) -> bytes:
+        # serde encoding of the whole dataclass, the only one older clients decode
+        return RoarPyRemoteSupportedSensorData.to_data(self, scheme)
+
+    @staticmethod
+    def from_data_custom(data : bytes, scheme : RoarPyRemoteSupportedSensorSerializationScheme):
+        if data[__class__._HEADER.size:__class__._HEADER.size + len(DEPTH_CODEC_MAGIC)] != DEPTH_CODEC_MAGIC:
+            # serde encoding sent by older versions
+            legacy = __class__.from_serde_data(data, scheme)
+            return __class__(np.asarray(legacy.image_depth, dtype=np.float32), legacy.is_log_scale)
+        is_log_scale, = __class__._HEADER.unpack_from(data)
+        return __class__(decode_depth_array(data[__class__._HEADER.size:]), is_log_scale)
+
     @staticmethod
     def gym_observation_space(width : int, height : int) -> gym.Space:
         return gym.spaces.Box(low=0, high=np.inf, shape=(height, width, 1), dtype=np.float32)
@@ -141,32 +205,164 @@ class RoarPyCameraSensorDataDepth(RoarPyCameraSensorData):
 @serde
 @dataclass
 class RoarPyCameraSensorDataSemanticSegmentation(RoarPyCameraSensorData):
-    # Semantic Segmentation(SS) Frame, W*H*1
-    image_ss: np.ndarray #np.NDArray[np.uint64]
+    # Semantic Segmentation(SS) Frame, H*W*1, uint8 labels (uint16 if there are more than 256 labels)
+    image_ss: np.ndarray #np.NDArray[np.uint8]
     # Dictionary mapping each pixel in SS Frame to a RGB array of color and a label
     ss_label_color_map: typing.Dict[int,typing.Tuple[np.ndarray, str]] #typing.Dict[int,typing.Tuple[np.NDArray[np.uint8], str]]
 
+    # Byte length of the JSON encoded label color map
+    _HEADER = struct.Struct("<I")
+
+    @property
+    def num_classes(self) -> int:
+        return max(self.ss_label_color_map.keys()) + 1 if len(self.ss_label_color_map) > 0 else 0
+
+    def get_color_lut(self) -> np.ndarray:
+        """
+        (L, 3) uint8 lookup table from label to RGB color, labels missing from ss_label_color_map are black.
+        """
+        lut = np.zeros((max(self.num_classes, int(self.image_ss.max(initial=0)) + 1), 3), dtype=np.uint8)
+        for label, (color, _) in self.ss_label_color_map.items():
+            lut[label] = color
+        return lut
+
     def get_image(self) -> Image:
-        # we have to normalize this to [0,1]
-        # we should rarely call this function
-        image_RGB = np.zeros(shape=(*self.image_ss.shape[:-1],3),dtype=np.uint8)
-        for w in range(self.image_ss.shape[0]):
-            for h in range(self.image_ss.shape[1]):
-                image_RGB[w,h,:] = self.ss_label_color_map[
-                    self.image_ss[w,h,0]
-                ][0]
-        
-        return Image.fromarray(image_RGB,mode="RGB")
-    
+        return Image.fromarray(self.get_color_lut()[self.image_ss[:, :, 0]], mode="RGB")
+
+    def get_class_mask(self, label : int) -> np.ndarray:
+        """
+        H*W boolean mask of the pixels with the given label.
+        """
+        return self.image_ss[:, :, 0] == label
+
+    def to_one_hot(self, num_classes : typing.Optional[int] = None) -> np.ndarray:
+        """
+        H*W*num_classes uint8 one-hot encoding of the labels, num_classes defaults to the number of classes in ss_label_color_map.
+        """
+        num_classes = self.num_classes if num_classes is None else num_classes
+        return (self.image_ss == np.arange(num_classes, dtype=self.image_ss.dtype)).view(np.uint8)
+
     def to_gym(self) -> np.ndarray:
         return self.image_ss
     
     def get_size(self) -> typing.Tuple[int, int]:
         return self.image_ss.shape[1::-1]
 
+    @staticmethod
+    def gym_observation_space(width : int, height : int, dtype : typing.Type[np.integer] = np.uint8) -> gym.Space:
+        return gym.spaces.Box(low=0, high=np.iinfo(dtype).max, shape=(height, width, 1), dtype=dtype)
+
+    def get_gym_observation_spec(self) -> gym.Space:
+        return __class__.gym_observation_space(*self.get_size(), dtype=self.image_ss.dtype.type)
+
+    def to_data(self, scheme: RoarPyRemoteSupportedSensorSerializationScheme) -> bytes:
+        label_color_map = json.dumps({
+            str(label): [np.asarray(color).tolist(), name] for label, (color, name) in self.ss_label_color_map.items()
+        }).encode("utf-8")
+        return __class__._HEADER.pack(len(label_color_map)) + label_color_map + encode_mask_array(self.image_ss)
+
+    @staticmethod
+    def from_data_custom(data : bytes, scheme : RoarPyRemoteSupportedSensorSerializationScheme):
+        map_length, = __class__._HEADER.unpack_from(data)
+        map_start = __class__._HEADER.size
+        label_color_map = {
+            int(label): (np.array(color, dtype=np.uint8), name)
+            for label, (color, name) in json.loads(data[map_start:map_start + map_length].decode("utf-8")).items()
+        }
+        return __class__(decode_mask_array(data[map_start + map_length:]), label_color_map)
+
+@remote_support_sensor_data_register
+@serde
+@dataclass
+class RoarPyCameraSensorDataInstanceSegmentation(RoarPyCameraSensorDataSemanticSegmentation):
+    # Instance id of each pixel, H*W*1 uint16, pixels of the same object share an id
+    image_instance: np.ndarray #np.NDArray[np.uint16]
+
+    # Byte lengths of the JSON encoded label color map and of the encoded labels
+    _HEADER = struct.Struct("<II")
+
+    def get_instance_mask(self, instance_id : int) -> np.ndarray:
+        """
+        H*W boolean mask of the pixels of the given instance.
+        """
+        return self.image_instance[:, :, 0] == instance_id
+
+    def _compact_instances(self) -> typing.Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # Instance ids present in the frame, their pixel counts and the per pixel index into them
+        instance_flat = self.image_instance.ravel()
+        id_counts = np.bincount(instance_flat)
+        instance_ids = np.flatnonzero(id_counts)
+        compact_index = np.zeros(len(id_counts), dtype=np.intp)
+        compact_index[instance_ids] = np.arange(len(instance_ids))
+        return instance_ids, id_counts[instance_ids], compact_index[instance_flat]
+
+    def get_instance_pixel_counts(self) -> typing.Tuple[np.ndarray, np.ndarray]:
+        """
+        (K, ) ids of the instances present in the frame and their (K, ) pixel counts.
+        """
+        instance_ids, pixel_counts, _ = self._compact_instances()
+        return instance_ids, pixel_counts
+
+    def get_instances(self) -> typing.Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Per instance statistics of the frame.
+
+        Returns:
+            instance_ids: (K, ) ids of the instances present in the frame
+            labels: (K, ) semantic label of each instance
+            pixel_counts: (K, ) number of pixels of each instance
+            bounding_boxes: (K, 4) [x_min, y_min, x_max, y_max] pixel bounding box of each instance, bounds included
+        """
+        height, width = self.image_instance.shape[:2]
+        instance_ids, pixel_counts, compact_flat = self._compact_instances()
+        num_instances = len(instance_ids)
+        compact_image = compact_flat.reshape(height, width)
+        # Rows / columns each instance appears in, one bincount over (instance, row) and (instance, column) pairs
+        in_rows = np.bincount((compact_image * height + np.arange(height)[:, np.newaxis]).ravel(), minlength=num_instances * height).reshape(num_instances, height) > 0
+        in_columns = np.bincount((compact_image * width + np.arange(width)[np.newaxis, :]).ravel(), minlength=num_instances * width).reshape(num_instances, width) > 0
+        bounding_boxes = np.stack([
+            np.argmax(in_columns, axis=1),
+            np.argmax(in_rows, axis=1),
+            width - 1 - np.argmax(in_columns[:, ::-1], axis=1),
+            height - 1 - np.argmax(in_rows[:, ::-1], axis=1)
+        ], axis=1)
+        labels = np.zeros(num_instances, dtype=self.image_ss.dtype)
+        labels[compact_flat] = self.image_ss.ravel()
+        return instance_ids, labels, pixel_counts, bounding_boxes
+
+    def to_gym(self) -> np.ndarray:
+        return np.concatenate([self.image_ss.astype(np.uint16), self.image_instance], axis=2)
+
     @staticmethod
     def gym_observation_space(width : int, height : int) -> gym.Space:
-        return gym.spaces.Box(low=0, high=np.iinfo(np.uint64).max, shape=(height, width, 1), dtype=np.uint64)
+        # Semantic label and instance id of each pixel
+        return gym.spaces.Box(low=0, high=np.iinfo(np.uint16).max, shape=(height, width, 2), dtype=np.uint16)
+
+    def get_gym_observation_spec(self) -> gym.Space:
+        return __class__.gym_observation_space(*self.get_size())
+
+    def to_data(self, scheme: RoarPyRemoteSupportedSensorSerializationScheme) -> bytes:
+        label_color_map = json.dumps({
+            str(label): [np.asarray(color).tolist(), name] for label, (color, name) in self.ss_label_color_map.items()
+        }).encode("utf-8")
+        labels = encode_mask_array(self.image_ss)
+        return __class__._HEADER.pack(len(label_color_map), len(labels)) + label_color_map + labels + encode_mask_array(self.image_instance.astype(np.uint16, copy=False))
+
+    @staticmethod
+    def from_data_custom(data : bytes, scheme : RoarPyRemoteSupportedSensorSerializationScheme):
+        map_length, labels_length = __class__._HEADER.unpack_from(data)
+        map_start = __class__._HEADER.size
+        labels_start = map_start + map_length
+        instances_start = labels_start + labels_length
+        label_color_map = {
+            int(label): (np.array(color, dtype=np.uint8), name)
+            for label, (color, name) in json.loads(data[map_start:labels_start].decode("utf-8")).items()
+        }
+        return __class__(
+            decode_mask_array(data[labels_start:instances_start]),
+            label_color_map,
+            decode_mask_array(data[instances_start:])
+        )
 
 class RoarPyCameraSensor(RoarPySensor[RoarPyCameraSensorData]):
     sensordata_type = RoarPyCameraSensorData
@@ -197,3 +393,18 @@ class RoarPyCameraSensor(RoarPySensor[RoarPyCameraSensorData]):
     def convert_obs_to_gym_obs(self, obs: RoarPyCameraSensorData):
         return obs.to_gym()
 
+    def depth_to_point_cloud(
+        self,
+        obs: RoarPyCameraSensorDataDepth,
+        location : typing.Optional[np.ndarray] = None,
+        roll_pitch_yaw : typing.Optional[np.ndarray] = None,
+        stride : int = 1,
+        min_depth : float = 0.0,
+        max_depth : typing.Optional[float] = None
+    ) -> RoarPyLiDARSensorData:
+        """
+        Unprojects a depth observation of this camera with the camera's fov, location / roll_pitch_yaw give the pose
+        of the camera in the output frame (e.g. its mounting pose for the vehicle frame).
+        """
+        return obs.to_point_cloud(self.fov, location, roll_pitch_yaw, stride, min_depth, max_depth)
+
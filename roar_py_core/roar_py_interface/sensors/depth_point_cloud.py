@@ -0,0 +1,86 @@
+import functools
+import numpy as np
+import transforms3d as tr3d
+from typing import Optional
+
+@functools.lru_cache(maxsize=16)
+def camera_ray_grid(width : int, height : int, fov : float, stride : int = 1) -> np.ndarray:
+    """
+    (height, width, 4) ray directions (x, y, z, 0) through the pixel centers of a pinhole camera in the camera frame (x forward, y left, z up),
+    fov being the horizontal field of view in degrees, only every stride-th row and column if stride > 1.
+    Depth cameras render the depth along the optical axis, so the rays are scaled to a unit forward component:
+    depth * ray is the 3D point of a pixel, the trailing 0 keeps the rows in the (x, y, z, intensity) point layout.
+    Cached per camera, the returned grid is contiguous and read-only.
+    """
+    focal_length = width / (2.0 * np.tan(np.deg2rad(fov) / 2.0))
+    columns = np.arange(0, width, stride)
+    rows = np.arange(0, height, stride)
+    rays = np.zeros((len(rows), len(columns), 4), dtype=np.float32)
+    rays[:, :, 0] = 1.0
+    rays[:, :, 1] = -(columns + 0.5 - width / 2.0)[np.newaxis, :] / focal_length
+    rays[:, :, 2] = -(rows + 0.5 - height / 2.0)[:, np.newaxis] / focal_length
+    rays.setflags(write=False)
+    return rays
+
+def depth_to_point_cloud(
+    depth : np.ndarray,
+    fov : float,
+    location : Optional[np.ndarray] = None,
+    roll_pitch_yaw : Optional[np.ndarray] = None,
+    stride : int = 1,
+    min_depth : float = 0.0,
+    max_depth : Optional[float] = None,
+    intensity : float = 1.0
+) -> np.ndarray:
+    """
+    Unprojects a depth frame into a point cloud with the layout of RoarPyLiDARSensorData.lidar_points_data.
+
+    -----
+    Args:
+    -----
+        depth (np.ndarray):
+            (H, W) or (H, W, 1) depth in meters along the optical axis.
+        fov (float):
+            Horizontal field of view of the camera in degrees.
+        location (Optional[np.ndarray]):
+            (3, ) location of the camera in the output frame (e.g. the vehicle or the world frame), the camera frame if not given.
+        roll_pitch_yaw (Optional[np.ndarray]):
+            (3, ) rotation of the camera in the output frame in radians, the camera frame if not given.
+        stride (int):
+            Only every stride-th row and column of the frame is unprojected.
+        min_depth (float), max_depth (Optional[float]):
+            Only pixels with min_depth < depth <= max_depth are kept (finite depths if max_depth is not given).
+        intensity (float):
+            Value of the intensity column.
+
+    --------
+    Returns:
+    --------
+        np.ndarray:
+            (N, 4) float32 points (x, y, z, intensity).
+    """
+    depth = np.asarray(depth)
+    if depth.ndim == 3:
+        depth = depth[:, :, 0]
+    height, width = depth.shape
+    rays = camera_ray_grid(width, height, float(fov), stride).reshape(-1, 4)
+    depth = depth[::stride, ::stride]
+
+    valid = depth > min_depth
+    valid &= np.isfinite(depth) if max_depth is None else depth <= max_depth
+    valid = valid.ravel()
+
+    # (x, y, z, 0) camera frame points
+    points = np.compress(valid, rays, axis=0)
+    points *= depth.ravel()[valid][:, np.newaxis]
+    if location is None and roll_pitch_yaw is None:
+        points[:, 3] = intensity
+        return points
+
+    # Rotation, translation and the intensity column in one (N, 4) x (4, 4) product
+    transform = np.zeros((4, 4), dtype=np.float64)
+    transform[:3, :3] = tr3d.euler.euler2mat(*roll_pitch_yaw) if roll_pitch_yaw is not None else np.eye(3)
+    transform[:3, 3] = location if location is not None else 0.0
+    transform[3, 3] = intensity
+    points[:, 3] = 1.0
+    return points @ transform.T.astype(np.float32)
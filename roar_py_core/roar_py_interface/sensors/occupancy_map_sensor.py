@@ -1,5 +1,6 @@
 from roar_py_interface.worlds.occupancy_map import RoarPyOccupancyMapProducer
 from ..base.sensor import RoarPySensor, RoarPyRemoteSupportedSensorData, remote_support_sensor_data_register, RoarPyRemoteSupportedSensorSerializationScheme
+from ..base.mask_codec import encode_mask_array, decode_mask_array, is_mask_codec_data
 from .location_in_world_sensor import RoarPyLocationInWorldSensor
 from .rotation_sensor import RoarPyRollPitchYawSensor
 from ..worlds.waypoint import RoarPyWaypoint
@@ -10,37 +11,95 @@ from PIL import Image
 import numpy as np
 import gymnasium as gym
 import io
+import warnings
 from typing import Optional, Tuple, Any, Callable, Awaitable
 
+class RoarPyOccupancyMapBufferPool:
+    """
+    Round robin pool of preallocated uint8 buffers that occupancy maps are rendered into, so no array is allocated per frame.
+    A buffer handed out by next_buffer stays valid until num_buffers - 1 more buffers have been handed out,
+    with the default double buffering the last observation is not overwritten while the next one is rendered.
+    """
+    def __init__(self, shape : Tuple[int, ...], num_buffers : int = 2):
+        assert num_buffers >= 1
+        self.shape = tuple(shape)
+        self._buffers = [np.zeros(self.shape, dtype=np.uint8) for _ in range(num_buffers)]
+        self._next_index = 0
+
+    @property
+    def num_buffers(self) -> int:
+        return len(self._buffers)
+
+    def next_buffer(self) -> np.ndarray:
+        buffer = self._buffers[self._next_index]
+        self._next_index = (self._next_index + 1) % len(self._buffers)
+        return buffer
+
 @remote_support_sensor_data_register
 @serde
 @dataclass
 class RoarPyOccupancyMapSensorData(RoarPyRemoteSupportedSensorData):
-    occupancy_map: Image.Image
-    
+    # Occupancy map H*W, 0 / 255 mask
+    occupancy_map_array: np.ndarray #np.NDArray[np.uint8]
+
+    def __post_init__(self):
+        if isinstance(self.occupancy_map_array, Image.Image):
+            warnings.warn(
+                "Passing a PIL image to RoarPyOccupancyMapSensorData is deprecated, pass the (H, W) uint8 array or use from_image",
+                DeprecationWarning,
+                stacklevel=3
+            )
+            self.occupancy_map_array = np.asarray(self.occupancy_map_array.convert("L"), dtype=np.uint8)
+
+    @property
+    def occupancy_map(self) -> Image.Image:
+        """
+        Deprecated, the map as a PIL image (built on every access), use occupancy_map_array or get_image()
+        """
+        warnings.warn(
+            "RoarPyOccupancyMapSensorData.occupancy_map is deprecated, use occupancy_map_array or get_image()",
+            DeprecationWarning,
+            stacklevel=2
+        )
+        return self.get_image()
+
+    def get_image(self) -> Image.Image:
+        return Image.fromarray(self.occupancy_map_array, mode='L')
+
+    def get_size(self) -> Tuple[int, int]:
+        return self.occupancy_map_array.shape[1::-1]
+
     def convert_obs_to_gym_obs(self):
-        return np.asarray(self.occupancy_map, dtype=np.uint8).reshape((*self.occupancy_map.size, 1))
+        return self.occupancy_map_array[:, :, np.newaxis]
 
     @staticmethod
     def gym_observation_space(width : int, height : int) -> gym.Space:
         return gym.spaces.Box(low=0, high=255, shape=(height, width, 1), dtype=np.uint8)
     
     def get_gym_observation_spec(self) -> gym.Space:
-        return self.__class__.gym_observation_space(*self.occupancy_map.size)
+        return self.__class__.gym_observation_space(*self.get_size())
 
     @staticmethod
     def from_image(image: Image.Image):
         return __class__(
-            image.convert("L")
+            np.asarray(image.convert("L"), dtype=np.uint8)
         )
 
     def to_data(self, scheme: RoarPyRemoteSupportedSensorSerializationScheme) -> bytes:
+        # Lossless bit packed encoding, JPEG would smear the 0 / 255 edges of the mask
+        return encode_mask_array(self.occupancy_map_array)
+
+    def to_legacy_data(self, scheme: RoarPyRemoteSupportedSensorSerializationScheme) -> bytes:
+        # JPEG, the only encoding older clients decode
         saved_image = io.BytesIO()
-        self.occupancy_map.save(saved_image, format="JPEG")
+        self.get_image().save(saved_image, format="JPEG")
         return saved_image.getvalue()
 
     @staticmethod
     def from_data_custom(data : bytes, scheme : RoarPyRemoteSupportedSensorSerializationScheme):
+        if is_mask_codec_data(data):
+            return __class__(decode_mask_array(data))
+        # JPEG sent by older versions
         image_bytes = io.BytesIO(data)
         image_bytes.seek(0)
         img = Image.open(image_bytes)
@@ -58,6 +117,7 @@ class RoarPyOccupancyMapSensorImpl(RoarPyOccupancyMapSensor):
         self.producer = producer
         self.location_sensor = location_sensor
         self.rotation_sensor = rotation_sensor
+        self._buffer_pool = RoarPyOccupancyMapBufferPool((producer.height, producer.width))
         self._last_data : Optional[RoarPyOccupancyMapSensorData] = None
     
     async def get_2d_location(self) -> np.ndarray:
@@ -74,8 +134,8 @@ class RoarPyOccupancyMapSensorImpl(RoarPyOccupancyMapSensor):
     async def receive_observation(self) -> RoarPyOccupancyMapSensorData:
         location = await self.get_2d_location()
         yaw = await self.get_rotation_yaw()
-        occupancy_map = self.producer.plot_occupancy_map(location, yaw)
-        self._last_data = RoarPyOccupancyMapSensorData.from_image(occupancy_map)
+        occupancy_map = self.producer.plot_occupancy_map_array(location, yaw, out=self._buffer_pool.next_buffer())
+        self._last_data = RoarPyOccupancyMapSensorData(occupancy_map)
         return self._last_data
     
     def get_last_observation(self) -> Optional[RoarPyOccupancyMapSensorData]:
@@ -18,7 +18,7 @@ class RoarPyVisualizer:
             if isinstance(dat, RoarPyCameraSensorData):
                 size = dat.get_size()
             elif isinstance(dat, RoarPyOccupancyMapSensorData):
-                size = dat.occupancy_map.size
+                size = dat.get_size()
             else:
                 continue
             max_width = max(max_width, size[0])
@@ -32,7 +32,7 @@ class RoarPyVisualizer:
             if isinstance(dat, RoarPyCameraSensorData):
                 image.paste(dat.get_image(), (0, 0))
             elif isinstance(dat, RoarPyOccupancyMapSensorData):
-                image.paste(dat.occupancy_map, (max_width - dat.occupancy_map.width, 0))
+                image.paste(dat.get_image(), (max_width - dat.get_size()[0], 0))
             else:
                 continue
         return image
\ No newline at end of file
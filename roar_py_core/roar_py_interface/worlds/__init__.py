@@ -1,3 +1,6 @@
 from .world import RoarPyWorld, RoarPyWorldResettable
-from .waypoint import RoarPyWaypoint, RoarPyWaypointsProjection, RoarPyWaypointsTracker
-from .occupancy_map import RoarPyOccupancyMapProducer
\ No newline at end of file
+from .waypoint import RoarPyWaypoint, RoarPyWaypointArray, RoarPyWaypointsProjection, RoarPyWaypointsTracker
+from .waypoint_spatial_index import RoarPyWaypointsSpatialIndex
+from .occupancy_map import RoarPyOccupancyMapProducer, RoarPyIncrementalOccupancyMap
+from .occupancy_raster import RoarPyOccupancyMapRaster, RoarPyGlobalOccupancyRaster, RoarPyTiledOccupancyRaster
+from .bev import RoarPyBEVProducer
\ No newline at end of file
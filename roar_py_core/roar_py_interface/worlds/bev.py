@@ -0,0 +1,157 @@
+import numpy as np
+from typing import List, Optional, Tuple, Union
+from .waypoint import RoarPyWaypoint, RoarPyWaypointArray
+from .occupancy_map import RoarPyOccupancyMapProducer, fill_quads_batch
+
+def line_segment_quads(starts_2d : np.ndarray, ends_2d : np.ndarray, half_width : Union[float, np.ndarray]) -> np.ndarray:
+    """
+    (N, 4, 2) quads covering the (N, 2) => (N, 2) line segments, each widened by half_width (scalar or (N, )) on both sides.
+    """
+    starts_2d = np.asarray(starts_2d, dtype=np.float64)
+    ends_2d = np.asarray(ends_2d, dtype=np.float64)
+    directions = ends_2d - starts_2d
+    lengths = np.linalg.norm(directions, axis=1, keepdims=True)
+    normals = np.divide(directions, lengths, out=np.zeros_like(directions), where=lengths > 0) @ np.array([[0.0, 1.0], [-1.0, 0.0]])
+    offsets = normals * np.reshape(half_width, (-1, 1))
+    return np.stack([starts_2d + offsets, starts_2d - offsets, ends_2d - offsets, ends_2d + offsets], axis=1)
+
+def polyline_quads(points_2d : np.ndarray, half_width : Union[float, np.ndarray]) -> np.ndarray:
+    """
+    (N - 1, 4, 2) quads covering the segments of a (N, 2) polyline, see line_segment_quads.
+    """
+    points_2d = np.asarray(points_2d, dtype=np.float64)
+    return line_segment_quads(points_2d[:-1], points_2d[1:], half_width)
+
+def box_quads(centers_2d : np.ndarray, half_extents_2d : np.ndarray, yaws : np.ndarray) -> np.ndarray:
+    """
+    (N, 4, 2) corners of oriented boxes, e.g. vehicle bounding boxes, given their (N, 2) centers,
+    (N, 2) half extents along their local x / y axes and (N, ) yaws, all in the world frame.
+    """
+    centers_2d = np.asarray(centers_2d, dtype=np.float64).reshape(-1, 2)
+    half_extents_2d = np.asarray(half_extents_2d, dtype=np.float64).reshape(-1, 2)
+    yaws = np.asarray(yaws, dtype=np.float64).reshape(-1)
+    corner_signs = np.array([[1.0, 1.0], [1.0, -1.0], [-1.0, -1.0], [-1.0, 1.0]])
+    local_corners = corner_signs[np.newaxis] * half_extents_2d[:, np.newaxis]
+    cos_y, sin_y = np.cos(yaws)[:, np.newaxis], np.sin(yaws)[:, np.newaxis]
+    return np.stack([
+        centers_2d[:, np.newaxis, 0] + cos_y * local_corners[:, :, 0] - sin_y * local_corners[:, :, 1],
+        centers_2d[:, np.newaxis, 1] + sin_y * local_corners[:, :, 0] + cos_y * local_corners[:, :, 1]
+    ], axis=-1)
+
+class RoarPyBEVProducer:
+    """
+    The RoarPyBEVProducer class renders multi channel bird's-eye-view rasters around a vehicle on top of an occupancy map producer.
+
+    All channels are 0 / 255 masks with the pixel layout of the occupancy map producer, stacked into one (height, width, C) uint8 array
+    and drawn together with a single fill_quads_batch call.
+
+    -----------
+    Attributes:
+    -----------
+        occupancy_map_producer (RoarPyOccupancyMapProducer):
+            Provides the lanes, the image / world sizes and the world => pixel mapping.
+        lane_boundary_width (float):
+            Width of the lane boundary lines in meters (drawn at least one pixel wide).
+        route_width (float):
+            Width of the route line in meters (drawn at least one pixel wide).
+    """
+    CHANNELS : Tuple[str, ...] = ("lanes", "lane_boundaries", "route", "vehicles")
+
+    def __init__(
+        self,
+        occupancy_map_producer : RoarPyOccupancyMapProducer,
+        lane_boundary_width : float = 0.3,
+        route_width : float = 1.0
+    ):
+        self.occupancy_map_producer = occupancy_map_producer
+        self.lane_boundary_width = lane_boundary_width
+        self.route_width = route_width
+
+    @property
+    def width(self) -> int:
+        return self.occupancy_map_producer.width
+
+    @property
+    def height(self) -> int:
+        return self.occupancy_map_producer.height
+
+    @property
+    def num_channels(self) -> int:
+        return len(__class__.CHANNELS)
+
+    def _line_half_width(self, line_width : float) -> float:
+        meters_per_pixel = max(
+            self.occupancy_map_producer.width_world / self.width,
+            self.occupancy_map_producer.height_world / self.height
+        )
+        return max(line_width, meters_per_pixel) / 2
+
+    def plot_bev(
+        self,
+        location_2d : np.ndarray,
+        rotation_yaw : float,
+        route : Optional[Union[List[RoarPyWaypoint], RoarPyWaypointArray]] = None,
+        vehicle_quads : Optional[np.ndarray] = None,
+        out : Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Generates a bird's-eye-view raster around a specific location.
+
+        -----
+        Args:
+        -----
+            location_2d (np.ndarray):
+                The 2D coordinates (x, y) of the center of the image in the world frame.
+            rotation_yaw (float):
+                The yaw angle (in radians) of the image relative to the world frame.
+            route (Optional[Union[List[RoarPyWaypoint], RoarPyWaypointArray]]):
+                The upcoming path of the vehicle, drawn as a polyline in the route channel.
+            vehicle_quads (Optional[np.ndarray]):
+                (K, 4, 2) world frame corners of the other vehicles (see box_quads), drawn in the vehicles channel.
+            out (Optional[np.ndarray]):
+                A (height, width, C) uint8 buffer to render into (it is cleared first),
+                a new array is allocated if not given.
+
+        --------
+        Returns:
+        --------
+            np.ndarray:
+                The (height, width, C) raster, channels in the order of CHANNELS.
+        """
+        assert location_2d.shape == (2, )
+        producer = self.occupancy_map_producer
+        if out is None:
+            out = np.zeros((self.height, self.width, self.num_channels), dtype=np.uint8)
+        else:
+            assert out.shape == (self.height, self.width, self.num_channels) and out.dtype == np.uint8
+            out.fill(0)
+
+        segment_indices = producer.visible_segment_indices(location_2d)
+        line_pos, line_neg = producer.waypoints.line_representations
+        next_indices = (segment_indices + 1) % len(producer.waypoints)
+        boundary_half_width = self._line_half_width(self.lane_boundary_width)
+        channel_quads = [
+            producer.waypoints.segment_quads[segment_indices] if producer.raster is None else np.zeros((0, 4, 2)),
+            np.concatenate([
+                line_segment_quads(line[segment_indices, :2], line[next_indices, :2], boundary_half_width)
+                for line in (line_pos, line_neg)
+            ], axis=0),
+            np.zeros((0, 4, 2)),
+            np.zeros((0, 4, 2)) if vehicle_quads is None else np.asarray(vehicle_quads, dtype=np.float64).reshape(-1, 4, 2)
+        ]
+        if route is not None and len(route) > 1:
+            route = RoarPyWaypointArray.from_waypoints(route)
+            channel_quads[2] = polyline_quads(route.locations[:, :2], self._line_half_width(self.route_width))
+
+        quads_indptr = np.zeros(self.num_channels + 1, dtype=np.int64)
+        np.cumsum([len(quads) for quads in channel_quads], out=quads_indptr[1:])
+        transforms = np.repeat(
+            producer.world_to_pixels_transforms(location_2d[np.newaxis], np.array([rotation_yaw])),
+            self.num_channels,
+            axis=0
+        )
+        # Channel major view of the (height, width, C) buffer, every channel is drawn as one map of the batch
+        fill_quads_batch(out.transpose(2, 0, 1), np.concatenate(channel_quads, axis=0), quads_indptr, transforms, 255)
+        if producer.raster is not None:
+            out[:, :, 0] = producer.plot_occupancy_map_array(location_2d, rotation_yaw)
+        return out
@@ -1,36 +1,69 @@
 import numpy as np
-from PIL import Image, ImageDraw, ImageColor
-from typing import List, Optional, Tuple
+from PIL import Image, ImageColor
+from typing import List, Optional, Tuple, Union
 from serde import serde
 from dataclasses import dataclass
-from .waypoint import RoarPyWaypoint
-import functools
+from .waypoint import RoarPyWaypoint, RoarPyWaypointArray, normalize_rad
 import numba
 
 @numba.jit(nopython=True)
-def line_intersects_line(
-    line1_start : np.ndarray,
-    line1_end : np.ndarray,
-    line2_start : np.ndarray,
-    line2_end : np.ndarray,
+def fill_quads(
+    buffer : np.ndarray,
+    quads : np.ndarray,
+    value : int
 ):
-    line1_diff = line1_end - line1_start
-    line2_diff = line2_end - line2_start
-    
-    q = (line1_start[1] - line2_start[1]) * (line2_diff[0]) - (line1_start[0] - line2_start[0]) * (line2_diff[1])
-    d = (line1_diff[0]) * (line2_diff[1]) - (line1_diff[1]) * (line2_diff[0])
-
-    if d == 0:
-        return False
-
-    r = q / d
-    q = (line1_start[1] - line2_start[1]) * (line1_diff[0]) - (line1_start[0] - line2_start[0]) * (line1_diff[1])
-    s = q / d
-
-    if r < 0 or r > 1 or s < 0 or s > 1:
-        return False
+    """
+    Scanline fill of (N, 4, 2) quads given in (x, y) pixel coordinates into a (height, width) buffer.
+    A pixel (px, py) is filled if its center (px, py) lies inside the quad (even-odd rule).
+    """
+    height, width = buffer.shape[0], buffer.shape[1]
+    crossings = np.empty(4)
+    for q in range(quads.shape[0]):
+        y_min = min(min(quads[q, 0, 1], quads[q, 1, 1]), min(quads[q, 2, 1], quads[q, 3, 1]))
+        y_max = max(max(quads[q, 0, 1], quads[q, 1, 1]), max(quads[q, 2, 1], quads[q, 3, 1]))
+        row_start = max(int(np.ceil(y_min)), 0)
+        row_end = min(int(np.floor(y_max)), height - 1)
+        for row in range(row_start, row_end + 1):
+            num_crossings = 0
+            for k in range(4):
+                x0, y0 = quads[q, k, 0], quads[q, k, 1]
+                x1, y1 = quads[q, (k + 1) % 4, 0], quads[q, (k + 1) % 4, 1]
+                # Half open on y so that shared vertices are counted exactly once
+                if (y0 <= row < y1) or (y1 <= row < y0):
+                    crossing = x0 + (row - y0) * (x1 - x0) / (y1 - y0)
+                    # Insertion sort, there are at most 4 crossings and sorting a slice is far more expensive
+                    j = num_crossings
+                    while j > 0 and crossings[j - 1] > crossing:
+                        crossings[j] = crossings[j - 1]
+                        j -= 1
+                    crossings[j] = crossing
+                    num_crossings += 1
+            for c in range(0, num_crossings - 1, 2):
+                col_start = max(int(np.ceil(crossings[c])), 0)
+                col_end = min(int(np.floor(crossings[c + 1])), width - 1)
+                if col_start <= col_end:
+                    buffer[row, col_start:col_end + 1] = value
 
-    return True
+@numba.jit(nopython=True)
+def fill_quads_batch(
+    buffers : np.ndarray,
+    quads : np.ndarray,
+    quads_indptr : np.ndarray,
+    transforms : np.ndarray,
+    value : int
+):
+    """
+    fill_quads over a (N, height, width) stack of buffers. Buffer i is filled with quads[quads_indptr[i]:quads_indptr[i + 1]],
+    given in world coordinates and mapped to pixel coordinates by the (2, 3) affine transforms[i].
+    """
+    for i in range(buffers.shape[0]):
+        quads_px = np.empty((quads_indptr[i + 1] - quads_indptr[i], 4, 2))
+        for q in range(quads_px.shape[0]):
+            for k in range(4):
+                x, y = quads[quads_indptr[i] + q, k, 0], quads[quads_indptr[i] + q, k, 1]
+                quads_px[q, k, 0] = transforms[i, 0, 0] * x + transforms[i, 0, 1] * y + transforms[i, 0, 2]
+                quads_px[q, k, 1] = transforms[i, 1, 0] * x + transforms[i, 1, 1] * y + transforms[i, 1, 2]
+        fill_quads(buffers[i], quads_px, value)
 
 @serde
 @dataclass
@@ -45,8 +78,8 @@ class RoarPyOccupancyMapProducer:
     -----------
     Attributes:
     -----------
-        waypoints (List[RoarPyWaypoint]): 
-            A list of waypoints that define the lanes.
+        waypoints (RoarPyWaypointArray): 
+            The waypoints that define the lanes, a List[RoarPyWaypoint] is converted on construction.
         width (int): 
             The width of the occupancy map in pixels.
         height (int): 
@@ -57,40 +90,31 @@ class RoarPyOccupancyMapProducer:
         height_world (float): 
             The height of the world in meters. This is used to 
             convert world coordinates to pixel coordinates.
+        raster (Optional[RoarPyOccupancyMapRaster]):
+            A pre-rendered raster of the waypoints (see occupancy_raster.py), if given 
+            occupancy maps are cropped from it instead of drawing the lanes every call.
+            A RoarPyTiledOccupancyRaster picks its pyramid level from width_world / width and height_world / height.
     """
     def __init__(
         self, 
-        waypoints : List[RoarPyWaypoint],
+        waypoints : Union[List[RoarPyWaypoint], RoarPyWaypointArray],
         width : int, 
         height : int, 
         width_world : float, 
         height_world : float,
+        raster : Optional["RoarPyOccupancyMapRaster"] = None
     ):
-        self.image = Image.new('L', (width, height), 0)
+        self.width = width
+        self.height = height
         self.width_world = width_world
         self.height_world = height_world
-        self.waypoints = waypoints
-        self.start_index = -1
-
-    @property
-    def width(self) -> int:
-        return self.image.width
-    
-    @width.setter
-    def width(self, value : int):
-        self.image = self.image.resize((value, self.height))
-    
-    @property
-    def height(self) -> int:
-        return self.image.height
-    
-    @height.setter
-    def height(self, value : int):
-        self.image = self.image.resize((self.width, value))
+        self.waypoints = RoarPyWaypointArray.from_waypoints(waypoints)
+        self.raster = raster
 
     def plot_occupancy_map(self, location_2d : np.ndarray, rotation_yaw : float) -> Image:
         """
         Generates an occupancy map around a specific location.
+        Same as plot_occupancy_map_array, wrapped into a PIL Image ('L' mode).
 
         -----
         Args:
@@ -106,94 +130,123 @@ class RoarPyOccupancyMapProducer:
             Image: 
                 An occupancy map centered around the specified location.
         """
-        
+        return Image.fromarray(self.plot_occupancy_map_array(location_2d, rotation_yaw), mode='L')
+
+    def plot_occupancy_map_array(self, location_2d : np.ndarray, rotation_yaw : float, out : Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Generates an occupancy map around a specific location as a (height, width) uint8 array.
+
+        -----
+        Args:
+        -----
+            location_2d (np.ndarray): 
+                The 2D coordinates (x, y) of the center of the image in the world frame.
+            rotation_yaw (float): 
+                The yaw angle (in radians) of the image relative to the world frame. 
+            out (Optional[np.ndarray]):
+                A (height, width) uint8 buffer to render into (it is cleared first), 
+                a new array is allocated if not given.
+
+        --------
+        Returns:
+        --------
+            np.ndarray: 
+                An occupancy map centered around the specified location.
+        """
         assert location_2d.shape == (2, )
-        location_min = location_2d - np.array([self.width_world, self.height_world]) # give a bit slack to make sure that we can properly rotate
-        location_max = location_2d + np.array([self.width_world, self.height_world])
-        
-
-        # Check if the waypoint is in range
-        def is_in_range(waypoint : RoarPyWaypoint) -> bool:
-            wp_start = waypoint.line_representation[0][:2]
-            wp_end = waypoint.line_representation[1][:2]
-            segments_to_test = []
-            side_1 = np.array([location_min[0], location_max[1]])
-            side_2 = np.array([location_max[0], location_min[1]])
-
-            segments_to_test.append((location_min, side_1))
-            segments_to_test.append((side_1, location_max))
-            segments_to_test.append((location_max, side_2))
-            segments_to_test.append((side_2, location_min))
-
-            rst = functools.reduce(
-                lambda f, s: f or s,
-                [line_intersects_line(wp_start, wp_end, segment[0], segment[1]) for segment in segments_to_test],
-                False
-            )
-            return rst
-            # for segment in segments_to_test:
-            #     return line_intersects_line(
-            #         wp_start[:2], wp_end[:2],
-                    
-            #     )
-            # return (
-            #     (np.all(waypoint.line_representation[0][:2] > location_min) and
-            #     np.all(waypoint.line_representation[0][:2] < location_max)) or
-            #     (np.all(waypoint.line_representation[1][:2] > location_min) and
-            #     np.all(waypoint.line_representation[1][:2] < location_max))
-            # )
-
-        filtered_waypoint_pairs : List[Tuple[RoarPyWaypoint,RoarPyWaypoint]] = []
-        last_waypoint = None
-
-        # Find the starting index of the waypoint in range
-        if self.start_index == -1:
-            for i in range(len(self.waypoints)):
-                waypoint = self.waypoints[i]
-                if is_in_range(waypoint):
-                    self.start_index = i
-                    last_waypoint = waypoint
-                    break
+        return self.plot_occupancy_maps(
+            location_2d[np.newaxis],
+            np.array([rotation_yaw]),
+            out[np.newaxis] if out is not None else None
+        )[0]
+
+    def plot_occupancy_maps(self, locations_2d : np.ndarray, rotation_yaws : np.ndarray, out : Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Generates the occupancy maps of many vehicles at once, batched version of plot_occupancy_map_array.
+        The segments of all maps are transformed into pixel space together and drawn with a single kernel call.
+
+        -----
+        Args:
+        -----
+            locations_2d (np.ndarray): 
+                (N, 2) coordinates (x, y) of the centers of the images in the world frame.
+            rotation_yaws (np.ndarray): 
+                (N, ) yaw angles (in radians) of the images relative to the world frame. 
+            out (Optional[np.ndarray]):
+                A (N, height, width) uint8 buffer to render into (it is cleared first), 
+                a new array is allocated if not given.
+
+        --------
+        Returns:
+        --------
+            np.ndarray: 
+                The (N, height, width) stacked occupancy maps.
+        """
+        locations_2d = np.asarray(locations_2d, dtype=np.float64)
+        rotation_yaws = np.asarray(rotation_yaws, dtype=np.float64)
+        assert locations_2d.ndim == 2 and locations_2d.shape[1] == 2
+        assert rotation_yaws.shape == (len(locations_2d), )
+        num_maps = len(locations_2d)
+
+        if out is None:
+            out = np.zeros((num_maps, self.height, self.width), dtype=np.uint8)
         else:
-            for i in range(len(self.waypoints)):
-                waypoint_idx = (self.start_index - 10 + i) % len(self.waypoints)
-                waypoint = self.waypoints[waypoint_idx]
-                if is_in_range(waypoint):
-                    self.start_index = waypoint_idx
-                    last_waypoint = waypoint
-                    break
-
-        # Find the waypoint pairs that are in range
-        for i in range(1, len(self.waypoints) + 1):
-            curr_index = (self.start_index + i) % len(self.waypoints)
-            waypoint = self.waypoints[curr_index]
-
-            if last_waypoint is not None:
-                filtered_waypoint_pairs.append((last_waypoint, waypoint))
-                last_waypoint = None
-            
-            if is_in_range(waypoint):
-                last_waypoint = waypoint
-            else:
-                break
-
-        # Draw the local occupancy map centered around the actor location
-        # self.image = Image.new('L', self.image.size, 0)
-        draw = ImageDraw.Draw(self.image)
-        for waypoint1, waypoint2 in filtered_waypoint_pairs:
-            draw.polygon(
-                [
-                    self.world_to_pixel(waypoint1.line_representation[0][:2], rotation_yaw, location_2d),
-                    self.world_to_pixel(waypoint1.line_representation[1][:2], rotation_yaw, location_2d),
-                    self.world_to_pixel(waypoint2.line_representation[1][:2], rotation_yaw, location_2d),
-                    self.world_to_pixel(waypoint2.line_representation[0][:2], rotation_yaw, location_2d),
-                ],
-                fill=255,
-            )
-        to_ret = self.image
-        self.image = Image.new('L', to_ret.size, 0)
-        return to_ret
-    
+            assert out.shape == (num_maps, self.height, self.width) and out.dtype == np.uint8
+            if self.raster is None:
+                out.fill(0)
+
+        if self.raster is not None:
+            for i in range(num_maps):
+                self.raster.crop(out[i], locations_2d[i], rotation_yaws[i], self.width_world, self.height_world)
+            return out
+
+        segment_indices = [self.visible_segment_indices(location_2d) for location_2d in locations_2d]
+        num_segments = np.array([len(indices) for indices in segment_indices], dtype=np.int64)
+        if num_segments.sum() == 0:
+            return out
+
+        quads_indptr = np.zeros(num_maps + 1, dtype=np.int64)
+        np.cumsum(num_segments, out=quads_indptr[1:])
+        # Draw the local occupancy maps centered around the actor locations
+        quads = self.waypoints.segment_quads[np.concatenate(segment_indices)]
+        fill_quads_batch(out, quads, quads_indptr, self.world_to_pixels_transforms(locations_2d, rotation_yaws), 255)
+        return out
+
+    def visible_segment_indices(self, location_2d : np.ndarray) -> np.ndarray:
+        """
+        Indices of the lane segments (see RoarPyWaypointArray.segment_quads) that may be visible in a map centered at location_2d, for any rotation.
+        """
+        # Any segment visible in a rotated image overlaps the box enclosing the circle around its corners
+        half_diagonal = np.hypot(self.width_world, self.height_world) / 2
+        return self.waypoints.spatial_index.query_box(location_2d - half_diagonal, location_2d + half_diagonal)
+
+    def world_to_pixels_transforms(self, locations_2d : np.ndarray, rotation_yaws : np.ndarray) -> np.ndarray:
+        """
+        (N, 2, 3) world => pixel affine transforms of maps centered at locations_2d, as applied by world_to_pixels.
+        """
+        transforms = np.empty((len(locations_2d), 2, 3))
+        transforms[:, :, :2] = self._pixel_matrices(rotation_yaws)
+        transforms[:, :, 2] = np.array([self.width / 2, self.height / 2]) - np.einsum("nij,nj->ni", transforms[:, :, :2], locations_2d)
+        return transforms
+
+    def _pixel_matrices(self, rotation_yaws : np.ndarray) -> np.ndarray:
+        """
+        (N, 2, 2) matrices folding the rotation into the image frame and the scaling to pixels, rows map to pixel (x, y).
+        """
+        cos_r = np.cos(rotation_yaws)
+        sin_r = np.sin(rotation_yaws)
+        return np.stack([
+            np.stack([sin_r * self.width / self.width_world, -cos_r * self.width / self.width_world], axis=-1),
+            np.stack([-cos_r * self.height / self.height_world, -sin_r * self.height / self.height_world], axis=-1)
+        ], axis=-2)
+
+    def world_to_pixels(self, locations_2d : np.ndarray, rotation_center : float, center_2d : np.ndarray) -> np.ndarray:
+        """
+        Vectorized version of world_to_pixel, converts (..., 2) locations in the world frame to (..., 2) pixel coordinates (x, y).
+        """
+        pixel_matrix = self._pixel_matrices(np.asarray(rotation_center, dtype=np.float64))
+        return (np.asarray(locations_2d) - center_2d) @ pixel_matrix.T + np.array([self.width / 2, self.height / 2])
+
     def world_to_pixel(self, location_2d : np.ndarray, rotation_center : float, center_2d : np.ndarray) -> np.ndarray:
         """
         Converts a location in the world frame to pixel coordinates in the image frame.
@@ -228,3 +281,134 @@ class RoarPyOccupancyMapProducer:
         # Local coordinate in world frame => pixel frame
         local_coordinate = local_coordinate * np.array([self.height / self.height_world, self.width / self.width_world])
         return (-local_coordinate[1] + self.width / 2, -local_coordinate[0] + self.height / 2) 
+
+class RoarPyIncrementalOccupancyMap:
+    """
+    Keeps the last occupancy map of one vehicle and updates it incrementally between close poses.
+
+    While the heading stays close to the one of the last full redraw, the map is shifted by whole pixels
+    and only the newly exposed border strips are rasterized. The result equals a full redraw centered at
+    the closest whole pixel position, with the heading of the last full redraw. A full redraw happens
+    once the error of that approximation exceeds max_error_pixels.
+
+    -----------
+    Attributes:
+    -----------
+        producer (RoarPyOccupancyMapProducer):
+            The producer used to rasterize the map.
+        max_error_pixels (float):
+            Bound of the displacement in pixels of any pixel of the map compared to a full redraw, counting
+            the sub-pixel center offset and the heading difference at the corners of the map.
+        buffer (Optional[np.ndarray]):
+            The (height, width) uint8 map of the last update, None before the first update.
+        buffer_center (Optional[np.ndarray]):
+            World (x, y) location the buffer is centered at.
+        buffer_yaw (Optional[float]):
+            Heading (in radians) the buffer is rendered with.
+    """
+    def __init__(self, producer : RoarPyOccupancyMapProducer, max_error_pixels : float = 1.0):
+        self.producer = producer
+        self.max_error_pixels = max_error_pixels
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Drops the last map, e.g. after a respawn, the next update does a full redraw.
+        """
+        self.buffer : Optional[np.ndarray] = None
+        self.buffer_center : Optional[np.ndarray] = None
+        self.buffer_yaw : Optional[float] = None
+        self._spare_buffer : Optional[np.ndarray] = None
+        # World => pixel matrix of buffer_yaw and its inverse
+        self._pixel_matrix : Optional[np.ndarray] = None
+        self._inverse_pixel_matrix : Optional[np.ndarray] = None
+        # Segments that may be visible from any center within _candidates_margin of _candidates_center,
+        # and their pixel coordinates in the buffer at that center
+        self._candidates_center : Optional[np.ndarray] = None
+        self._candidates_indices : Optional[np.ndarray] = None
+        self._candidates_quads_px : Optional[np.ndarray] = None
+
+    @property
+    def _candidates_margin(self) -> float:
+        return np.hypot(self.producer.width_world, self.producer.height_world) / 4
+
+    def _candidate_quads_px(self) -> np.ndarray:
+        # Pixel coordinates only change by the whole pixel shifts while the heading is fixed, so the candidate
+        # segments are queried with a margin and transformed once, then reused until the center leaves the margin
+        producer = self.producer
+        if self._candidates_center is None or np.linalg.norm(self.buffer_center - self._candidates_center) > self._candidates_margin:
+            half_diagonal = np.hypot(producer.width_world, producer.height_world) / 2 + self._candidates_margin
+            self._candidates_indices = producer.waypoints.spatial_index.query_box(self.buffer_center - half_diagonal, self.buffer_center + half_diagonal)
+            self._candidates_center = self.buffer_center.copy()
+            self._candidates_quads_px = None
+        if self._candidates_quads_px is None:
+            self._candidates_quads_px = (producer.waypoints.segment_quads[self._candidates_indices] - self._candidates_center) @ self._pixel_matrix.T \
+                + np.array([producer.width / 2, producer.height / 2])
+        return self._candidates_quads_px + self._pixel_matrix @ (self._candidates_center - self.buffer_center)
+
+    def _full_redraw(self, location_2d : np.ndarray, rotation_yaw : float) -> np.ndarray:
+        producer = self.producer
+        self.buffer_center = location_2d.copy()
+        self.buffer_yaw = rotation_yaw
+        if producer.raster is not None:
+            self.buffer = producer.plot_occupancy_map_array(location_2d, rotation_yaw, self.buffer)
+            return self.buffer
+
+        if self.buffer is None:
+            self.buffer = np.zeros((producer.height, producer.width), dtype=np.uint8)
+        else:
+            self.buffer.fill(0)
+        self._pixel_matrix = producer._pixel_matrices(np.array(rotation_yaw))
+        self._inverse_pixel_matrix = np.linalg.inv(self._pixel_matrix)
+        self._candidates_quads_px = None
+        fill_quads(self.buffer, self._candidate_quads_px(), 255)
+        return self.buffer
+
+    def update(self, location_2d : np.ndarray, rotation_yaw : float) -> np.ndarray:
+        """
+        Updates the map to a new pose and returns it, the returned array is reused by the next update.
+        """
+        location_2d = np.asarray(location_2d, dtype=np.float64)
+        assert location_2d.shape == (2, )
+        rotation_yaw = float(rotation_yaw)
+        producer = self.producer
+        # Cropping a pre-rendered raster is already cheaper than tracking strips
+        if self.buffer is None or producer.raster is not None:
+            return self._full_redraw(location_2d, rotation_yaw)
+
+        # Where the new center falls in the current buffer
+        pixel_offset = self._pixel_matrix @ (location_2d - self.buffer_center)
+        shift = np.round(pixel_offset)
+        half_diagonal_pixels = np.hypot(producer.width, producer.height) / 2
+        error_pixels = np.hypot(*(pixel_offset - shift)) + abs(normalize_rad(rotation_yaw - self.buffer_yaw)) * half_diagonal_pixels
+        shift_x, shift_y = int(shift[0]), int(shift[1])
+        if error_pixels > self.max_error_pixels or abs(shift_x) >= producer.width or abs(shift_y) >= producer.height:
+            return self._full_redraw(location_2d, rotation_yaw)
+        if shift_x == 0 and shift_y == 0:
+            return self.buffer
+
+        # Pixel (px, py) of the shifted map is pixel (px + shift_x, py + shift_y) of the current one,
+        # copied into the spare buffer since an overlapping in place copy goes through a temporary array
+        height, width = self.buffer.shape
+        if self._spare_buffer is None:
+            self._spare_buffer = np.empty_like(self.buffer)
+        self._spare_buffer[max(-shift_y, 0):height - max(shift_y, 0), max(-shift_x, 0):width - max(shift_x, 0)] = \
+            self.buffer[max(shift_y, 0):height - max(-shift_y, 0), max(shift_x, 0):width - max(-shift_x, 0)]
+        self.buffer, self._spare_buffer = self._spare_buffer, self.buffer
+        self.buffer_center = self.buffer_center + self._inverse_pixel_matrix @ shift
+
+        # Rasterize the exposed strips, rows first then the remaining columns
+        exposed_rows = slice(height - shift_y, height) if shift_y > 0 else slice(0, -shift_y)
+        kept_rows = slice(0, height - shift_y) if shift_y > 0 else slice(-shift_y, height)
+        exposed_columns = slice(width - shift_x, width) if shift_x > 0 else slice(0, -shift_x)
+        quads_px = self._candidate_quads_px()
+        if shift_y != 0:
+            row_strip = self.buffer[exposed_rows, :]
+            row_strip.fill(0)
+            fill_quads(row_strip, quads_px - np.array([0, exposed_rows.start]), 255)
+        if shift_x != 0:
+            # Scanning the transposed strip only walks its few columns instead of every row of the map
+            column_strip = self.buffer[kept_rows, exposed_columns]
+            column_strip.fill(0)
+            fill_quads(column_strip.T, quads_px[:, :, ::-1] - np.array([kept_rows.start, exposed_columns.start]), 255)
+        return self.buffer
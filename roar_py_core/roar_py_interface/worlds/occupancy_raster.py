@@ -0,0 +1,337 @@
+import numpy as np
+from typing import List, Optional, Tuple, Union
+from .waypoint import RoarPyWaypoint, RoarPyWaypointArray
+from .occupancy_map import fill_quads
+from ..base.cache import roar_py_cache_dir, roar_py_cache_load_arrays, roar_py_cache_save_arrays
+from collections import OrderedDict
+import hashlib
+import os
+import threading
+import numba
+
+@numba.jit(nopython=True)
+def sample_packed_grid(
+    packed_grid : np.ndarray,
+    grid_width : int,
+    out : np.ndarray,
+    affine : np.ndarray,
+    value : int
+):
+    """
+    Nearest neighbour resample of a bit packed (np.packbits along x) occupancy grid into a (height, width) uint8 buffer.
+    Output pixel (px, py) reads the grid cell at affine @ (px, py, 1), cells outside of the grid are free.
+    """
+    height, width = out.shape[0], out.shape[1]
+    grid_height = packed_grid.shape[0]
+    # Walk each output row in fixed point so that the inner loop only adds and shifts integers,
+    # the +0.5 makes the floor of the fixed point value round to the nearest cell
+    fraction_bits = 20
+    scale = float(1 << fraction_bits)
+    step_x = np.int64(round(affine[0, 0] * scale))
+    step_y = np.int64(round(affine[1, 0] * scale))
+    fill = np.uint8(value)
+    for py in range(height):
+        fixed_x = np.int64(np.floor((affine[0, 1] * py + affine[0, 2] + 0.5) * scale))
+        fixed_y = np.int64(np.floor((affine[1, 1] * py + affine[1, 2] + 0.5) * scale))
+        for px in range(width):
+            ix, iy = fixed_x >> fraction_bits, fixed_y >> fraction_bits
+            pixel = np.uint8(0)
+            if 0 <= ix < grid_width and 0 <= iy < grid_height:
+                if (packed_grid[iy, ix >> 3] >> (7 - (ix & 7))) & 1:
+                    pixel = fill
+            out[py, px] = pixel
+            fixed_x += step_x
+            fixed_y += step_y
+
+def waypoints_content_hash(waypoints : RoarPyWaypointArray) -> str:
+    hasher = hashlib.sha256()
+    for array in (waypoints.locations, waypoints.roll_pitch_yaws, waypoints.lane_widths):
+        hasher.update(np.ascontiguousarray(array, dtype=np.float64).tobytes())
+    return hasher.hexdigest()[:16]
+
+class RoarPyOccupancyMapRaster:
+    """
+    Base class of pre-rendered occupancy rasters of a static lane layout.
+
+    Occupancy maps are extracted from a raster with a rotated crop around the vehicle, so the per-frame
+    cost does not depend on how many lane segments are nearby (see RoarPyOccupancyMapProducer's raster argument).
+    """
+
+    def crop(
+        self,
+        out : np.ndarray,
+        location_2d : np.ndarray,
+        rotation_yaw : float,
+        width_world : float,
+        height_world : float
+    ) -> np.ndarray:
+        """
+        Renders the (height, width) uint8 occupancy map centered at location_2d and rotated by rotation_yaw into out,
+        with the same pixel layout as RoarPyOccupancyMapProducer.world_to_pixels. Returns out.
+        """
+        raise NotImplementedError()
+
+    @staticmethod
+    def pixel_to_world_affine(
+        width : int,
+        height : int,
+        width_world : float,
+        height_world : float,
+        location_2d : np.ndarray,
+        rotation_yaw : float
+    ) -> np.ndarray:
+        """
+        Returns the (2, 3) affine matrix mapping pixel coordinates (x, y, 1) of an occupancy map to world coordinates (x, y),
+        the inverse of RoarPyOccupancyMapProducer.world_to_pixels.
+        """
+        cos_r, sin_r = np.cos(rotation_yaw), np.sin(rotation_yaw)
+        pixel_matrix = np.array([
+            [sin_r * width / width_world, -cos_r * width / width_world],
+            [-cos_r * height / height_world, -sin_r * height / height_world]
+        ])
+        world_matrix = np.linalg.inv(pixel_matrix)
+        affine = np.empty((2, 3))
+        affine[:, :2] = world_matrix
+        affine[:, 2] = np.asarray(location_2d, dtype=np.float64) - world_matrix @ np.array([width / 2, height / 2])
+        return affine
+
+class RoarPyGlobalOccupancyRaster(RoarPyOccupancyMapRaster):
+    """
+    The whole track rasterized once into a global, bit packed occupancy grid.
+
+    The grid is rendered from the lane segment quads of the waypoints and cached on disk (memory mapped)
+    per waypoint content and resolution, so later runs and other processes on the same host load it instantly.
+
+    -----------
+    Attributes:
+    -----------
+        meters_per_pixel (float):
+            Edge length of a grid cell in meters.
+        origin (np.ndarray):
+            World (x, y) coordinates of the center of grid cell (0, 0).
+        grid_width (int):
+            Number of grid cells along world x.
+        grid_height (int):
+            Number of grid cells along world y.
+        packed_grid (np.ndarray):
+            (grid_height, ceil(grid_width / 8)) uint8 array, np.packbits of the occupancy along x.
+    """
+    CACHE_VERSION = 1
+    MARGIN = 2.0 # meters of free space around the track
+
+    def __init__(
+        self,
+        waypoints : Union[List[RoarPyWaypoint], RoarPyWaypointArray],
+        meters_per_pixel : float = 0.05,
+        use_cache : bool = True
+    ):
+        waypoints = RoarPyWaypointArray.from_waypoints(waypoints)
+        assert len(waypoints) > 1
+        self.meters_per_pixel = float(meters_per_pixel)
+
+        cache_entry = os.path.join(
+            roar_py_cache_dir(),
+            "occupancy_raster",
+            "{}_{:g}_v{}".format(waypoints_content_hash(waypoints), self.meters_per_pixel, __class__.CACHE_VERSION)
+        )
+        cached = roar_py_cache_load_arrays(cache_entry, ("origin", "grid_size", "packed_grid")) if use_cache else None
+        if cached is not None:
+            self.origin = np.array(cached["origin"])
+            self.grid_width, self.grid_height = (int(v) for v in cached["grid_size"])
+            self.packed_grid = cached["packed_grid"]
+        else:
+            self._rasterize(waypoints.segment_quads)
+            if use_cache:
+                roar_py_cache_save_arrays(cache_entry, {
+                    "origin": self.origin,
+                    "grid_size": np.array([self.grid_width, self.grid_height], dtype=np.int64),
+                    "packed_grid": self.packed_grid
+                })
+
+    def _rasterize(self, segment_quads : np.ndarray) -> None:
+        quads_min = segment_quads.reshape(-1, 2).min(axis=0) - __class__.MARGIN
+        quads_max = segment_quads.reshape(-1, 2).max(axis=0) + __class__.MARGIN
+        self.origin = quads_min
+        self.grid_width, self.grid_height = (int(v) for v in np.ceil((quads_max - quads_min) / self.meters_per_pixel) + 1)
+        self.packed_grid = np.zeros((self.grid_height, (self.grid_width + 7) // 8), dtype=np.uint8)
+
+        # Rasterize in horizontal bands so the unpacked grid never has to fit in memory at once
+        quads_px = (segment_quads - self.origin) / self.meters_per_pixel
+        quads_row_min, quads_row_max = quads_px[:, :, 1].min(axis=1), quads_px[:, :, 1].max(axis=1)
+        band_rows = max(1, (1 << 24) // self.grid_width)
+        band = np.empty((band_rows, self.grid_width), dtype=np.uint8)
+        for row_start in range(0, self.grid_height, band_rows):
+            num_rows = min(band_rows, self.grid_height - row_start)
+            in_band = (quads_row_max >= row_start) & (quads_row_min <= row_start + num_rows)
+            band_quads = quads_px[in_band]
+            band_quads[:, :, 1] -= row_start
+            band_view = band[:num_rows]
+            band_view.fill(0)
+            fill_quads(band_view, band_quads, 1)
+            self.packed_grid[row_start:row_start + num_rows] = np.packbits(band_view, axis=1)
+
+    def crop(
+        self,
+        out : np.ndarray,
+        location_2d : np.ndarray,
+        rotation_yaw : float,
+        width_world : float,
+        height_world : float
+    ) -> np.ndarray:
+        affine = self.pixel_to_world_affine(out.shape[1], out.shape[0], width_world, height_world, location_2d, rotation_yaw)
+        # World => grid cell coordinates
+        affine /= self.meters_per_pixel
+        affine[:, 2] -= self.origin / self.meters_per_pixel
+        sample_packed_grid(self.packed_grid, self.grid_width, out, affine, 255)
+        return out
+
+class RoarPyTiledOccupancyRaster(RoarPyOccupancyMapRaster):
+    """
+    A multi-resolution pyramid of fixed size occupancy tiles, rendered lazily from the waypoints on first access.
+
+    Level l has a resolution of meters_per_pixel * 2 ** l. Only the tiles around recently cropped locations
+    are held in memory (a bounded LRU cache), and tiles can optionally be persisted as memory mapped files
+    in the roar_py cache directory, so large maps never need a full resolution raster resident in every worker.
+    Crops pick the coarsest level that is still at least as fine as the requested output resolution.
+
+    -----------
+    Attributes:
+    -----------
+        waypoints (RoarPyWaypointArray):
+            The waypoints that define the lanes.
+        meters_per_pixel (float):
+            Edge length of a grid cell of the finest level (level 0) in meters.
+        num_levels (int):
+            Number of pyramid levels.
+        tile_size (int):
+            Edge length of a tile in cells, a multiple of 8.
+        max_cached_tiles (int):
+            Maximum number of tiles (over all levels) kept in memory.
+        tile_cache_dir (Optional[str]):
+            Directory the rendered tiles are persisted to, None if tiles are not persisted.
+    """
+    CACHE_VERSION = 1
+
+    def __init__(
+        self,
+        waypoints : Union[List[RoarPyWaypoint], RoarPyWaypointArray],
+        meters_per_pixel : float = 0.05,
+        num_levels : int = 4,
+        tile_size : int = 256,
+        max_cached_tiles : int = 1024,
+        persist_tiles : bool = False
+    ):
+        assert num_levels >= 1
+        assert tile_size > 0 and tile_size % 8 == 0
+        assert max_cached_tiles > 0
+        self.waypoints = RoarPyWaypointArray.from_waypoints(waypoints)
+        self.meters_per_pixel = float(meters_per_pixel)
+        self.num_levels = int(num_levels)
+        self.tile_size = int(tile_size)
+        self.max_cached_tiles = int(max_cached_tiles)
+        if persist_tiles:
+            self.tile_cache_dir = os.path.join(
+                roar_py_cache_dir(),
+                "occupancy_tiles",
+                "{}_{:g}_{}_v{}".format(waypoints_content_hash(self.waypoints), self.meters_per_pixel, self.tile_size, __class__.CACHE_VERSION)
+            )
+        else:
+            self.tile_cache_dir = None
+
+        self._tiles : "OrderedDict[Tuple[int, int, int], np.ndarray]" = OrderedDict()
+        self._tiles_lock = threading.Lock()
+        # Tiles without any lane segment all share this one
+        self._empty_tile = np.zeros((self.tile_size, self.tile_size // 8), dtype=np.uint8)
+        self._empty_tile.flags.writeable = False
+
+    def level_meters_per_pixel(self, level : int) -> float:
+        return self.meters_per_pixel * (1 << level)
+
+    def select_level(self, meters_per_pixel : float) -> int:
+        """
+        Returns the coarsest pyramid level whose resolution is at least as fine as meters_per_pixel.
+        """
+        ratio = max(meters_per_pixel / self.meters_per_pixel, 1.0)
+        # Small epsilon so that exact powers of two are not pushed down a level by rounding
+        return min(int(np.floor(np.log2(ratio) + 1e-9)), self.num_levels - 1)
+
+    def get_tile(self, level : int, tile_x : int, tile_y : int) -> np.ndarray:
+        """
+        Returns the (tile_size, tile_size // 8) bit packed tile (np.packbits along x) whose cell (0, 0)
+        is centered at world (tile_x, tile_y) * tile_size * level_meters_per_pixel(level).
+        The returned array must not be modified.
+        """
+        key = (level, tile_x, tile_y)
+        with self._tiles_lock:
+            tile = self._tiles.get(key)
+            if tile is not None:
+                self._tiles.move_to_end(key)
+                return tile
+
+        # Render outside of the lock, two threads racing for the same tile just render it twice
+        tile = self._load_or_render_tile(level, tile_x, tile_y)
+        with self._tiles_lock:
+            self._tiles[key] = tile
+            self._tiles.move_to_end(key)
+            while len(self._tiles) > self.max_cached_tiles:
+                self._tiles.popitem(last=False)
+        return tile
+
+    def _tile_cache_entry(self, level : int, tile_x : int, tile_y : int) -> str:
+        return os.path.join(self.tile_cache_dir, "L{}".format(level), "{}_{}".format(tile_x, tile_y))
+
+    def _load_or_render_tile(self, level : int, tile_x : int, tile_y : int) -> np.ndarray:
+        level_mpp = self.level_meters_per_pixel(level)
+        cell_origin = np.array([tile_x, tile_y], dtype=np.float64) * self.tile_size
+        segment_indices = self.waypoints.spatial_index.query_box(
+            (cell_origin - 0.5) * level_mpp,
+            (cell_origin + self.tile_size - 0.5) * level_mpp
+        )
+        if len(segment_indices) == 0:
+            return self._empty_tile
+
+        if self.tile_cache_dir is not None:
+            cached = roar_py_cache_load_arrays(self._tile_cache_entry(level, tile_x, tile_y), ("packed_tile",))
+            if cached is not None:
+                return cached["packed_tile"]
+
+        quads_px = self.waypoints.spatial_index.segment_quads[segment_indices] / level_mpp - cell_origin
+        tile = np.zeros((self.tile_size, self.tile_size), dtype=np.uint8)
+        fill_quads(tile, quads_px, 1)
+        packed_tile = np.packbits(tile, axis=1)
+        if self.tile_cache_dir is not None:
+            roar_py_cache_save_arrays(self._tile_cache_entry(level, tile_x, tile_y), {"packed_tile": packed_tile})
+        return packed_tile
+
+    def crop(
+        self,
+        out : np.ndarray,
+        location_2d : np.ndarray,
+        rotation_yaw : float,
+        width_world : float,
+        height_world : float
+    ) -> np.ndarray:
+        height, width = out.shape[0], out.shape[1]
+        level = self.select_level(max(width_world / width, height_world / height))
+        level_mpp = self.level_meters_per_pixel(level)
+
+        # Pixel => cell coordinates of the selected level
+        affine = self.pixel_to_world_affine(width, height, width_world, height_world, location_2d, rotation_yaw)
+        affine /= level_mpp
+
+        # Compose the tiles covered by the rotated crop into one packed mosaic
+        corners = affine @ np.array([[0, 0, 1], [width, 0, 1], [0, height, 1], [width, height, 1]], dtype=np.float64).T
+        tile_min = (np.floor(corners.min(axis=1)).astype(np.int64) - 1) // self.tile_size
+        tile_max = (np.ceil(corners.max(axis=1)).astype(np.int64) + 1) // self.tile_size
+        num_tiles_x, num_tiles_y = (int(v) for v in tile_max - tile_min + 1)
+        row_bytes = self.tile_size // 8
+        mosaic = np.empty((num_tiles_y * self.tile_size, num_tiles_x * row_bytes), dtype=np.uint8)
+        for j in range(num_tiles_y):
+            for i in range(num_tiles_x):
+                mosaic[j * self.tile_size:(j + 1) * self.tile_size, i * row_bytes:(i + 1) * row_bytes] = self.get_tile(
+                    level, int(tile_min[0]) + i, int(tile_min[1]) + j
+                )
+
+        affine[:, 2] -= tile_min * self.tile_size
+        sample_packed_grid(mosaic, num_tiles_x * self.tile_size, out, affine, 255)
+        return out
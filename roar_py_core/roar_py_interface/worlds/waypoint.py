@@ -1,5 +1,5 @@
 import numpy as np
-from typing import Tuple, List, Optional, Union
+from typing import Tuple, List, Optional, Union, Iterable
 import transforms3d as tr3d
 from serde import serde
 from dataclasses import dataclass
@@ -7,11 +7,78 @@ from functools import cached_property
 from shapely import Polygon, Point
 from collections import namedtuple
 import math
-import copy
+import os
+import numba
 
 def normalize_rad(radians : float) -> float:
     return (radians + np.pi) % (2 * np.pi) - np.pi
 
+@numba.jit(nopython=True)
+def _distance_to_quad(
+    quad : np.ndarray,
+    point_x : float,
+    point_y : float
+) -> float:
+    # Distance from a point to the (4, 2) quad polygon, 0 if the point is inside (even-odd rule)
+    inside = False
+    min_dist_sq = np.inf
+    for k in range(4):
+        start_x, start_y = quad[k, 0], quad[k, 1]
+        end_x, end_y = quad[(k + 1) % 4, 0], quad[(k + 1) % 4, 1]
+        if (start_y > point_y) != (end_y > point_y):
+            cross_x = start_x + (point_y - start_y) * (end_x - start_x) / (end_y - start_y)
+            if point_x < cross_x:
+                inside = not inside
+        
+        edge_x, edge_y = end_x - start_x, end_y - start_y
+        edge_len_sq = edge_x * edge_x + edge_y * edge_y
+        t = 0.0
+        if edge_len_sq > 0:
+            t = ((point_x - start_x) * edge_x + (point_y - start_y) * edge_y) / edge_len_sq
+            t = min(max(t, 0.0), 1.0)
+        diff_x = start_x + t * edge_x - point_x
+        diff_y = start_y + t * edge_y - point_y
+        min_dist_sq = min(min_dist_sq, diff_x * diff_x + diff_y * diff_y)
+    if inside:
+        return 0.0
+    return math.sqrt(min_dist_sq)
+
+@numba.jit(nopython=True)
+def _distances_to_quads(
+    quads : np.ndarray,
+    candidate_indices : np.ndarray,
+    point_x : float,
+    point_y : float
+) -> np.ndarray:
+    distances = np.empty(len(candidate_indices))
+    for i in range(len(candidate_indices)):
+        distances[i] = _distance_to_quad(quads[candidate_indices[i]], point_x, point_y)
+    return distances
+
+@numba.jit(nopython=True)
+def _trace_points_in_windows(
+    quads : np.ndarray,
+    points_2d : np.ndarray,
+    start_indices : np.ndarray,
+    offsets : np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    # Closest segment (first in offset order on ties) within the window around each start index
+    num_quads = len(quads)
+    best_indices = np.empty(len(points_2d), dtype=np.int64)
+    best_distances = np.empty(len(points_2d))
+    for i in range(len(points_2d)):
+        best_distances[i] = np.inf
+        best_indices[i] = start_indices[i] % num_quads
+        for offset in offsets:
+            candidate = (start_indices[i] + offset) % num_quads
+            distance = _distance_to_quad(quads[candidate], points_2d[i, 0], points_2d[i, 1])
+            if distance < best_distances[i]:
+                best_distances[i] = distance
+                best_indices[i] = candidate
+                if distance == 0:
+                    break
+    return best_indices, best_distances
+
 @serde
 @dataclass
 class RoarPyWaypoint:
@@ -46,6 +113,8 @@ class RoarPyWaypoint:
 
     @staticmethod
     def save_waypoint_list(waypoints: List['RoarPyWaypoint']) -> dict:
+        if isinstance(waypoints, RoarPyWaypointArray):
+            return RoarPyWaypointArray.save_waypoint_list(waypoints)
         return {
             'locations': np.stack([waypoint.location for waypoint in waypoints], axis=0),
             'rotations': np.stack([waypoint.roll_pitch_yaw for waypoint in waypoints], axis=0),
@@ -87,80 +156,258 @@ class RoarPyWaypoint:
         else:
             return polygon.distance(point)
 
+@serde
+@dataclass
+class RoarPyWaypointArray:
+    """
+    Struct-of-arrays container for a sequence of waypoints.
+
+    Indexing with an integer returns a RoarPyWaypoint whose location / roll_pitch_yaw are views into
+    this array, slicing returns another RoarPyWaypointArray sharing the same memory. Iteration, len()
+    and indexing behave like a List[RoarPyWaypoint], so this can be passed wherever a list is expected.
+    """
+    locations: np.ndarray        # (N, 3) x, y, z of the center of each waypoint
+    roll_pitch_yaws: np.ndarray  # (N, 3) rpy of the road in radians at each waypoint
+    lane_widths: np.ndarray      # (N, ) width of the lane in meters at each waypoint
+
+    def __post_init__(self):
+        self.locations = np.asarray(self.locations).reshape(-1, 3)
+        self.roll_pitch_yaws = np.asarray(self.roll_pitch_yaws).reshape(-1, 3)
+        self.lane_widths = np.asarray(self.lane_widths).reshape(-1)
+        assert len(self.locations) == len(self.roll_pitch_yaws) == len(self.lane_widths)
+
+    def __len__(self) -> int:
+        return len(self.locations)
+
+    def __getitem__(self, index) -> Union[RoarPyWaypoint, "RoarPyWaypointArray"]:
+        if isinstance(index, (int, np.integer)):
+            return RoarPyWaypoint(
+                self.locations[index],
+                self.roll_pitch_yaws[index],
+                float(self.lane_widths[index])
+            )
+        return RoarPyWaypointArray(
+            self.locations[index],
+            self.roll_pitch_yaws[index],
+            self.lane_widths[index]
+        )
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __eq__(self, __value: object) -> bool:
+        if not isinstance(__value, RoarPyWaypointArray):
+            return False
+        return len(self) == len(__value) and np.allclose(self.locations, __value.locations) and np.allclose(self.roll_pitch_yaws, __value.roll_pitch_yaws) and np.allclose(self.lane_widths, __value.lane_widths)
+
+    @cached_property
+    def line_representations(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Vectorized version of RoarPyWaypoint.line_representation for all waypoints at once.
+        Returns the (N, 3) positive and negative lane edge points.
+        """
+        roll, pitch, yaw = self.roll_pitch_yaws[:, 0], self.roll_pitch_yaws[:, 1], self.roll_pitch_yaws[:, 2]
+        sin_r, cos_r = np.sin(roll), np.cos(roll)
+        sin_p, cos_p = np.sin(pitch), np.cos(pitch)
+        sin_y, cos_y = np.sin(yaw), np.cos(yaw)
+        # Second column of tr3d.euler.euler2mat(roll, pitch, yaw), i.e. the local y axis in world frame
+        local_y_axis = np.stack([
+            cos_y * sin_p * sin_r - sin_y * cos_r,
+            sin_y * sin_p * sin_r + cos_y * cos_r,
+            cos_p * sin_r
+        ], axis=-1)
+        half_width_offset = local_y_axis * (self.lane_widths[:, np.newaxis] / 2)
+        return self.locations + half_width_offset, self.locations - half_width_offset
+
+    @cached_property
+    def segment_quads(self) -> np.ndarray:
+        """
+        (N, 4, 2) 2D polygons of the lane segments between waypoint i and waypoint (i+1) % N,
+        in the same corner order as RoarPyWaypoint.distance_to_waypoint_polygon.
+        """
+        line_pos, line_neg = self.line_representations
+        return np.ascontiguousarray(np.stack([
+            line_pos[:, :2],
+            line_neg[:, :2],
+            np.roll(line_neg[:, :2], -1, axis=0),
+            np.roll(line_pos[:, :2], -1, axis=0)
+        ], axis=1), dtype=np.float64)
+
+    @cached_property
+    def spatial_index(self) -> "RoarPyWaypointsSpatialIndex":
+        """
+        Spatial index over segment_quads, built on first access and shared by everyone holding this array.
+        """
+        from .waypoint_spatial_index import RoarPyWaypointsSpatialIndex
+        return RoarPyWaypointsSpatialIndex(self.segment_quads)
+
+    def to_list(self) -> List[RoarPyWaypoint]:
+        return list(self)
+
+    @staticmethod
+    def from_waypoints(waypoints: Union[Iterable[RoarPyWaypoint], "RoarPyWaypointArray"]) -> "RoarPyWaypointArray":
+        if isinstance(waypoints, RoarPyWaypointArray):
+            return waypoints
+        waypoints = list(waypoints)
+        if len(waypoints) == 0:
+            return RoarPyWaypointArray(np.zeros((0, 3)), np.zeros((0, 3)), np.zeros((0,)))
+        return RoarPyWaypointArray(
+            np.stack([waypoint.location for waypoint in waypoints], axis=0),
+            np.stack([waypoint.roll_pitch_yaw for waypoint in waypoints], axis=0),
+            np.asarray([waypoint.lane_width for waypoint in waypoints])
+        )
+
+    @staticmethod
+    def load_waypoint_list(waypoint_dict : dict) -> "RoarPyWaypointArray":
+        return RoarPyWaypointArray(
+            waypoint_dict['locations'],
+            waypoint_dict['rotations'],
+            waypoint_dict['lane_widths']
+        )
+
+    @staticmethod
+    def save_waypoint_list(waypoints: Union[Iterable[RoarPyWaypoint], "RoarPyWaypointArray"]) -> dict:
+        waypoints = RoarPyWaypointArray.from_waypoints(waypoints)
+        return {
+            'locations': waypoints.locations,
+            'rotations': waypoints.roll_pitch_yaws,
+            'lane_widths': waypoints.lane_widths
+        }
+
+    @staticmethod
+    def concatenate(waypoint_arrays: Iterable[Union[Iterable[RoarPyWaypoint], "RoarPyWaypointArray"]]) -> "RoarPyWaypointArray":
+        waypoint_arrays = [RoarPyWaypointArray.from_waypoints(waypoints) for waypoints in waypoint_arrays]
+        if len(waypoint_arrays) == 0:
+            return RoarPyWaypointArray.from_waypoints([])
+        return RoarPyWaypointArray(
+            np.concatenate([waypoints.locations for waypoints in waypoint_arrays], axis=0),
+            np.concatenate([waypoints.roll_pitch_yaws for waypoints in waypoint_arrays], axis=0),
+            np.concatenate([waypoints.lane_widths for waypoints in waypoint_arrays], axis=0)
+        )
+
+    @staticmethod
+    def load_waypoint_dir(waypoint_dir : str, mmap_mode : Optional[str] = "r") -> "RoarPyWaypointArray":
+        """
+        Loads waypoints saved by save_waypoint_dir (one uncompressed .npy file per field).
+        With the default mmap_mode="r" the arrays are read-only memory maps, so every process
+        loading the same directory shares one copy in the OS page cache.
+        """
+        return RoarPyWaypointArray.load_waypoint_list({
+            key: np.load(os.path.join(waypoint_dir, key + ".npy"), mmap_mode=mmap_mode)
+            for key in ('locations', 'rotations', 'lane_widths')
+        })
+
+    @staticmethod
+    def save_waypoint_dir(waypoints: Union[Iterable[RoarPyWaypoint], "RoarPyWaypointArray"], waypoint_dir : str) -> None:
+        os.makedirs(waypoint_dir, exist_ok=True)
+        for key, value in RoarPyWaypointArray.save_waypoint_list(waypoints).items():
+            np.save(os.path.join(waypoint_dir, key + ".npy"), np.ascontiguousarray(value))
+
 RoarPyWaypointsProjection = namedtuple("RoarPyWaypointsProjectResult", ["waypoint_idx", "distance_from_waypoint"])
 
 class RoarPyWaypointsTracker:
-    waypoints: List[RoarPyWaypoint]
+    waypoints: RoarPyWaypointArray
+    # Segments searched in each direction around start_idx by default, points outside of this window are relocalized globally
+    DEFAULT_SEARCH_RADIUS : int = 32
 
     def __init__(
         self,
-        waypoints: List[RoarPyWaypoint],
-        current_traced_index: int = 0
+        waypoints: Union[List[RoarPyWaypoint], RoarPyWaypointArray],
+        current_traced_index: int = 0,
+        search_radius: Optional[int] = DEFAULT_SEARCH_RADIUS
     ):
+        """
+        :param waypoints: waypoints of a closed track
+        :param current_traced_index: index of the current traced waypoint
+        :param search_radius: default number of segments searched in each direction around start_idx in trace_point,
+            points that fall outside of every segment of the window are relocalized through the spatial index.
+            None always searches the whole track through the spatial index
+        """
         assert len(waypoints) > 1
-        self._waypoints = waypoints
-        self._distance_between_waypoints : List[float] = []
-        self._total_distance_from_first_waypoint : List[float] = []
-        self._total_distance = 0
+        self._waypoints = RoarPyWaypointArray.from_waypoints(waypoints)
+        self._distance_between_waypoints : np.ndarray = np.zeros((0,))
+        self._total_distance_from_first_waypoint : np.ndarray = np.zeros((0,))
+        self._total_distance = 0.0
+        self._segment_quads : np.ndarray = self._waypoints.segment_quads
         self._rebuild_waypoints_distances()
         self.current_traced_index = current_traced_index
+        self.search_radius = search_radius
 
     @property
-    def waypoints(self) -> List[RoarPyWaypoint]:
+    def waypoints(self) -> RoarPyWaypointArray:
         return self._waypoints
     
     @waypoints.setter
-    def waypoints(self, waypoints: List[RoarPyWaypoint]):
+    def waypoints(self, waypoints: Union[List[RoarPyWaypoint], RoarPyWaypointArray]):
         assert len(waypoints) > 1
-        self._waypoints = waypoints
+        self._waypoints = RoarPyWaypointArray.from_waypoints(waypoints)
+        self._segment_quads = self._waypoints.segment_quads
         self._rebuild_waypoints_distances()
     
     def _rebuild_waypoints_distances(self) -> None:
-        self._distance_between_waypoints = []
-        self._total_distance_from_first_waypoint = []
-        self._total_distance = 0
-        for i in range(len(self._waypoints)):
-            self._total_distance_from_first_waypoint.append(self._total_distance)
-            if i == len(self._waypoints) - 1:
-                self._distance_between_waypoints.append(np.linalg.norm(self._waypoints[i].location - self._waypoints[0].location))
-            else:
-                self._distance_between_waypoints.append(np.linalg.norm(self._waypoints[i].location - self._waypoints[i+1].location))
-            self._total_distance += self._distance_between_waypoints[-1]
+        locations = self._waypoints.locations.astype(np.float64)
+        # Segment i goes from waypoint i to waypoint (i+1) % N, the track is closed
+        self._distance_between_waypoints = np.linalg.norm(np.roll(locations, -1, axis=0) - locations, axis=1)
+        cumulative_distance = np.cumsum(self._distance_between_waypoints)
+        self._total_distance_from_first_waypoint = np.concatenate([[0.0], cumulative_distance[:-1]])
+        self._total_distance = float(cumulative_distance[-1])
 
-    def trace_point(self, point: np.ndarray, start_idx : int = 0) -> RoarPyWaypointsProjection:
+    def _search_offsets(self, search_radius : int) -> np.ndarray:
+        # Segment offsets relative to start_idx, interleaved as [0, -1, 1, -2, 2, ...] so that on ties
+        # the forward segment closest to start_idx wins, same as walking forward / backward step by step
+        num_steps = max(min(int(search_radius), int(math.ceil(len(self.waypoints)/2)) + 1), 1)
+        offsets = np.empty(num_steps * 2, dtype=np.int64)
+        offsets[0::2] = np.arange(0, num_steps)
+        offsets[1::2] = -np.arange(1, num_steps + 1)
+        return offsets
+
+    @property
+    def spatial_index(self) -> "RoarPyWaypointsSpatialIndex":
+        return self._waypoints.spatial_index
+
+    def _relocalize(self, point: np.ndarray, start_idx : Optional[int]) -> int:
+        # Global nearest segment lookup, ties are broken the same way as the windowed search around start_idx
+        candidate_indices, _ = self.spatial_index.nearest_segments(point)
+        if start_idx is None or len(candidate_indices) == 1:
+            return int(candidate_indices[0])
+        size_of_waypoints = len(self.waypoints)
+        forward_rank = 2 * ((candidate_indices - start_idx) % size_of_waypoints)
+        backward_rank = 2 * ((start_idx - candidate_indices) % size_of_waypoints) - 1
+        rank = np.where(backward_rank < 0, forward_rank, np.minimum(forward_rank, backward_rank))
+        return int(candidate_indices[np.argmin(rank)])
+
+    def trace_point(self, point: np.ndarray, start_idx : Optional[int] = 0, search_radius : Optional[int] = None) -> RoarPyWaypointsProjection:
         """
         Trace a point to the closest waypoint
         :param point: point to be traced
-        :param start_idx: index to start tracing
+        :param start_idx: index to start tracing, None if unknown (e.g. after a respawn)
+        :param search_radius: number of segments searched in each direction around start_idx, defaults to self.search_radius.
+            None searches the whole track through the spatial index, otherwise a point that falls outside every
+            segment of the window is considered lost and relocalized through the spatial index.
         :return: index of the closest waypoint
         """
         size_of_waypoints = len(self.waypoints)
         assert size_of_waypoints > 1
 
-        point_p = Point(point[:2])
-
-        min_dist_idx, min_dist = 0, float("inf")
-        for i in range(1, int(math.ceil(size_of_waypoints/2)) + 2):
-            forward_waypoint_prev = self.waypoints[(start_idx + i - 1) % size_of_waypoints]
-            forward_waypoint_after = self.waypoints[(start_idx + i) % size_of_waypoints]
-            backward_waypoint_prev = self.waypoints[(start_idx - i) % size_of_waypoints]
-            backward_waypoint_after = self.waypoints[(start_idx - i + 1) % size_of_waypoints]
-            forward_distance = RoarPyWaypoint.distance_to_waypoint_polygon(forward_waypoint_prev, forward_waypoint_after, point_p)
-            backward_distance = RoarPyWaypoint.distance_to_waypoint_polygon(backward_waypoint_prev, backward_waypoint_after, point_p)
-            if forward_distance < min_dist:
-                min_dist_idx = (start_idx + i - 1) % size_of_waypoints
-                min_dist = forward_distance
-            if backward_distance < min_dist:
-                min_dist_idx = (start_idx - i) % size_of_waypoints
-                min_dist = backward_distance
-            if min_dist == 0:
-                break
+        if search_radius is None:
+            search_radius = self.search_radius
+        if start_idx is None or search_radius is None:
+            min_dist_idx = self._relocalize(point, start_idx)
+        else:
+            candidate_indices = (start_idx + self._search_offsets(search_radius)) % size_of_waypoints
+            distances = _distances_to_quads(self._segment_quads, candidate_indices, float(point[0]), float(point[1]))
+            best_candidate = np.argmin(distances)
+            if distances[best_candidate] > 0:
+                min_dist_idx = self._relocalize(point, start_idx)
+            else:
+                min_dist_idx = int(candidate_indices[best_candidate])
         
-        prev_waypoint = self.waypoints[min_dist_idx]
-        after_waypoint = self.waypoints[(min_dist_idx + 1) % size_of_waypoints]
+        prev_location = self.waypoints.locations[min_dist_idx]
+        after_location = self.waypoints.locations[(min_dist_idx + 1) % size_of_waypoints]
         distance_between_waypoints = self._distance_between_waypoints[min_dist_idx]
-        wp_delta_vector = after_waypoint.location - prev_waypoint.location
-        location_delta_vector = point - prev_waypoint.location
+        wp_delta_vector = after_location - prev_location
+        location_delta_vector = point - prev_location
         projected_distance = np.dot(wp_delta_vector, location_delta_vector) / distance_between_waypoints
         
         return RoarPyWaypointsProjection(
@@ -168,62 +415,81 @@ class RoarPyWaypointsTracker:
             projected_distance
         )
 
+    def trace_points(self, points: np.ndarray, start_idx : Optional[np.ndarray] = None, search_radius : Optional[int] = None) -> RoarPyWaypointsProjection:
+        """
+        Batched version of trace_point, e.g. for all vehicles of a multi-agent run
+        :param points: (N, 3) points to be traced
+        :param start_idx: (N, ) indices to start tracing, None if unknown
+        :param search_radius: number of segments searched in each direction around start_idx, defaults to self.search_radius
+        :return: projection whose fields are (N, ) arrays
+        """
+        size_of_waypoints = len(self.waypoints)
+        assert size_of_waypoints > 1
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+
+        if search_radius is None:
+            search_radius = self.search_radius
+        if start_idx is None or search_radius is None:
+            min_dist_idx = np.zeros(len(points), dtype=np.int64)
+            is_lost = np.ones(len(points), dtype=bool)
+        else:
+            start_idx = np.broadcast_to(np.asarray(start_idx, dtype=np.int64), (len(points),))
+            min_dist_idx, min_dist = _trace_points_in_windows(self._segment_quads, points[:, :2], start_idx, self._search_offsets(search_radius))
+            is_lost = min_dist > 0
+        
+        # Only points outside of their window (or without one) go through the spatial index
+        for i in np.nonzero(is_lost)[0]:
+            min_dist_idx[i] = self._relocalize(points[i], None if start_idx is None else int(start_idx[i]))
+
+        prev_locations = self.waypoints.locations[min_dist_idx]
+        after_locations = self.waypoints.locations[(min_dist_idx + 1) % size_of_waypoints]
+        projected_distances = np.sum((after_locations - prev_locations) * (points - prev_locations), axis=-1) / self._distance_between_waypoints[min_dist_idx]
+        return RoarPyWaypointsProjection(
+            min_dist_idx,
+            projected_distances
+        )
+
+    def _projections_from_distances(self, distances_from_first_waypoint : np.ndarray) -> RoarPyWaypointsProjection:
+        # Vectorized version of _projection_from_distance
+        distances = np.mod(distances_from_first_waypoint, self._total_distance)
+        distances = np.where(distances >= self._total_distance, 0.0, distances)
+        waypoint_idx = np.searchsorted(self._total_distance_from_first_waypoint, distances, side="right") - 1
+        return RoarPyWaypointsProjection(
+            waypoint_idx,
+            distances - self._total_distance_from_first_waypoint[waypoint_idx]
+        )
+
+    def trace_forward_projections(self, projection_idx : np.ndarray, projection_distance : np.ndarray, distances : np.ndarray) -> RoarPyWaypointsProjection:
+        """
+        Batched version of trace_forward_projection
+        :param projection_idx: (N, ) waypoint_idx of the projections
+        :param projection_distance: (N, ) distance_from_waypoint of the projections
+        :param distances: (M, ) distances to trace forward, negative values trace backward
+        :return: projection whose fields are (N, M) arrays
+        """
+        origin_distances = self._total_distance_from_first_waypoint[np.asarray(projection_idx, dtype=np.int64)] + np.asarray(projection_distance, dtype=np.float64)
+        return self._projections_from_distances(origin_distances[:, np.newaxis] + np.asarray(distances, dtype=np.float64)[np.newaxis, :])
+
+    def _projection_from_distance(self, distance_from_first_waypoint : float) -> RoarPyWaypointsProjection:
+        # Binary search the cumulative distance table, wrapping around the closed track
+        distance = distance_from_first_waypoint % self._total_distance
+        if distance >= self._total_distance:
+            distance = 0.0
+        waypoint_idx = int(np.searchsorted(self._total_distance_from_first_waypoint, distance, side="right")) - 1
+        return RoarPyWaypointsProjection(
+            waypoint_idx,
+            distance - self._total_distance_from_first_waypoint[waypoint_idx]
+        )
+
     def trace_forward_projection(self, projection : RoarPyWaypointsProjection, distance : float) -> RoarPyWaypointsProjection:
         """
         Trace forward from a projection result
         :param projection: projection result
-        :param distance: distance to trace forward
+        :param distance: distance to trace forward, negative values trace backward
         :return: new projection result
         """
-        size_of_waypoints = len(self.waypoints)
-        assert size_of_waypoints > 1
-        
-        distance %= self._total_distance
-
-        if distance >= 0:
-            current_projection = copy.copy(projection)
-            remaining_distance = distance
-            while remaining_distance > 0:
-                to_progress = self._distance_between_waypoints[current_projection.waypoint_idx] - current_projection.distance_from_waypoint
-                if remaining_distance < to_progress:
-                    current_projection = RoarPyWaypointsProjection(
-                        current_projection.waypoint_idx,
-                        current_projection.distance_from_waypoint + remaining_distance
-                    )
-                    remaining_distance = 0
-                    break
-                else:
-                    remaining_distance -= to_progress
-                    current_projection = RoarPyWaypointsProjection(
-                        (current_projection.waypoint_idx + 1) % size_of_waypoints,
-                        0
-                    )
-                    continue
-            return current_projection
-        else:
-            current_projection = copy.copy(projection)
-            remaining_distance = -distance
-            while remaining_distance > 0:
-                to_progress = current_projection.distance_from_waypoint
-                if remaining_distance < to_progress:
-                    current_projection = RoarPyWaypointsProjection(
-                        current_projection.waypoint_idx,
-                        current_projection.distance_from_waypoint - remaining_distance
-                    )
-                    remaining_distance = 0
-                    break
-                else:
-                    remaining_distance -= to_progress
-                    current_projection = RoarPyWaypointsProjection(
-                        (current_projection.waypoint_idx - 1) % size_of_waypoints,
-                        self._distance_between_waypoints[(current_projection.waypoint_idx - 1) % size_of_waypoints]
-                    )
-                    continue
-            if current_projection.distance_from_waypoint == self._distance_between_waypoints[current_projection.waypoint_idx]:
-                current_projection.waypoint_idx = (current_projection.waypoint_idx + 1) % size_of_waypoints
-                current_projection.distance_from_waypoint = 0
-            
-            return current_projection
+        assert len(self.waypoints) > 1
+        return self._projection_from_distance(self.total_distance_from_first_waypoint(projection) + distance)
     
     def delta_distance_projection(self, projection_origin : RoarPyWaypointsProjection, projection_destination : RoarPyWaypointsProjection) -> float:
         dist_origin = self.total_distance_from_first_waypoint(projection_origin)
@@ -234,11 +500,35 @@ class RoarPyWaypointsTracker:
         return delta_dist
 
     def get_interpolated_waypoint(self, projection: RoarPyWaypointsProjection) -> RoarPyWaypoint:
+        # Normalize first so projections past either end of their segment land on the right one
+        projection = self._projection_from_distance(self.total_distance_from_first_waypoint(projection))
         prev_wp = self.waypoints[projection.waypoint_idx]
         next_wp = self.waypoints[(projection.waypoint_idx + 1) % len(self.waypoints)]
-        alpha = np.clip(projection.distance_from_waypoint / self._distance_between_waypoints[projection.waypoint_idx], 0, 1)
-        return RoarPyWaypoint.interpolate(prev_wp, next_wp, alpha)
+        segment_length = self._distance_between_waypoints[projection.waypoint_idx]
+        alpha = np.clip(projection.distance_from_waypoint / segment_length, 0, 1) if segment_length > 0 else 0.0
+        # RoarPyWaypoint.interpolate weights its first argument by alpha
+        return RoarPyWaypoint.interpolate(next_wp, prev_wp, alpha)
     
+    def get_interpolated_waypoints(self, projections: RoarPyWaypointsProjection) -> RoarPyWaypointArray:
+        """
+        Batched version of get_interpolated_waypoint
+        :param projections: projection whose fields are arrays of any (matching) shape, e.g. the output of trace_forward_projections
+        :return: interpolated waypoints, flattened in C order
+        """
+        projections = self._projections_from_distances(
+            self._total_distance_from_first_waypoint[np.asarray(projections.waypoint_idx, dtype=np.int64).reshape(-1)] + np.asarray(projections.distance_from_waypoint, dtype=np.float64).reshape(-1)
+        )
+        prev_idx = projections.waypoint_idx
+        next_idx = (prev_idx + 1) % len(self.waypoints)
+        segment_lengths = self._distance_between_waypoints[prev_idx]
+        alpha = np.clip(np.divide(projections.distance_from_waypoint, segment_lengths, out=np.zeros_like(segment_lengths), where=segment_lengths > 0), 0, 1)
+        alpha_column = alpha[:, np.newaxis]
+        return RoarPyWaypointArray(
+            self.waypoints.locations[next_idx] * alpha_column + self.waypoints.locations[prev_idx] * (1 - alpha_column),
+            normalize_rad(self.waypoints.roll_pitch_yaws[next_idx] * alpha_column + self.waypoints.roll_pitch_yaws[prev_idx] * (1 - alpha_column)),
+            self.waypoints.lane_widths[next_idx] * alpha + self.waypoints.lane_widths[prev_idx] * (1 - alpha)
+        )
+
     def total_distance_from_first_waypoint(
         self,
         projection_result: RoarPyWaypointsProjection
@@ -0,0 +1,120 @@
+import numpy as np
+from typing import Optional, Tuple
+from .waypoint import RoarPyWaypointArray, _distances_to_quads
+
+class RoarPyWaypointsSpatialIndex:
+    """
+    Uniform grid over the bounding boxes of the lane segment quads of a waypoint set.
+
+    Each grid cell stores the indices of the segments whose bounding box touches it, laid out
+    column-major in one flat array (CSR style), so a box query only touches a few contiguous slices
+    and a nearest segment query only looks at a small neighbourhood of cells around the point.
+
+    -----------
+    Attributes:
+    -----------
+        segment_quads (np.ndarray):
+            (M, 4, 2) segment polygons, see RoarPyWaypointArray.segment_quads.
+        segment_bbox_min (np.ndarray):
+            (M, 2) lower corner of the bounding box of each segment.
+        segment_bbox_max (np.ndarray):
+            (M, 2) upper corner of the bounding box of each segment.
+        cell_size (float):
+            Edge length of a grid cell in meters.
+    """
+    def __init__(
+        self,
+        segment_quads : np.ndarray,
+        cell_size : Optional[float] = None
+    ):
+        assert segment_quads.ndim == 3 and segment_quads.shape[1:] == (4, 2)
+        self.segment_quads = np.ascontiguousarray(segment_quads, dtype=np.float64)
+        self.segment_bbox_min = self.segment_quads.min(axis=1)
+        self.segment_bbox_max = self.segment_quads.max(axis=1)
+        num_segments = len(self.segment_quads)
+
+        if cell_size is None:
+            # A cell roughly the size of a typical segment keeps the number of cells per segment small
+            extents = (self.segment_bbox_max - self.segment_bbox_min).max(axis=1) if num_segments > 0 else np.ones(1)
+            cell_size = float(np.median(extents))
+        self.cell_size = max(float(cell_size), 1e-3)
+
+        self._origin = self.segment_bbox_min.min(axis=0) if num_segments > 0 else np.zeros(2)
+        cell_lo = self._cell_coordinates(self.segment_bbox_min)
+        cell_hi = self._cell_coordinates(self.segment_bbox_max)
+        self._grid_shape = (cell_hi.max(axis=0) + 1) if num_segments > 0 else np.ones(2, dtype=np.int64)
+
+        # Expand every segment into the cells covered by its bounding box
+        cells_per_axis = cell_hi - cell_lo + 1
+        cells_per_segment = cells_per_axis[:, 0] * cells_per_axis[:, 1]
+        segment_ids = np.repeat(np.arange(num_segments), cells_per_segment)
+        local_ids = np.arange(len(segment_ids)) - np.repeat(np.cumsum(cells_per_segment) - cells_per_segment, cells_per_segment)
+        cell_x = cell_lo[segment_ids, 0] + local_ids // cells_per_axis[segment_ids, 1]
+        cell_y = cell_lo[segment_ids, 1] + local_ids % cells_per_axis[segment_ids, 1]
+        cell_ids = cell_x * self._grid_shape[1] + cell_y
+
+        order = np.argsort(cell_ids, kind="stable")
+        self._cell_segments = segment_ids[order]
+        self._cell_indptr = np.searchsorted(cell_ids[order], np.arange(self._grid_shape[0] * self._grid_shape[1] + 1))
+
+    @staticmethod
+    def from_waypoints(waypoints, cell_size : Optional[float] = None) -> "RoarPyWaypointsSpatialIndex":
+        return RoarPyWaypointsSpatialIndex(RoarPyWaypointArray.from_waypoints(waypoints).segment_quads, cell_size)
+
+    def __len__(self) -> int:
+        return len(self.segment_quads)
+
+    def _cell_coordinates(self, points_2d : np.ndarray) -> np.ndarray:
+        return np.floor((points_2d - self._origin) / self.cell_size).astype(np.int64)
+
+    def _gather_cells(self, cell_min : np.ndarray, cell_max : np.ndarray) -> np.ndarray:
+        x_min, y_min = max(cell_min[0], 0), max(cell_min[1], 0)
+        x_max, y_max = min(cell_max[0], self._grid_shape[0] - 1), min(cell_max[1], self._grid_shape[1] - 1)
+        if x_min > x_max or y_min > y_max:
+            return np.zeros((0,), dtype=np.int64)
+        # Cells of one column are contiguous in the flattened layout
+        slices = [
+            self._cell_segments[self._cell_indptr[x * self._grid_shape[1] + y_min]:self._cell_indptr[x * self._grid_shape[1] + y_max + 1]]
+            for x in range(x_min, x_max + 1)
+        ]
+        return np.unique(np.concatenate(slices))
+
+    def query_box(self, box_min : np.ndarray, box_max : np.ndarray) -> np.ndarray:
+        """
+        Returns the sorted indices of the segments whose bounding box intersects the axis aligned box [box_min, box_max].
+        """
+        box_min = np.asarray(box_min, dtype=np.float64)[:2]
+        box_max = np.asarray(box_max, dtype=np.float64)[:2]
+        candidates = self._gather_cells(self._cell_coordinates(box_min), self._cell_coordinates(box_max))
+        overlapping = np.all(
+            (self.segment_bbox_min[candidates] <= box_max) & (self.segment_bbox_max[candidates] >= box_min),
+            axis=1
+        )
+        return candidates[overlapping]
+
+    def nearest_segments(self, point : np.ndarray, tolerance : float = 0.0) -> Tuple[np.ndarray, float]:
+        """
+        Returns the sorted indices of all segments within `tolerance` of the minimum distance from the point,
+        together with that minimum distance. The searched neighbourhood doubles until no unvisited cell can be closer.
+        """
+        assert len(self) > 0
+        point_x, point_y = float(point[0]), float(point[1])
+        center_cell = self._cell_coordinates(np.array([point_x, point_y]))
+        radius = 1
+        while True:
+            candidates = self._gather_cells(center_cell - radius, center_cell + radius)
+            covers_grid = np.all(center_cell - radius <= 0) and np.all(center_cell + radius >= self._grid_shape - 1)
+            if len(candidates) > 0:
+                distances = _distances_to_quads(self.segment_quads, candidates, point_x, point_y)
+                min_distance = float(distances.min())
+                # Any segment outside the searched cells is at least radius * cell_size away
+                if covers_grid or min_distance + tolerance <= radius * self.cell_size:
+                    return candidates[distances <= min_distance + tolerance], min_distance
+            radius *= 2
+
+    def nearest_segment(self, point : np.ndarray) -> Tuple[int, float]:
+        """
+        Returns the index of (and distance to) the segment closest to the point, the lowest index wins on ties.
+        """
+        indices, distance = self.nearest_segments(point)
+        return int(indices[0]), distance
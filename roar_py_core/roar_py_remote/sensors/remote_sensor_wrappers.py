@@ -38,15 +38,18 @@ class RoarPyRemoteServerSensorWrapper(typing.Generic[_ObsTServer], RoarPySensorW
         RoarPySensorWrapper.__init__(self, sensor, "RoarPyRemoteServerSensor")
         RoarPyObjectWithRemoteMessage.__init__(self)
         self._pack_obs_spec = True
+        # Legacy encodings until the client announces that it decodes the array codecs
+        self._accepts_array_codecs = False
     
     def _depack_info(self, data: RoarPyRemoteSensorObsInfoRequest) -> bool:
         if data.close:
             self.close()
         self._pack_obs_spec = data.need_obs_spec
+        self._accepts_array_codecs = data.accepts_array_codecs
         return True
     
     def _pack_info(self) -> RoarPyRemoteSensorObsInfo:
-        return RoarPyRemoteSensorObsInfo.from_sensor(self, self._pack_obs_spec)
+        return RoarPyRemoteSensorObsInfo.from_sensor(self, self._pack_obs_spec, self._accepts_array_codecs)
     
     async def _tick_remote(self):
         await self.receive_observation()
\ No newline at end of file
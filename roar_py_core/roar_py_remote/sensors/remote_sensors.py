@@ -1,4 +1,4 @@
-from roar_py_interface import RoarPySensor, RoarPyRemoteSupportedSensorData, RoarPyRemoteSupportedSensorSerializationScheme
+from roar_py_interface import RoarPySensor, RoarPyRemoteSupportedSensorData, RoarPyRemoteSupportedSensorSerializationScheme, RoarPyFrameNotifier
 from ..base import RoarPyObjectWithRemoteMessage, register_object_with_remote_message
 from typing import Any, TypeVar, Generic, Optional, Type
 import gymnasium as gym
@@ -65,13 +65,16 @@ class RoarPyRemoteSensorObsInfo:
             return last_data_type_real
     
     @staticmethod
-    def from_sensor(sensor: RoarPySensor, pack_obs_spec : bool) -> "RoarPyRemoteSensorObsInfo":
+    def from_sensor(sensor: RoarPySensor, pack_obs_spec : bool, accepts_array_codecs : bool = False) -> "RoarPyRemoteSensorObsInfo":
         last_obs = sensor.get_last_observation()
         assert last_obs is None or isinstance(last_obs, RoarPyRemoteSupportedSensorData)
+        if last_obs is not None:
+            scheme = RoarPyRemoteSupportedSensorSerializationScheme.MSGPACK_COMPRESSED
+            last_data = last_obs.to_data(scheme) if accepts_array_codecs else last_obs.to_legacy_data(scheme)
         return RoarPyRemoteSensorObsInfo(
             name = sensor.name,
             control_timestep = sensor.control_timestep,
-            last_data = base64.b64encode(last_obs.to_data(RoarPyRemoteSupportedSensorSerializationScheme.MSGPACK_COMPRESSED)).decode("ascii") if last_obs is not None else None,
+            last_data = base64.b64encode(last_data).decode("ascii") if last_obs is not None else None,
             last_data_type = last_obs.__class__.__name__,
             obs_spec = base64.b64encode(zlib.compress(pickle.dumps(sensor.get_gym_observation_spec(), protocol=pickle.DEFAULT_PROTOCOL))).decode("ascii") if pack_obs_spec else None,
             is_closed = sensor.is_closed()
@@ -82,6 +85,8 @@ class RoarPyRemoteSensorObsInfo:
 class RoarPyRemoteSensorObsInfoRequest:
     close : bool
     need_obs_spec : bool
+    # Whether the client decodes the array codecs (mask_codec / depth_codec), older clients leave it out and get the legacy encodings
+    accepts_array_codecs : bool = False
 
 _ObsTClient = TypeVar("_ObsTClient", bound=RoarPyRemoteSupportedSensorData)
 
@@ -96,11 +101,15 @@ class RoarPyRemoteClientSensor(RoarPySensor[_ObsTClient], Generic[_ObsTClient],
         self._closed = False
         self._last_data = None
         self._new_data = None
+        self._new_data_notifier = RoarPyFrameNotifier()
+        # Frame count of the last observation handed out by receive_observation / receive_next_observation
+        self._consumed_frame = 0
         self._data_type = None
         self._obs_spec = None
         self.new_request : RoarPyRemoteSensorObsInfoRequest = RoarPyRemoteSensorObsInfoRequest(
             close = False,
-            need_obs_spec = True
+            need_obs_spec = True,
+            accepts_array_codecs = True
         )
         self._depack_info(start_info)
     
@@ -114,6 +123,7 @@ class RoarPyRemoteClientSensor(RoarPySensor[_ObsTClient], Generic[_ObsTClient],
         new_data = data.get_last_obs()
         if new_data is not None:
             self._new_data = new_data
+            self._new_data_notifier.notify()
         
         new_data_type = data.get_last_obs_type()
         if new_data_type is not None:
@@ -136,8 +146,16 @@ class RoarPyRemoteClientSensor(RoarPySensor[_ObsTClient], Generic[_ObsTClient],
         return self._obs_spec
     
     async def receive_observation(self) -> _ObsT:
-        while self._new_data is None:
-            await asyncio.sleep(0.001)
+        # Only waits for the first observation, without new data from the server the latest one is handed out again
+        self._consumed_frame = await self._new_data_notifier.wait_for_frame(1)
+        self._last_data = self._new_data
+        return self._last_data
+
+    async def receive_next_observation(self) -> _ObsT:
+        """
+        Like receive_observation, but waits for a frame newer than the last one handed out by receive_observation / receive_next_observation.
+        """
+        self._consumed_frame = await self._new_data_notifier.wait_for_frame(self._consumed_frame + 1)
         self._last_data = self._new_data
         return self._last_data
     
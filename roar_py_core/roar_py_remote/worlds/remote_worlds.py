@@ -1,5 +1,5 @@
 from roar_py_interface.worlds import RoarPyWorld
-from roar_py_interface.worlds.waypoint import RoarPyWaypoint
+from roar_py_interface.worlds.waypoint import RoarPyWaypoint, RoarPyWaypointArray
 from roar_py_interface.wrappers.wrapper_base import RoarPyWrapper
 from ..base import RoarPyObjectWithRemoteMessage, register_object_with_remote_message
 from roar_py_interface import RoarPyWaypoint, RoarPyWorldWrapper, RoarPyWorld
@@ -14,9 +14,27 @@ import copy
 @serde
 @dataclass
 class RoarPyRemoteWorldInitInfo:
+    # Waypoint lists, the only form older clients decode, only filled for clients that did not set accepts_waypoint_arrays
     maneuverable_waypoints: Optional[List[RoarPyWaypoint]]
     comprehensive_waypoints: Optional[Dict[Union[int, str, Any], List[RoarPyWaypoint]]]
     is_asynchronous: bool
+    # Struct-of-arrays form of the waypoints, older servers leave them out
+    maneuverable_waypoint_array: Optional[RoarPyWaypointArray] = None
+    comprehensive_waypoint_arrays: Optional[Dict[Union[int, str, Any], RoarPyWaypointArray]] = None
+
+    def get_maneuverable_waypoints(self) -> Optional[RoarPyWaypointArray]:
+        if self.maneuverable_waypoint_array is not None:
+            return self.maneuverable_waypoint_array
+        if self.maneuverable_waypoints is not None:
+            return RoarPyWaypointArray.from_waypoints(self.maneuverable_waypoints)
+        return None
+
+    def get_comprehensive_waypoints(self) -> Optional[Dict[Any, RoarPyWaypointArray]]:
+        if self.comprehensive_waypoint_arrays is not None:
+            return self.comprehensive_waypoint_arrays
+        if self.comprehensive_waypoints is not None:
+            return {key: RoarPyWaypointArray.from_waypoints(value) for key, value in self.comprehensive_waypoints.items()}
+        return None
 
 @serde
 @dataclass
@@ -35,6 +53,8 @@ class RoarPyRemoteWorldObsInfoRequest:
     step: bool
     actor_request_map : Dict[int, RoarPyRemoteActorObsInfoRequest]
     sensor_request_map : Dict[int, RoarPyRemoteSensorObsInfoRequest]
+    # Whether the client decodes the RoarPyWaypointArray fields of RoarPyRemoteWorldInitInfo, older clients leave it out and get waypoint lists
+    accepts_waypoint_arrays : bool = False
 
 @register_object_with_remote_message(RoarPyRemoteWorldObsInfoRequest, RoarPyRemoteWorldObsInfo)
 class RoarPyRemoteServerWorldWrapper(RoarPyObjectWithRemoteMessage[RoarPyRemoteWorldObsInfoRequest, RoarPyRemoteWorldObsInfo], RoarPyWorldWrapper):
@@ -50,6 +70,7 @@ class RoarPyRemoteServerWorldWrapper(RoarPyObjectWithRemoteMessage[RoarPyRemoteW
 
         self._req_next_tick = False
         self._req_need_init_info = False
+        self._req_accepts_waypoint_arrays = False
     
     async def step(self) -> float:
         dt = await RoarPyWorldWrapper.step(self)
@@ -105,6 +126,7 @@ class RoarPyRemoteServerWorldWrapper(RoarPyObjectWithRemoteMessage[RoarPyRemoteW
         self._stepped = False
         self._stepped_dt = 0.0
         self._req_need_init_info = data.need_init_info
+        self._req_accepts_waypoint_arrays = data.accepts_waypoint_arrays
         self._req_next_tick = data.step
         self._refresh_actor_list()
         for oid, actor_request in data.actor_request_map.items():
@@ -116,6 +138,27 @@ class RoarPyRemoteServerWorldWrapper(RoarPyObjectWithRemoteMessage[RoarPyRemoteW
                 self.sensor_map[oid]._depack_info(sensor_request)
         return True
     
+    def _pack_init_info(self) -> RoarPyRemoteWorldInitInfo:
+        maneuverable_waypoints = self.maneuverable_waypoints
+        comprehensive_waypoints = self.comprehensive_waypoints
+        if self._req_accepts_waypoint_arrays:
+            return RoarPyRemoteWorldInitInfo(
+                maneuverable_waypoints=None,
+                comprehensive_waypoints=None,
+                is_asynchronous=self.is_asynchronous,
+                maneuverable_waypoint_array=RoarPyWaypointArray.from_waypoints(maneuverable_waypoints) if maneuverable_waypoints is not None else None,
+                comprehensive_waypoint_arrays={
+                    key: RoarPyWaypointArray.from_waypoints(value) for key, value in comprehensive_waypoints.items()
+                } if comprehensive_waypoints is not None else None
+            )
+        return RoarPyRemoteWorldInitInfo(
+            maneuverable_waypoints=list(maneuverable_waypoints) if maneuverable_waypoints is not None else None,
+            comprehensive_waypoints={
+                key: list(value) for key, value in comprehensive_waypoints.items()
+            } if comprehensive_waypoints is not None else None,
+            is_asynchronous=self.is_asynchronous
+        )
+
     def _pack_info(self) -> RoarPyRemoteWorldObsInfo:
         self._refresh_actor_list()
         self._refresh_sensor_list()
@@ -126,11 +169,7 @@ class RoarPyRemoteServerWorldWrapper(RoarPyObjectWithRemoteMessage[RoarPyRemoteW
         for oid, sensor in self.sensor_map.items():
             sensor_info_map[oid] = sensor._pack_info()
         ret = RoarPyRemoteWorldObsInfo(
-            init_info=None if not self._req_need_init_info else RoarPyRemoteWorldInitInfo(
-                maneuverable_waypoints=list(self.maneuverable_waypoints),
-                comprehensive_waypoints=self.comprehensive_waypoints,
-                is_asynchronous=self.is_asynchronous
-            ),
+            init_info=self._pack_init_info() if self._req_need_init_info else None,
             stepped=self._stepped,
             stepped_dt=self._stepped_dt,
             actor_info_map=actor_info_map,
@@ -169,11 +208,11 @@ class RoarPyRemoteClientWorld(RoarPyWorld, RoarPyObjectWithRemoteMessage[RoarPyR
         return list(self._sensor_map.values())
     
     @property
-    def maneuverable_waypoints(self) -> Optional[Iterable[RoarPyWaypoint]]:
+    def maneuverable_waypoints(self) -> Optional[RoarPyWaypointArray]:
         return self._maneuverable_waypoints
 
     @property
-    def comprehensive_waypoints(self) -> Optional[Dict[Any, List[RoarPyWaypoint]]]:
+    def comprehensive_waypoints(self) -> Optional[Dict[Any, RoarPyWaypointArray]]:
         return self._comprehensive_waypoints
 
     def _update_actor_map(self, actor_info_map : Dict[int, RoarPyRemoteActorObsInfo]) -> None:
@@ -229,8 +268,8 @@ class RoarPyRemoteClientWorld(RoarPyWorld, RoarPyObjectWithRemoteMessage[RoarPyR
 
     def _depack_info(self, data: RoarPyRemoteWorldObsInfo) -> bool:
         if data.init_info is not None:
-            self._maneuverable_waypoints = data.init_info.maneuverable_waypoints
-            self._comprehensive_waypoints = data.init_info.comprehensive_waypoints
+            self._maneuverable_waypoints = data.init_info.get_maneuverable_waypoints()
+            self._comprehensive_waypoints = data.init_info.get_comprehensive_waypoints()
             self._is_asynchronous = data.init_info.is_asynchronous
             self._req_need_init_info = False
         
@@ -256,4 +295,5 @@ class RoarPyRemoteClientWorld(RoarPyWorld, RoarPyObjectWithRemoteMessage[RoarPyR
             step=True, # Always step on the server side
             actor_request_map={oid: actor._pack_info() for oid, actor in self._actor_map.items()},
             sensor_request_map={oid: sensor._pack_info() for oid, sensor in self._sensor_map.items()},
+            accepts_waypoint_arrays=True
         )
\ No newline at end of file
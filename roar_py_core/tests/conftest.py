@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from roar_py_interface import RoarPyWaypointArray
+
+def circle_waypoints(num_waypoints : int = 200, radius : float = 50.0, lane_width : float = 4.0) -> RoarPyWaypointArray:
+    """
+    Counter-clockwise closed circular track around the origin, the yaw of every waypoint points along the track.
+    """
+    angles = np.linspace(0.0, 2 * np.pi, num_waypoints, endpoint=False)
+    locations = np.stack([radius * np.cos(angles), radius * np.sin(angles), np.zeros_like(angles)], axis=1)
+    roll_pitch_yaws = np.stack([np.zeros_like(angles), np.zeros_like(angles), angles + np.pi / 2], axis=1)
+    return RoarPyWaypointArray(locations, roll_pitch_yaws, np.full(num_waypoints, lane_width))
+
+@pytest.fixture
+def circle_track() -> RoarPyWaypointArray:
+    return circle_waypoints()
+
+def rasterize_quads_reference(quads_px : np.ndarray, height : int, width : int) -> np.ndarray:
+    """
+    Per pixel even-odd test of the pixel centers (px, py) against (N, 4, 2) quads in pixel coordinates,
+    reference for the scanline fill of occupancy_map.fill_quads. Returns a (height, width) bool array.
+    """
+    pixel_y, pixel_x = np.mgrid[0:height, 0:width].astype(np.float64)
+    inside = np.zeros((height, width), dtype=bool)
+    for quad in np.asarray(quads_px, dtype=np.float64):
+        crossings_left = np.zeros((height, width), dtype=np.int64)
+        for k in range(4):
+            (x0, y0), (x1, y1) = quad[k], quad[(k + 1) % 4]
+            if y0 == y1:
+                continue
+            spans = ((y0 <= pixel_y) & (pixel_y < y1)) | ((y1 <= pixel_y) & (pixel_y < y0))
+            crossing_x = x0 + (pixel_y - y0) * (x1 - x0) / (y1 - y0)
+            crossings_left += spans & (crossing_x <= pixel_x)
+        inside |= crossings_left % 2 == 1
+    return inside
+
+def wavy_waypoints(num_waypoints : int = 150, radius : float = 30.0, lane_width : float = 5.0) -> RoarPyWaypointArray:
+    """
+    Closed track with a varying radius and lane width, so that lane quads are not all alike.
+    """
+    angles = np.linspace(0.0, 2 * np.pi, num_waypoints, endpoint=False)
+    radii = radius * (1.0 + 0.3 * np.sin(3 * angles))
+    locations = np.stack([radii * np.cos(angles), radii * np.sin(angles), np.zeros_like(angles)], axis=1)
+    deltas = np.roll(locations, -1, axis=0) - np.roll(locations, 1, axis=0)
+    roll_pitch_yaws = np.stack([np.zeros_like(angles), np.zeros_like(angles), np.arctan2(deltas[:, 1], deltas[:, 0])], axis=1)
+    return RoarPyWaypointArray(locations, roll_pitch_yaws, lane_width * (1.0 + 0.2 * np.cos(5 * angles)))
+
+def sample_grid_reference(grid : np.ndarray, affine : np.ndarray, height : int, width : int) -> np.ndarray:
+    """
+    Nearest neighbour lookup of the (grid_height, grid_width) bool grid at affine @ (px, py, 1) for every pixel,
+    reference for occupancy_raster.sample_packed_grid. Cells outside of the grid are free.
+    """
+    pixel_y, pixel_x = np.mgrid[0:height, 0:width].astype(np.float64)
+    cell_x = np.floor(affine[0, 0] * pixel_x + affine[0, 1] * pixel_y + affine[0, 2] + 0.5).astype(np.int64)
+    cell_y = np.floor(affine[1, 0] * pixel_x + affine[1, 1] * pixel_y + affine[1, 2] + 0.5).astype(np.int64)
+    in_grid = (cell_x >= 0) & (cell_x < grid.shape[1]) & (cell_y >= 0) & (cell_y < grid.shape[0])
+    sampled = np.zeros((height, width), dtype=bool)
+    sampled[in_grid] = grid[cell_y[in_grid], cell_x[in_grid]]
+    return sampled
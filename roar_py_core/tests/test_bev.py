@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+from roar_py_interface import RoarPyOccupancyMapProducer
+from roar_py_interface.worlds.bev import RoarPyBEVProducer, box_quads, line_segment_quads, polyline_quads
+from conftest import rasterize_quads_reference, wavy_waypoints
+
+@pytest.fixture
+def bev_producer() -> RoarPyBEVProducer:
+    return RoarPyBEVProducer(RoarPyOccupancyMapProducer(wavy_waypoints(), 96, 64, 40.0, 30.0))
+
+def _channel_reference(bev_producer : RoarPyBEVProducer, quads_world : np.ndarray, location_2d : np.ndarray, rotation_yaw : float) -> np.ndarray:
+    # The quads through the world => pixel transform of the image, rasterized pixel by pixel
+    transform = bev_producer.occupancy_map_producer.world_to_pixels_transforms(location_2d[np.newaxis], np.array([rotation_yaw]))[0]
+    quads_px = np.asarray(quads_world, dtype=np.float64).reshape(-1, 4, 2) @ transform[:, :2].T + transform[:, 2]
+    return np.where(rasterize_quads_reference(quads_px, bev_producer.height, bev_producer.width), 255, 0).astype(np.uint8)
+
+@pytest.mark.parametrize("waypoint_index, rotation_yaw", [(0, 0.0), (40, 1.3), (97, -2.4)])
+def test_bev_channels_match_reference(bev_producer : RoarPyBEVProducer, waypoint_index : int, rotation_yaw : float):
+    waypoints = bev_producer.occupancy_map_producer.waypoints
+    # Off the waypoint, so that no pixel center lies exactly on the start edge of the route
+    location_2d = waypoints.locations[waypoint_index, :2].astype(np.float64) + np.array([0.13, -0.07])
+    route = waypoints[waypoint_index:waypoint_index + 8]
+    vehicle_quads = box_quads(
+        location_2d + np.array([[4.0, 1.0], [-6.0, -3.0], [200.0, 0.0]]),
+        np.array([[2.4, 1.1], [2.0, 0.9], [2.0, 0.9]]),
+        np.array([0.3, -1.0, 0.0])
+    )
+    bev = bev_producer.plot_bev(location_2d, rotation_yaw, route=route, vehicle_quads=vehicle_quads)
+    assert bev.shape == (64, 96, len(RoarPyBEVProducer.CHANNELS)) and bev.dtype == np.uint8
+    channels = dict(zip(RoarPyBEVProducer.CHANNELS, np.moveaxis(bev, -1, 0)))
+
+    # The producer culls the segments out of view, the reference draws all of them
+    np.testing.assert_array_equal(channels["lanes"], _channel_reference(bev_producer, waypoints.segment_quads, location_2d, rotation_yaw))
+    np.testing.assert_array_equal(channels["lanes"], bev_producer.occupancy_map_producer.plot_occupancy_map_array(location_2d, rotation_yaw))
+    line_pos, line_neg = waypoints.line_representations
+    boundary_quads = np.concatenate([
+        line_segment_quads(line[:, :2], np.roll(line, -1, axis=0)[:, :2], bev_producer._line_half_width(bev_producer.lane_boundary_width))
+        for line in (line_pos, line_neg)
+    ])
+    np.testing.assert_array_equal(channels["lane_boundaries"], _channel_reference(bev_producer, boundary_quads, location_2d, rotation_yaw))
+    route_quads = polyline_quads(route.locations[:, :2], bev_producer._line_half_width(bev_producer.route_width))
+    np.testing.assert_array_equal(channels["route"], _channel_reference(bev_producer, route_quads, location_2d, rotation_yaw))
+    np.testing.assert_array_equal(channels["vehicles"], _channel_reference(bev_producer, vehicle_quads, location_2d, rotation_yaw))
+    assert channels["route"].any() and channels["vehicles"].any()
+
+def test_bev_without_route_and_vehicles(bev_producer : RoarPyBEVProducer):
+    waypoints = bev_producer.occupancy_map_producer.waypoints
+    location_2d = waypoints.locations[10, :2].astype(np.float64)
+    out = np.full((64, 96, len(RoarPyBEVProducer.CHANNELS)), 7, dtype=np.uint8)
+    bev = bev_producer.plot_bev(location_2d, 0.5, route=waypoints[10:11], out=out)
+    # The buffer is cleared, a single waypoint draws no route
+    assert bev is out
+    assert set(np.unique(bev)) <= {0, 255}
+    assert not bev[:, :, 2].any() and not bev[:, :, 3].any()
+    assert bev[:, :, 0].any()
+
+def test_box_quads_corners():
+    quads = box_quads(np.array([[1.0, 2.0]]), np.array([[2.0, 1.0]]), np.array([np.pi / 2]))
+    np.testing.assert_allclose(quads[0], [[0.0, 4.0], [2.0, 4.0], [2.0, 0.0], [0.0, 0.0]], atol=1e-12)
+
+def test_line_segment_quads_width():
+    quads = line_segment_quads(np.array([[0.0, 0.0], [1.0, 1.0]]), np.array([[4.0, 0.0], [1.0, 1.0]]), np.array([0.5, 0.25]))
+    np.testing.assert_allclose(quads[0], [[0.0, 0.5], [0.0, -0.5], [4.0, -0.5], [4.0, 0.5]])
+    # A zero length segment collapses to its point
+    np.testing.assert_allclose(quads[1], np.ones((4, 2)))
@@ -0,0 +1,66 @@
+import os
+import numpy as np
+import pytest
+from roar_py_interface import roar_py_cache_dir, roar_py_cache_load_arrays, roar_py_cache_save_arrays
+
+def test_cache_dir_resolution(monkeypatch : pytest.MonkeyPatch, tmp_path):
+    monkeypatch.delenv("ROAR_PY_CACHE_DIR", raising=False)
+    monkeypatch.delenv("XDG_CACHE_HOME", raising=False)
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+    assert roar_py_cache_dir() == os.path.join(str(tmp_path / "home"), ".cache", "roar_py")
+
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "xdg"))
+    assert roar_py_cache_dir() == os.path.join(str(tmp_path / "xdg"), "roar_py")
+
+    # ROAR_PY_CACHE_DIR takes precedence and is used as is
+    monkeypatch.setenv("ROAR_PY_CACHE_DIR", str(tmp_path / "roar_cache"))
+    assert roar_py_cache_dir() == str(tmp_path / "roar_cache")
+
+def test_save_and_load_arrays(tmp_path):
+    entry = str(tmp_path / "kind" / "key")
+    data = {"locations": np.arange(12.0).reshape(4, 3), "lane_widths": np.full(4, 3.5, dtype=np.float32)}
+    roar_py_cache_save_arrays(entry, data)
+    # No temporary directory is left behind
+    assert os.listdir(str(tmp_path / "kind")) == ["key"]
+
+    loaded = roar_py_cache_load_arrays(entry, data.keys())
+    assert set(loaded.keys()) == set(data.keys())
+    for key, value in data.items():
+        assert isinstance(loaded[key], np.memmap)
+        assert loaded[key].dtype == value.dtype
+        np.testing.assert_array_equal(loaded[key], value)
+    assert not isinstance(roar_py_cache_load_arrays(entry, data.keys(), mmap_mode=None)["locations"], np.memmap)
+
+def test_missing_entry(tmp_path):
+    assert roar_py_cache_load_arrays(str(tmp_path / "missing"), ["locations"]) is None
+
+@pytest.mark.parametrize("corruption", ["truncated", "missing_key"])
+def test_broken_entry_is_invalidated(tmp_path, corruption : str):
+    entry = str(tmp_path / "key")
+    roar_py_cache_save_arrays(entry, {"locations": np.zeros((100, 3)), "rotations": np.zeros((100, 3))})
+    if corruption == "truncated":
+        with open(os.path.join(entry, "locations.npy"), "r+b") as f:
+            f.truncate(64)
+    else:
+        os.remove(os.path.join(entry, "rotations.npy"))
+
+    assert roar_py_cache_load_arrays(entry, ["locations", "rotations"]) is None
+    # The broken entry is removed, so that it is regenerated instead of being kept forever
+    assert not os.path.exists(entry)
+    roar_py_cache_save_arrays(entry, {"locations": np.ones((2, 3)), "rotations": np.ones((2, 3))})
+    np.testing.assert_array_equal(roar_py_cache_load_arrays(entry, ["locations", "rotations"])["rotations"], np.ones((2, 3)))
+
+def test_existing_entry_is_kept(tmp_path):
+    entry = str(tmp_path / "key")
+    roar_py_cache_save_arrays(entry, {"locations": np.zeros(3)})
+    # A concurrent writer that finishes second leaves the first entry in place
+    roar_py_cache_save_arrays(entry, {"locations": np.ones(3)})
+    np.testing.assert_array_equal(roar_py_cache_load_arrays(entry, ["locations"])["locations"], np.zeros(3))
+    assert os.listdir(str(tmp_path)) == ["key"]
+
+def test_unwritable_cache_is_ignored(tmp_path):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    # The parent of the entry is a file, saving fails silently
+    roar_py_cache_save_arrays(str(blocker / "key"), {"locations": np.zeros(3)})
+    assert roar_py_cache_load_arrays(str(blocker / "key"), ["locations"]) is None
@@ -0,0 +1,118 @@
+import numpy as np
+import pytest
+from roar_py_interface import RoarPyRemoteSupportedSensorSerializationScheme
+from roar_py_interface.base.depth_codec import (
+    encode_depth_array, decode_depth_array, pack_depth24, unpack_depth24,
+    DEPTH_FORMAT_FLOAT32, DEPTH_FORMAT_PACKED24, DEPTH_FORMAT_LOG16, DEPTH_PACKED24_MAX, CARLA_DEPTH_MAX_METERS
+)
+from roar_py_interface.sensors.camera_sensor import RoarPyCameraSensorDataDepth
+
+SCHEME = RoarPyRemoteSupportedSensorSerializationScheme.MSGPACK_COMPRESSED
+
+def _carla_depth(shape = (30, 40, 1)) -> np.ndarray:
+    # Depths as decoded from a CARLA depth camera, including the near and far planes
+    packed = np.random.default_rng(0).integers(0, DEPTH_PACKED24_MAX + 1, shape)
+    packed.flat[:2] = [0, DEPTH_PACKED24_MAX]
+    return unpack_depth24(packed)
+
+def _format_of(data : bytes) -> int:
+    return data[4]
+
+def test_unpack_depth24_matches_carla_formula():
+    rng = np.random.default_rng(1)
+    bgra = rng.integers(0, 256, (20, 30, 4)).astype(np.uint8)
+    packed = bgra[:, :, 2].astype(np.int64) + bgra[:, :, 1].astype(np.int64) * 256 + bgra[:, :, 0].astype(np.int64) * 65536
+    expected = packed / DEPTH_PACKED24_MAX * CARLA_DEPTH_MAX_METERS
+    depth = unpack_depth24(packed)
+    assert depth.dtype == np.float32
+    np.testing.assert_allclose(depth, expected, rtol=1e-6)
+
+    # In place into a float32 view of the packed buffer
+    packed_buffer = packed.astype(np.uint32)
+    in_place = unpack_depth24(packed_buffer, out=packed_buffer.view(np.float32))
+    assert np.shares_memory(in_place, packed_buffer)
+    np.testing.assert_array_equal(in_place, depth)
+
+def test_pack_depth24_inverts_unpack():
+    packed = np.random.default_rng(2).integers(0, DEPTH_PACKED24_MAX + 1, 100000).astype(np.uint32)
+    depth = unpack_depth24(packed)
+    # Distinct packed values may decode to the same float32 near the far plane, the decoded depth is what must survive
+    np.testing.assert_array_equal(unpack_depth24(pack_depth24(depth)), depth)
+    np.testing.assert_array_equal(pack_depth24(np.array([-1.0, 0.0, 2000.0])), [0, 0, DEPTH_PACKED24_MAX])
+
+    for max_depth in (50.0, 200.0):
+        depth = unpack_depth24(packed, max_depth)
+        np.testing.assert_array_equal(unpack_depth24(pack_depth24(depth, max_depth), max_depth), depth)
+
+def test_float32_and_packed24_are_lossless():
+    depth = _carla_depth()
+    for data_format in (DEPTH_FORMAT_FLOAT32, DEPTH_FORMAT_PACKED24):
+        data = encode_depth_array(depth, data_format)
+        assert _format_of(data) == data_format
+        decoded = decode_depth_array(data)
+        assert decoded.dtype == np.float32 and decoded.shape == depth.shape
+        np.testing.assert_array_equal(decoded, depth)
+
+    special = np.array([[0.0, np.inf], [np.nan, 1e-7]], dtype=np.float32)
+    np.testing.assert_array_equal(decode_depth_array(encode_depth_array(special, DEPTH_FORMAT_FLOAT32)), special)
+
+def test_packed24_rounds_other_depths():
+    depth = np.random.default_rng(3).uniform(0, 100, (30, 40)).astype(np.float32)
+    decoded = decode_depth_array(encode_depth_array(depth, DEPTH_FORMAT_PACKED24, max_depth=100.0))
+    assert np.max(np.abs(decoded - depth)) <= 100.0 / DEPTH_PACKED24_MAX
+
+def test_log16_relative_error_bound():
+    min_depth, max_depth = 0.1, 500.0
+    depth = np.exp(np.random.default_rng(4).uniform(np.log(min_depth), np.log(max_depth), (30, 40))).astype(np.float32)
+    data = encode_depth_array(depth, DEPTH_FORMAT_LOG16, max_depth=max_depth, min_depth=min_depth)
+    assert len(data) < len(encode_depth_array(depth, DEPTH_FORMAT_FLOAT32))
+    decoded = decode_depth_array(data)
+    assert decoded.dtype == np.float32
+    relative_error_bound = np.log(max_depth / min_depth) / 2 ** 17
+    assert np.max(np.abs(decoded / depth - 1)) <= relative_error_bound + 1e-6
+
+    # Depths outside of the range are clamped
+    clamped = decode_depth_array(encode_depth_array(np.array([0.0, 1000.0]), DEPTH_FORMAT_LOG16, max_depth=max_depth, min_depth=min_depth))
+    np.testing.assert_allclose(clamped, [min_depth, max_depth], rtol=1e-5)
+
+def test_decode_rejects_other_data():
+    with pytest.raises(ValueError):
+        decode_depth_array(b"RPMK" + bytes(20))
+    with pytest.raises(ValueError):
+        encode_depth_array(np.zeros((2, 2)), 7)
+
+@pytest.mark.parametrize("transport_format", [DEPTH_FORMAT_FLOAT32, DEPTH_FORMAT_PACKED24])
+def test_depth_data_round_trip(transport_format : int):
+    data = RoarPyCameraSensorDataDepth(_carla_depth(), False, transport_format=transport_format)
+    encoded = data.to_data(SCHEME)
+    assert _format_of(encoded[1:]) == transport_format
+    decoded = RoarPyCameraSensorDataDepth.from_data(encoded, SCHEME)
+    assert decoded.is_log_scale is False and decoded.image_depth.dtype == np.float32
+    np.testing.assert_array_equal(decoded.image_depth, data.image_depth)
+
+def test_depth_data_falls_back_to_float32():
+    depth = _carla_depth()
+    depth[0, 0, 0] = np.inf
+    depth[0, 1, 0] = 2000.0
+    for data in (RoarPyCameraSensorDataDepth(depth, False), RoarPyCameraSensorDataDepth(np.log1p(_carla_depth()), True)):
+        encoded = data.to_data(SCHEME)
+        assert _format_of(encoded[1:]) == DEPTH_FORMAT_FLOAT32
+        decoded = RoarPyCameraSensorDataDepth.from_data(encoded, SCHEME)
+        assert decoded.is_log_scale == data.is_log_scale
+        np.testing.assert_array_equal(decoded.image_depth, data.image_depth)
+
+def test_depth_data_log16_transport():
+    depth = _carla_depth()
+    data = RoarPyCameraSensorDataDepth(depth, False, transport_format=DEPTH_FORMAT_LOG16, transport_log16_min_depth=0.5)
+    decoded = RoarPyCameraSensorDataDepth.from_data(data.to_data(SCHEME), SCHEME)
+    in_range = depth >= 0.5
+    relative_error_bound = np.log(CARLA_DEPTH_MAX_METERS / 0.5) / 2 ** 17
+    assert np.max(np.abs(decoded.image_depth[in_range] / depth[in_range] - 1)) <= relative_error_bound + 1e-6
+
+def test_depth_legacy_data_is_decoded():
+    data = RoarPyCameraSensorDataDepth(_carla_depth((6, 8, 1)), False)
+    legacy_data = data.to_legacy_data(SCHEME)
+    assert legacy_data != data.to_data(SCHEME)
+    decoded = RoarPyCameraSensorDataDepth.from_data(legacy_data, SCHEME)
+    assert decoded.image_depth.dtype == np.float32
+    np.testing.assert_array_equal(decoded.image_depth, data.image_depth)
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+import transforms3d as tr3d
+from roar_py_interface.sensors.depth_point_cloud import camera_ray_grid, depth_to_point_cloud
+from roar_py_interface.sensors.camera_sensor import RoarPyCameraSensorDataDepth
+
+def _depth_frame(height : int = 18, width : int = 24) -> np.ndarray:
+    depth = np.random.default_rng(0).uniform(0.5, 120.0, (height, width)).astype(np.float32)
+    depth[0, 0] = 0.0
+    depth[1, 2] = np.inf
+    depth[3, 4] = np.nan
+    return depth
+
+def _point_cloud_reference(depth, fov, location=None, roll_pitch_yaw=None, stride=1, min_depth=0.0, max_depth=None, intensity=1.0) -> np.ndarray:
+    # Pinhole unprojection pixel by pixel, x forward, y left, z up, depth along the optical axis
+    height, width = depth.shape
+    focal_length = width / (2.0 * np.tan(np.deg2rad(fov) / 2.0))
+    rotation = tr3d.euler.euler2mat(*roll_pitch_yaw) if roll_pitch_yaw is not None else np.eye(3)
+    translation = np.asarray(location) if location is not None else np.zeros(3)
+    points = []
+    for row in range(0, height, stride):
+        for column in range(0, width, stride):
+            d = float(depth[row, column])
+            if not (d > min_depth and (np.isfinite(d) if max_depth is None else d <= max_depth)):
+                continue
+            camera_point = d * np.array([1.0, -(column + 0.5 - width / 2) / focal_length, -(row + 0.5 - height / 2) / focal_length])
+            points.append(np.append(rotation @ camera_point + translation, intensity))
+    return np.array(points).reshape(-1, 4)
+
+@pytest.mark.parametrize("location, roll_pitch_yaw", [
+    (None, None),
+    (np.array([1.5, -0.2, 1.7]), None),
+    (None, np.array([0.0, -0.1, 0.3])),
+    (np.array([1.5, -0.2, 1.7]), np.array([0.05, -0.1, 2.0]))
+])
+def test_point_cloud_matches_reference(location, roll_pitch_yaw):
+    depth = _depth_frame()
+    points = depth_to_point_cloud(depth, 90.0, location, roll_pitch_yaw, intensity=0.5)
+    assert points.dtype == np.float32
+    expected = _point_cloud_reference(depth, 90.0, location, roll_pitch_yaw, intensity=0.5)
+    assert points.shape == expected.shape == (depth.size - 3, 4)
+    np.testing.assert_allclose(points, expected, rtol=1e-5, atol=1e-4)
+
+@pytest.mark.parametrize("stride, min_depth, max_depth", [(2, 0.0, None), (3, 10.0, 60.0), (1, 5.0, None)])
+def test_point_cloud_stride_and_depth_range(stride : int, min_depth : float, max_depth):
+    depth = _depth_frame(17, 23)
+    points = depth_to_point_cloud(depth[:, :, np.newaxis], 70.0, stride=stride, min_depth=min_depth, max_depth=max_depth)
+    np.testing.assert_allclose(points, _point_cloud_reference(depth, 70.0, stride=stride, min_depth=min_depth, max_depth=max_depth), rtol=1e-5, atol=1e-4)
+
+def test_ray_grid_is_cached_and_read_only():
+    rays = camera_ray_grid(24, 18, 90.0)
+    assert rays is camera_ray_grid(24, 18, 90.0)
+    assert rays.shape == (18, 24, 4) and not rays.flags.writeable
+    np.testing.assert_array_equal(rays[:, :, 0], 1.0)
+    np.testing.assert_array_equal(rays[:, :, 3], 0.0)
+    # The edge rays of a 90 degree camera point (almost) 45 degrees sideways
+    assert rays[0, 0, 1] == pytest.approx(1.0 - 1.0 / 24)
+    np.testing.assert_array_equal(camera_ray_grid(24, 18, 90.0, 2), rays[::2, ::2])
+
+def test_depth_data_to_point_cloud():
+    depth = _depth_frame()
+    data = RoarPyCameraSensorDataDepth(depth[:, :, np.newaxis], False)
+    lidar_data = data.to_point_cloud(90.0, stride=4, max_depth=100.0)
+    assert lidar_data.channels == 5
+    np.testing.assert_allclose(lidar_data.lidar_points_data, _point_cloud_reference(depth, 90.0, stride=4, max_depth=100.0), rtol=1e-5, atol=1e-4)
+
+    with pytest.raises(AssertionError):
+        RoarPyCameraSensorDataDepth(depth[:, :, np.newaxis], True).to_point_cloud(90.0)
@@ -0,0 +1,116 @@
+import asyncio
+import base64
+import threading
+import numpy as np
+import pytest
+from roar_py_interface import RoarPyFrameNotifier, RoarPyRemoteSupportedSensorSerializationScheme
+from roar_py_interface.sensors.occupancy_map_sensor import RoarPyOccupancyMapSensorData
+from roar_py_remote.sensors.remote_sensors import RoarPyRemoteClientSensor, RoarPyRemoteSensorObsInfo
+
+async def _yield_to_loop(times : int = 5):
+    for _ in range(times):
+        await asyncio.sleep(0)
+
+def test_notify_counts_frames():
+    notifier = RoarPyFrameNotifier()
+    assert notifier.frame == 0
+    assert notifier.notify() == 1
+    assert notifier.notify() == 2
+    assert notifier.frame == 2
+
+@pytest.mark.asyncio
+async def test_wait_for_frame():
+    notifier = RoarPyFrameNotifier()
+    notifier.notify()
+    # Frames that already landed do not wait
+    assert await asyncio.wait_for(notifier.wait_for_frame(1), 1.0) == 1
+
+    waiter = asyncio.ensure_future(notifier.wait_for_frame(3))
+    await _yield_to_loop()
+    notifier.notify()
+    await _yield_to_loop()
+    assert not waiter.done()
+    notifier.notify()
+    assert await asyncio.wait_for(waiter, 1.0) == 3
+
+    next_frame_waiters = [asyncio.ensure_future(notifier.wait_for_next_frame()) for _ in range(3)]
+    await _yield_to_loop()
+    assert not any(waiter.done() for waiter in next_frame_waiters)
+    notifier.notify()
+    assert await asyncio.wait_for(asyncio.gather(*next_frame_waiters), 1.0) == [4, 4, 4]
+
+@pytest.mark.asyncio
+async def test_notify_from_other_threads():
+    notifier = RoarPyFrameNotifier()
+    start_event = threading.Event()
+    def notify_frames():
+        start_event.wait()
+        for _ in range(10):
+            notifier.notify()
+    thread = threading.Thread(target=notify_frames)
+    thread.start()
+
+    waiter = asyncio.ensure_future(notifier.wait_for_frame(10))
+    await _yield_to_loop()
+    start_event.set()
+    assert await asyncio.wait_for(waiter, 5.0) == 10
+    thread.join()
+
+def test_waiters_on_several_loops():
+    notifier = RoarPyFrameNotifier()
+    results = []
+    parked = threading.Barrier(3)
+    async def wait_on_own_loop():
+        waiter = asyncio.ensure_future(notifier.wait_for_frame(1))
+        await _yield_to_loop()
+        parked.wait()
+        results.append(await asyncio.wait_for(waiter, 5.0))
+    threads = [threading.Thread(target=asyncio.run, args=(wait_on_own_loop(), )) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    parked.wait()
+    notifier.notify()
+    for thread in threads:
+        thread.join()
+    assert results == [1, 1]
+
+def test_notify_skips_closed_loops():
+    notifier = RoarPyFrameNotifier()
+    loop = asyncio.new_event_loop()
+    waiter = loop.create_task(notifier.wait_for_frame(1))
+    loop.run_until_complete(_yield_to_loop())
+    waiter.cancel()
+    loop.run_until_complete(asyncio.gather(waiter, return_exceptions=True))
+    loop.close()
+    assert notifier.notify() == 1
+
+@pytest.mark.asyncio
+async def test_remote_client_sensor_observations():
+    def obs_info(occupancy_map):
+        sensor_data = RoarPyOccupancyMapSensorData(occupancy_map)
+        return RoarPyRemoteSensorObsInfo(
+            name="occupancy_map_sensor",
+            control_timestep=0.0,
+            last_data=base64.b64encode(sensor_data.to_data(RoarPyRemoteSupportedSensorSerializationScheme.MSGPACK_COMPRESSED)).decode("ascii"),
+            last_data_type=RoarPyOccupancyMapSensorData.__name__,
+            obs_spec=None,
+            is_closed=False
+        )
+    first_map = np.zeros((4, 8), dtype=np.uint8)
+    second_map = np.full((4, 8), 255, dtype=np.uint8)
+    sensor = RoarPyRemoteClientSensor(obs_info(first_map))
+    np.testing.assert_array_equal((await asyncio.wait_for(sensor.receive_observation(), 1.0)).occupancy_map_array, first_map)
+
+    # Without new data the latest observation is handed out again
+    again = await asyncio.wait_for(sensor.receive_observation(), 1.0)
+    assert again is sensor.get_last_observation()
+    assert await asyncio.wait_for(sensor.receive_observation(), 1.0) is again
+
+    # Unless waiting for newer data is asked for
+    next_observation = asyncio.ensure_future(sensor.receive_next_observation())
+    await _yield_to_loop()
+    assert not next_observation.done()
+    sensor._depack_info(obs_info(second_map))
+    np.testing.assert_array_equal((await asyncio.wait_for(next_observation, 1.0)).occupancy_map_array, second_map)
+    assert sensor.get_last_observation() is next_observation.result()
+    np.testing.assert_array_equal((await asyncio.wait_for(sensor.receive_observation(), 1.0)).occupancy_map_array, second_map)
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+from roar_py_interface import RoarPyOccupancyMapProducer, RoarPyIncrementalOccupancyMap, RoarPyGlobalOccupancyRaster
+from conftest import wavy_waypoints
+
+@pytest.fixture
+def producer() -> RoarPyOccupancyMapProducer:
+    return RoarPyOccupancyMapProducer(wavy_waypoints(), 80, 60, 40.0, 30.0)
+
+def _check_against_full_redraw(producer : RoarPyOccupancyMapProducer, incremental_map : RoarPyIncrementalOccupancyMap, location_2d : np.ndarray):
+    # Equal to a full redraw at the pose the buffer is rendered with, which is within max_error_pixels of the requested one
+    np.testing.assert_array_equal(incremental_map.buffer, producer.plot_occupancy_map_array(incremental_map.buffer_center, incremental_map.buffer_yaw))
+    pixel_offset = producer.world_to_pixels(location_2d, incremental_map.buffer_yaw, incremental_map.buffer_center) - np.array([producer.width / 2, producer.height / 2])
+    assert np.hypot(*pixel_offset) <= incremental_map.max_error_pixels + 1e-9
+
+def test_incremental_map_along_the_track(producer : RoarPyOccupancyMapProducer):
+    incremental_map = RoarPyIncrementalOccupancyMap(producer)
+    num_full_redraws = 0
+    for t in np.linspace(0.0, 1.5, 200):
+        location_2d = np.array([30.0 * np.cos(t), 30.0 * np.sin(t)])
+        previous_yaw = incremental_map.buffer_yaw
+        occupancy_map = incremental_map.update(location_2d, t + np.pi / 2)
+        assert occupancy_map is incremental_map.buffer
+        num_full_redraws += previous_yaw != incremental_map.buffer_yaw
+        _check_against_full_redraw(producer, incremental_map, location_2d)
+    # Most updates only shift the map
+    assert 1 <= num_full_redraws < 100
+
+@pytest.mark.parametrize("direction", [(1.0, 0.3), (-0.4, 1.0), (-1.0, -0.7)])
+def test_incremental_map_shifts_at_a_fixed_heading(producer : RoarPyOccupancyMapProducer, direction):
+    incremental_map = RoarPyIncrementalOccupancyMap(producer)
+    start = np.array([30.0, 0.0])
+    incremental_map.update(start, 0.3)
+    for step in range(1, 60):
+        location_2d = start + 0.37 * step * np.array(direction)
+        incremental_map.update(location_2d, 0.3)
+        assert incremental_map.buffer_yaw == 0.3
+        _check_against_full_redraw(producer, incremental_map, location_2d)
+
+def test_incremental_map_redraws_on_jumps_and_reset(producer : RoarPyOccupancyMapProducer):
+    incremental_map = RoarPyIncrementalOccupancyMap(producer)
+    incremental_map.update(np.array([30.0, 0.0]), 0.0)
+    for location_2d, rotation_yaw in [(np.array([-25.0, 5.0]), 0.0), (np.array([-25.0, 5.0]), 1.0)]:
+        occupancy_map = incremental_map.update(location_2d, rotation_yaw)
+        np.testing.assert_array_equal(incremental_map.buffer_center, location_2d)
+        np.testing.assert_array_equal(occupancy_map, producer.plot_occupancy_map_array(location_2d, rotation_yaw))
+
+    incremental_map.reset()
+    assert incremental_map.buffer is None
+    location_2d = np.array([-25.2, 5.1])
+    np.testing.assert_array_equal(incremental_map.update(location_2d, 1.0), producer.plot_occupancy_map_array(location_2d, 1.0))
+
+def test_incremental_map_crops_rasters(tmp_path, monkeypatch):
+    monkeypatch.setenv("ROAR_PY_CACHE_DIR", str(tmp_path))
+    waypoints = wavy_waypoints()
+    producer = RoarPyOccupancyMapProducer(waypoints, 80, 60, 40.0, 30.0, raster=RoarPyGlobalOccupancyRaster(waypoints, 0.25))
+    incremental_map = RoarPyIncrementalOccupancyMap(producer)
+    for t in np.linspace(0.0, 0.2, 10):
+        location_2d = np.array([30.0 * np.cos(t), 30.0 * np.sin(t)])
+        np.testing.assert_array_equal(incremental_map.update(location_2d, t + np.pi / 2), producer.plot_occupancy_map_array(location_2d, t + np.pi / 2))
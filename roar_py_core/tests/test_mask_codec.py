@@ -0,0 +1,104 @@
+import base64
+import io
+import numpy as np
+import pytest
+import serde.json
+from PIL import Image
+from roar_py_interface import RoarPyRemoteSupportedSensorSerializationScheme
+from roar_py_interface.base.mask_codec import encode_mask_array, decode_mask_array, is_mask_codec_data, MASK_FORMAT_RAW, MASK_FORMAT_PACKBITS, MASK_FORMAT_RAW_UINT16
+from roar_py_interface.sensors.occupancy_map_sensor import RoarPyOccupancyMapSensorData
+from roar_py_remote.sensors.remote_sensors import RoarPyRemoteSensorObsInfo, RoarPyRemoteSensorObsInfoRequest
+
+SCHEME = RoarPyRemoteSupportedSensorSerializationScheme.MSGPACK_COMPRESSED
+
+def _format_of(data : bytes) -> int:
+    # Format marker right after the magic
+    return data[4]
+
+def _occupancy_map(rng : np.random.Generator, shape = (60, 80)) -> np.ndarray:
+    return np.where(rng.random(shape) < 0.3, 255, 0).astype(np.uint8)
+
+@pytest.mark.parametrize("fill_value", [1, 255])
+@pytest.mark.parametrize("shape", [(60, 80), (7, 13), (5, 6, 3)])
+def test_binary_masks_are_bit_packed(shape, fill_value : int):
+    mask = np.where(np.random.default_rng(0).random(shape) < 0.3, fill_value, 0).astype(np.uint8)
+    data = encode_mask_array(mask)
+    assert is_mask_codec_data(data) and _format_of(data) == MASK_FORMAT_PACKBITS
+    decoded = decode_mask_array(data)
+    assert decoded.dtype == np.uint8
+    np.testing.assert_array_equal(decoded, mask)
+
+def test_empty_and_non_contiguous_masks():
+    empty = np.zeros((10, 12), dtype=np.uint8)
+    np.testing.assert_array_equal(decode_mask_array(encode_mask_array(empty)), empty)
+    mask = _occupancy_map(np.random.default_rng(1))[::2, ::-3]
+    np.testing.assert_array_equal(decode_mask_array(encode_mask_array(mask)), mask)
+
+def test_multi_valued_masks_are_raw():
+    labels = np.random.default_rng(2).integers(0, 30, (24, 32)).astype(np.uint8)
+    data = encode_mask_array(labels)
+    assert _format_of(data) == MASK_FORMAT_RAW
+    decoded = decode_mask_array(data)
+    np.testing.assert_array_equal(decoded, labels)
+    assert decoded.flags.writeable
+
+def test_uint16_masks():
+    instance_ids = np.random.default_rng(3).integers(0, 65536, (24, 32)).astype(np.uint16)
+    data = encode_mask_array(instance_ids)
+    assert _format_of(data) == MASK_FORMAT_RAW_UINT16
+    decoded = decode_mask_array(data)
+    assert decoded.dtype == np.uint16
+    np.testing.assert_array_equal(decoded, instance_ids)
+
+def test_decode_rejects_other_data():
+    with pytest.raises(ValueError):
+        decode_mask_array(b"\xff\xd8\xff\xe0" + bytes(16))
+
+def test_occupancy_data_round_trip():
+    occupancy_map = _occupancy_map(np.random.default_rng(4))
+    data = RoarPyOccupancyMapSensorData(occupancy_map)
+    decoded = RoarPyOccupancyMapSensorData.from_data(data.to_data(SCHEME), SCHEME)
+    np.testing.assert_array_equal(decoded.occupancy_map_array, occupancy_map)
+
+def test_occupancy_legacy_jpeg_is_decoded():
+    # Large blocks, so that JPEG only smears the block borders
+    occupancy_map = np.kron(_occupancy_map(np.random.default_rng(5), (6, 8)), np.ones((16, 16), dtype=np.uint8))
+    legacy_data = RoarPyOccupancyMapSensorData(occupancy_map).to_legacy_data(SCHEME)
+    assert not is_mask_codec_data(legacy_data)
+    assert Image.open(io.BytesIO(legacy_data)).format == "JPEG"
+    decoded = RoarPyOccupancyMapSensorData.from_data(legacy_data, SCHEME)
+    assert decoded.occupancy_map_array.shape == occupancy_map.shape
+    assert np.mean(np.abs(decoded.occupancy_map_array.astype(np.int64) - occupancy_map)) < 8
+
+class _LastObservationSensor:
+    name = "occupancy_map_sensor"
+    control_timestep = 0.0
+
+    def __init__(self, last_observation):
+        self._last_observation = last_observation
+
+    def get_last_observation(self):
+        return self._last_observation
+
+    def get_gym_observation_spec(self):
+        return RoarPyOccupancyMapSensorData.gym_observation_space(80, 60)
+
+    def is_closed(self):
+        return False
+
+def test_remote_sensor_negotiates_mask_codec():
+    occupancy_map = _occupancy_map(np.random.default_rng(6))
+    sensor = _LastObservationSensor(RoarPyOccupancyMapSensorData(occupancy_map))
+
+    obs_info = RoarPyRemoteSensorObsInfo.from_sensor(sensor, True, accepts_array_codecs=True)
+    assert is_mask_codec_data(base64.b64decode(obs_info.last_data))
+    np.testing.assert_array_equal(obs_info.get_last_obs().occupancy_map_array, occupancy_map)
+    assert obs_info.get_obs_spec() == sensor.get_gym_observation_spec()
+
+    legacy_obs_info = RoarPyRemoteSensorObsInfo.from_sensor(sensor, False)
+    assert not is_mask_codec_data(base64.b64decode(legacy_obs_info.last_data))
+    assert legacy_obs_info.get_last_obs().occupancy_map_array.shape == occupancy_map.shape
+
+    # Requests of older clients do not carry the flag
+    request = serde.json.from_json(RoarPyRemoteSensorObsInfoRequest, '{"close": false, "need_obs_spec": true}')
+    assert request.accepts_array_codecs is False
@@ -0,0 +1,140 @@
+import numpy as np
+import pytest
+from PIL import Image
+from roar_py_interface import RoarPyOccupancyMapProducer, RoarPyWaypointArray
+from roar_py_interface.worlds.occupancy_map import fill_quads, fill_quads_batch
+from conftest import rasterize_quads_reference, wavy_waypoints
+
+def _random_quads(rng : np.random.Generator, num_quads : int, size : int) -> np.ndarray:
+    # Convex quads (corners sorted by angle around a center), partly outside of the buffer
+    centers = rng.uniform(-0.2 * size, 1.2 * size, (num_quads, 1, 2))
+    angles = np.sort(rng.uniform(0, 2 * np.pi, (num_quads, 4)), axis=1)
+    radii = rng.uniform(0.05 * size, 0.4 * size, (num_quads, 4))
+    return centers + np.stack([radii * np.cos(angles), radii * np.sin(angles)], axis=-1)
+
+def _map_reference(producer : RoarPyOccupancyMapProducer, location_2d : np.ndarray, rotation_yaw : float) -> np.ndarray:
+    # All lane quads of the track through world_to_pixel, corner by corner
+    quads_px = np.array([
+        [producer.world_to_pixel(corner, rotation_yaw, location_2d) for corner in quad]
+        for quad in producer.waypoints.segment_quads
+    ])
+    return np.where(rasterize_quads_reference(quads_px, producer.height, producer.width), 255, 0).astype(np.uint8)
+
+@pytest.mark.parametrize("seed", range(3))
+def test_fill_quads_matches_even_odd_reference(seed : int):
+    rng = np.random.default_rng(seed)
+    quads = _random_quads(rng, 12, 64)
+    buffer = np.zeros((48, 64), dtype=np.uint8)
+    fill_quads(buffer, quads, 7)
+    assert set(np.unique(buffer)) <= {0, 7}
+    np.testing.assert_array_equal(buffer == 7, rasterize_quads_reference(quads, 48, 64))
+
+def test_fill_quads_batch_matches_fill_quads():
+    rng = np.random.default_rng(3)
+    quads = _random_quads(rng, 10, 32)
+    quads_indptr = np.array([0, 4, 4, 10])
+    transforms = np.array([
+        [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]],
+        [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]],
+        [[0.0, -1.2, 40.0], [0.8, 0.0, 3.5]]
+    ])
+    buffers = np.zeros((3, 32, 40), dtype=np.uint8)
+    fill_quads_batch(buffers, quads, quads_indptr, transforms, 255)
+    for i in range(3):
+        quads_px = quads[quads_indptr[i]:quads_indptr[i + 1]] @ transforms[i, :, :2].T + transforms[i, :, 2]
+        expected = np.zeros((32, 40), dtype=np.uint8)
+        fill_quads(expected, quads_px, 255)
+        np.testing.assert_array_equal(buffers[i], expected)
+
+def test_world_to_pixels_matches_world_to_pixel():
+    producer = RoarPyOccupancyMapProducer(wavy_waypoints(), 96, 64, 40.0, 30.0)
+    rng = np.random.default_rng(4)
+    center = np.array([12.0, -5.0])
+    locations = rng.uniform(-30, 30, (20, 2))
+    pixels = producer.world_to_pixels(locations, 0.7, center)
+    for location, pixel in zip(locations, pixels):
+        np.testing.assert_allclose(pixel, producer.world_to_pixel(location, 0.7, center))
+
+@pytest.mark.parametrize("location_2d, rotation_yaw", [
+    (np.array([30.0, 0.0]), 0.0),
+    (np.array([0.0, 38.5]), 2.1),
+    (np.array([-21.3, -3.7]), -0.4),
+    # Away from the track
+    (np.array([500.0, 500.0]), 0.0)
+])
+def test_occupancy_map_matches_reference(location_2d : np.ndarray, rotation_yaw : float):
+    producer = RoarPyOccupancyMapProducer(wavy_waypoints(), 80, 60, 40.0, 30.0)
+    occupancy_map = producer.plot_occupancy_map_array(location_2d, rotation_yaw)
+    assert occupancy_map.shape == (60, 80) and occupancy_map.dtype == np.uint8
+    expected = _map_reference(producer, location_2d, rotation_yaw)
+    assert expected.any() == (np.linalg.norm(location_2d) < 100)
+    np.testing.assert_array_equal(occupancy_map, expected)
+
+    image = producer.plot_occupancy_map(location_2d, rotation_yaw)
+    assert isinstance(image, Image.Image) and image.mode == "L"
+    np.testing.assert_array_equal(np.asarray(image), occupancy_map)
+
+def _hairpin_waypoints(lane_width : float = 3.0) -> RoarPyWaypointArray:
+    """
+    Closed track of two straights 8m apart joined by tight turns, the way out is sampled every 2m,
+    the way back every 30m (segments that cross a map with both of their waypoints outside of it).
+    """
+    out_x = np.arange(0.0, 80.0, 2.0)
+    turn_angles = np.linspace(np.pi / 2, -np.pi / 2, 9)[:-1]
+    back_x = np.array([80.0, 50.0, 20.0])
+    locations = np.concatenate([
+        np.stack([out_x, np.full_like(out_x, 4.0)], axis=1),
+        np.stack([80.0 + 4.0 * np.cos(turn_angles), 4.0 * np.sin(turn_angles)], axis=1),
+        np.stack([back_x, np.full_like(back_x, -4.0)], axis=1),
+        np.stack([-4.0 * np.cos(turn_angles), -4.0 * np.sin(turn_angles)], axis=1)
+    ])
+    locations = np.concatenate([locations, np.zeros((len(locations), 1))], axis=1)
+    deltas = np.roll(locations, -1, axis=0) - np.roll(locations, 1, axis=0)
+    yaws = np.arctan2(deltas[:, 1], deltas[:, 0])
+    return RoarPyWaypointArray(locations, np.stack([np.zeros_like(yaws), np.zeros_like(yaws), yaws], axis=1), np.full(len(locations), lane_width))
+
+@pytest.mark.parametrize("location_2d, rotation_yaw, crossing_segment", [
+    # On the way out, the way back crosses the map on a single long segment
+    (np.array([35.3, 4.1]), 0.0, True),
+    (np.array([35.3, 4.1]), 0.9, True),
+    # In the hairpin turn
+    (np.array([81.7, 0.3]), -np.pi / 2, False),
+    # Between two waypoints of the way back, both outside of the map
+    (np.array([64.9, -3.2]), 2.5, True),
+    # Where the track wraps around
+    (np.array([-2.2, 0.6]), np.pi, False),
+])
+def test_culled_hairpin_matches_full_reference(location_2d : np.ndarray, rotation_yaw : float, crossing_segment : bool):
+    producer = RoarPyOccupancyMapProducer(_hairpin_waypoints(), 80, 60, 20.0, 15.0)
+    occupancy_map = producer.plot_occupancy_map_array(location_2d, rotation_yaw)
+    # Every lane segment, drawn without culling
+    expected = _map_reference(producer, location_2d, rotation_yaw)
+    np.testing.assert_array_equal(occupancy_map, expected)
+    all_quads_px = producer.world_to_pixels(producer.waypoints.segment_quads, rotation_yaw, location_2d)
+    all_quads = np.zeros_like(occupancy_map)
+    fill_quads(all_quads, all_quads_px, 255)
+    np.testing.assert_array_equal(occupancy_map, all_quads)
+    assert occupancy_map.any()
+    if crossing_segment:
+        # A segment with both of its waypoints out of the map still reaches into it
+        waypoints_px = producer.world_to_pixels(producer.waypoints.locations[:, :2], rotation_yaw, location_2d)
+        outside = np.any((waypoints_px < 0) | (waypoints_px >= [producer.width, producer.height]), axis=1)
+        crossing = np.flatnonzero(outside & np.roll(outside, -1))
+        crossing_map = np.zeros_like(occupancy_map)
+        fill_quads(crossing_map, all_quads_px[crossing], 255)
+        assert crossing_map.any()
+
+def test_occupancy_maps_batch_and_reused_buffer():
+    producer = RoarPyOccupancyMapProducer(wavy_waypoints(), 64, 64, 32.0, 32.0)
+    locations = np.array([[30.0, 0.0], [-25.0, 10.0], [0.0, -30.0]])
+    rotation_yaws = np.array([0.3, -1.2, 3.0])
+    out = np.full((3, 64, 64), 99, dtype=np.uint8)
+    maps = producer.plot_occupancy_maps(locations, rotation_yaws, out)
+    assert maps is out
+    for i in range(3):
+        np.testing.assert_array_equal(maps[i], producer.plot_occupancy_map_array(locations[i], rotation_yaws[i]))
+
+    # The buffer is cleared before drawing
+    single_out = np.full((64, 64), 99, dtype=np.uint8)
+    producer.plot_occupancy_map_array(np.array([500.0, 500.0]), 0.0, single_out)
+    assert not single_out.any()
@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+from PIL import Image
+from roar_py_interface import RoarPyOccupancyMapProducer
+from roar_py_interface.sensors.location_in_world_sensor import RoarPyLocationInWorldSensorData
+from roar_py_interface.sensors.rotation_sensor import RoarPyRollPitchYawSensorData
+from roar_py_interface.sensors.occupancy_map_sensor import RoarPyOccupancyMapBufferPool, RoarPyOccupancyMapSensorData, RoarPyOccupancyMapSensorImpl
+from conftest import wavy_waypoints
+
+class _PoseSensors:
+    """
+    Location and rotation sensors replaying a list of poses, one per observation.
+    """
+    def __init__(self, poses):
+        self.poses = list(poses)
+        self.location_index = 0
+        self.rotation_index = 0
+
+    async def receive_location(self):
+        x, y, _ = self.poses[self.location_index]
+        self.location_index += 1
+        return RoarPyLocationInWorldSensorData(x, y, 0.0)
+
+    async def receive_rotation(self):
+        _, _, yaw = self.poses[self.rotation_index]
+        self.rotation_index += 1
+        return RoarPyRollPitchYawSensorData(np.array([0.0, 0.0, yaw]))
+
+class _Sensor:
+    def __init__(self, receive_observation):
+        self.receive_observation = receive_observation
+
+def test_buffer_pool_round_robin():
+    pool = RoarPyOccupancyMapBufferPool((4, 5), num_buffers=3)
+    assert pool.num_buffers == 3
+    buffers = [pool.next_buffer() for _ in range(6)]
+    assert all(buffer.shape == (4, 5) and buffer.dtype == np.uint8 for buffer in buffers)
+    assert len({id(buffer) for buffer in buffers[:3]}) == 3
+    assert all(buffers[i] is buffers[i + 3] for i in range(3))
+
+def test_occupancy_data_views():
+    occupancy_map = np.zeros((60, 80), dtype=np.uint8)
+    occupancy_map[10:20, 30:50] = 255
+    data = RoarPyOccupancyMapSensorData(occupancy_map)
+    assert data.get_size() == (80, 60)
+    np.testing.assert_array_equal(np.asarray(data.get_image()), occupancy_map)
+    np.testing.assert_array_equal(RoarPyOccupancyMapSensorData.from_image(data.get_image().convert("RGB")).occupancy_map_array, occupancy_map)
+    gym_obs = data.convert_obs_to_gym_obs()
+    assert gym_obs.shape == (60, 80, 1)
+    assert data.get_gym_observation_spec().contains(gym_obs)
+
+def test_deprecated_image_access():
+    occupancy_map = np.zeros((60, 80), dtype=np.uint8)
+    occupancy_map[10:20, 30:50] = 255
+    image = Image.fromarray(occupancy_map, mode='L')
+    with pytest.warns(DeprecationWarning):
+        data = RoarPyOccupancyMapSensorData(image)
+    assert isinstance(data.occupancy_map_array, np.ndarray)
+    np.testing.assert_array_equal(data.occupancy_map_array, occupancy_map)
+    with pytest.warns(DeprecationWarning):
+        legacy_image = data.occupancy_map
+    assert isinstance(legacy_image, Image.Image)
+    assert legacy_image.size == (80, 60)
+    np.testing.assert_array_equal(np.asarray(legacy_image), occupancy_map)
+
+@pytest.mark.asyncio
+async def test_sensor_renders_into_double_buffered_arrays():
+    producer = RoarPyOccupancyMapProducer(wavy_waypoints(), 80, 60, 40.0, 30.0)
+    poses = [(30.0, 0.0, 1.6), (0.0, 38.5, 2.1), (-21.3, -3.7, -0.4)]
+    pose_sensors = _PoseSensors(poses)
+    sensor = RoarPyOccupancyMapSensorImpl(producer, _Sensor(pose_sensors.receive_location), _Sensor(pose_sensors.receive_rotation))
+    assert sensor.get_last_observation() is None
+    assert sensor.get_gym_observation_spec() == RoarPyOccupancyMapSensorData.gym_observation_space(80, 60)
+
+    observations, expected_maps = [], []
+    for x, y, yaw in poses:
+        observation = await sensor.receive_observation()
+        assert sensor.get_last_observation() is observation
+        expected_maps.append(producer.plot_occupancy_map_array(np.array([x, y]), yaw))
+        np.testing.assert_array_equal(observation.occupancy_map_array, expected_maps[-1])
+        if len(observations) > 0:
+            # The previous observation is not overwritten by the next one
+            assert not np.shares_memory(observations[-1].occupancy_map_array, observation.occupancy_map_array)
+            np.testing.assert_array_equal(observations[-1].occupancy_map_array, expected_maps[-2])
+        observations.append(observation)
+    # Buffers are reused instead of being allocated per frame
+    assert np.shares_memory(observations[0].occupancy_map_array, observations[2].occupancy_map_array)
+
+    assert not sensor.is_closed()
+    sensor.close()
+    assert sensor.is_closed()
@@ -0,0 +1,144 @@
+import numpy as np
+import pytest
+from roar_py_interface import RoarPyOccupancyMapProducer, RoarPyGlobalOccupancyRaster, RoarPyTiledOccupancyRaster
+from roar_py_interface.worlds import occupancy_raster
+from conftest import rasterize_quads_reference, sample_grid_reference, wavy_waypoints
+
+POSES = [
+    (np.array([30.0, 0.0]), 0.0),
+    (np.array([0.0, 38.5]), 2.1),
+    (np.array([-21.3, -3.7]), -0.4)
+]
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("ROAR_PY_CACHE_DIR", str(tmp_path))
+    return tmp_path
+
+def _unpacked_grid(raster : RoarPyGlobalOccupancyRaster) -> np.ndarray:
+    return np.unpackbits(raster.packed_grid, axis=1)[:, :raster.grid_width].astype(bool)
+
+def test_global_grid_matches_reference():
+    waypoints = wavy_waypoints()
+    raster = RoarPyGlobalOccupancyRaster(waypoints, 0.25, use_cache=False)
+    # The margin keeps every lane quad inside of the grid
+    assert np.all(waypoints.segment_quads.reshape(-1, 2) - raster.origin >= RoarPyGlobalOccupancyRaster.MARGIN - 1e-9)
+    expected = rasterize_quads_reference((waypoints.segment_quads - raster.origin) / 0.25, raster.grid_height, raster.grid_width)
+    assert expected.any()
+    np.testing.assert_array_equal(_unpacked_grid(raster), expected)
+
+@pytest.mark.parametrize("location_2d, rotation_yaw", POSES)
+def test_global_crop_matches_reference(location_2d : np.ndarray, rotation_yaw : float):
+    waypoints = wavy_waypoints()
+    raster = RoarPyGlobalOccupancyRaster(waypoints, 0.25, use_cache=False)
+    out = np.full((60, 80), 99, dtype=np.uint8)
+    assert raster.crop(out, location_2d, rotation_yaw, 40.0, 30.0) is out
+    assert set(np.unique(out)) <= {0, 255}
+
+    affine = raster.pixel_to_world_affine(80, 60, 40.0, 30.0, location_2d, rotation_yaw)
+    affine = (affine - np.concatenate([np.zeros((2, 2)), raster.origin[:, np.newaxis]], axis=1)) / 0.25
+    np.testing.assert_array_equal(out > 0, sample_grid_reference(_unpacked_grid(raster), affine, 60, 80))
+
+    # Same layout as drawing the lanes directly, up to a grid cell along the lane borders
+    drawn = RoarPyOccupancyMapProducer(waypoints, 80, 60, 40.0, 30.0).plot_occupancy_map_array(location_2d, rotation_yaw)
+    assert np.mean(drawn != out) < 0.02
+
+def test_producer_crops_from_raster():
+    waypoints = wavy_waypoints()
+    raster = RoarPyGlobalOccupancyRaster(waypoints, 0.25, use_cache=False)
+    producer = RoarPyOccupancyMapProducer(waypoints, 80, 60, 40.0, 30.0, raster=raster)
+    locations = np.stack([location_2d for location_2d, _ in POSES])
+    rotation_yaws = np.array([rotation_yaw for _, rotation_yaw in POSES])
+    maps = producer.plot_occupancy_maps(locations, rotation_yaws)
+    for i, (location_2d, rotation_yaw) in enumerate(POSES):
+        np.testing.assert_array_equal(maps[i], raster.crop(np.zeros((60, 80), dtype=np.uint8), location_2d, rotation_yaw, 40.0, 30.0))
+
+def test_global_raster_is_cached_on_disk(cache_dir, monkeypatch):
+    waypoints = wavy_waypoints()
+    RoarPyGlobalOccupancyRaster(waypoints, 0.25, use_cache=False)
+    assert not any(cache_dir.iterdir())
+
+    rendered = RoarPyGlobalOccupancyRaster(waypoints, 0.25)
+    def fail_rasterize(self, segment_quads):
+        raise AssertionError("cached raster rendered again")
+    monkeypatch.setattr(RoarPyGlobalOccupancyRaster, "_rasterize", fail_rasterize)
+    loaded = RoarPyGlobalOccupancyRaster(waypoints, 0.25)
+    assert (loaded.grid_width, loaded.grid_height) == (rendered.grid_width, rendered.grid_height)
+    np.testing.assert_array_equal(loaded.origin, rendered.origin)
+    np.testing.assert_array_equal(loaded.packed_grid, rendered.packed_grid)
+
+    # Another resolution is another cache entry
+    with pytest.raises(AssertionError):
+        RoarPyGlobalOccupancyRaster(waypoints, 0.5)
+
+def test_tiled_select_level():
+    raster = RoarPyTiledOccupancyRaster(wavy_waypoints(), 0.05, num_levels=4)
+    assert [raster.level_meters_per_pixel(level) for level in range(4)] == pytest.approx([0.05, 0.1, 0.2, 0.4])
+    assert raster.select_level(0.01) == 0
+    assert raster.select_level(0.05) == 0
+    assert raster.select_level(0.099) == 0
+    assert raster.select_level(0.1) == 1
+    assert raster.select_level(0.3) == 2
+    assert raster.select_level(0.4) == 3
+    assert raster.select_level(10.0) == 3
+
+@pytest.mark.parametrize("level, tile_x, tile_y", [(0, 3, 0), (0, -4, -1), (1, 1, -1), (2, -1, 0)])
+def test_tiled_tile_matches_reference(level : int, tile_x : int, tile_y : int):
+    waypoints = wavy_waypoints()
+    raster = RoarPyTiledOccupancyRaster(waypoints, 0.125, num_levels=3, tile_size=64)
+    tile = raster.get_tile(level, tile_x, tile_y)
+    assert tile.shape == (64, 8)
+    quads_px = waypoints.segment_quads / raster.level_meters_per_pixel(level) - np.array([tile_x, tile_y]) * 64
+    expected = rasterize_quads_reference(quads_px, 64, 64)
+    assert expected.any()
+    np.testing.assert_array_equal(np.unpackbits(tile, axis=1).astype(bool), expected)
+
+def test_tiled_tiles_are_lru_cached():
+    raster = RoarPyTiledOccupancyRaster(wavy_waypoints(), 0.125, num_levels=2, tile_size=64, max_cached_tiles=2)
+    # Tiles away from the track all share the read-only empty tile
+    empty_tile = raster.get_tile(0, 100, 100)
+    assert empty_tile is raster.get_tile(1, -100, 50)
+    assert not empty_tile.any() and not empty_tile.flags.writeable
+
+    first = raster.get_tile(0, 3, 0)
+    assert first.any()
+    assert raster.get_tile(0, 3, 0) is first
+    raster.get_tile(0, -4, -1)
+    # Evicts (0, 3, 0), the least recently used tile
+    raster.get_tile(0, 100, 100)
+    assert list(raster._tiles.keys()) == [(0, -4, -1), (0, 100, 100)]
+    reloaded = raster.get_tile(0, 3, 0)
+    assert reloaded is not first
+    np.testing.assert_array_equal(reloaded, first)
+
+@pytest.mark.parametrize("location_2d, rotation_yaw", POSES)
+@pytest.mark.parametrize("width_world, expected_level", [(10.0, 0), (40.0, 2)])
+def test_tiled_crop_matches_reference(location_2d : np.ndarray, rotation_yaw : float, width_world : float, expected_level : int):
+    waypoints = wavy_waypoints()
+    raster = RoarPyTiledOccupancyRaster(waypoints, 0.125, num_levels=3, tile_size=64)
+    height_world = width_world * 0.75
+    out = np.full((60, 80), 99, dtype=np.uint8)
+    assert raster.crop(out, location_2d, rotation_yaw, width_world, height_world) is out
+    assert set(np.unique(out)) <= {0, 255}
+
+    level_mpp = raster.level_meters_per_pixel(expected_level)
+    affine = raster.pixel_to_world_affine(80, 60, width_world, height_world, location_2d, rotation_yaw) / level_mpp
+    # Reference grid of the selected level around the crop, cell (0, 0) of the grid is cell grid_origin of the level
+    grid_origin = np.floor(location_2d / level_mpp).astype(np.int64) - 128
+    grid = rasterize_quads_reference(waypoints.segment_quads / level_mpp - grid_origin, 256, 256)
+    affine[:, 2] -= grid_origin
+    np.testing.assert_array_equal(out > 0, sample_grid_reference(grid, affine, 60, 80))
+
+def test_tiled_tiles_are_persisted(monkeypatch):
+    waypoints = wavy_waypoints()
+    raster = RoarPyTiledOccupancyRaster(waypoints, 0.125, num_levels=2, tile_size=64, persist_tiles=True)
+    rendered = raster.get_tile(1, 1, -1)
+    assert rendered.any()
+
+    def fail_fill_quads(buffer, quads, value):
+        raise AssertionError("persisted tile rendered again")
+    monkeypatch.setattr(occupancy_raster, "fill_quads", fail_fill_quads)
+    loaded = RoarPyTiledOccupancyRaster(waypoints, 0.125, num_levels=2, tile_size=64, persist_tiles=True).get_tile(1, 1, -1)
+    np.testing.assert_array_equal(loaded, rendered)
+    with pytest.raises(AssertionError):
+        raster.get_tile(0, 3, 0)
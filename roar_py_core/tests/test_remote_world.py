@@ -0,0 +1,109 @@
+import numpy as np
+import typing
+from dataclasses import dataclass
+from serde import serde
+from serde.msgpack import from_msgpack, to_msgpack
+from roar_py_interface import RoarPyWorld, RoarPyWaypoint, RoarPyWaypointArray
+from roar_py_remote.worlds.remote_worlds import RoarPyRemoteServerWorldWrapper, RoarPyRemoteClientWorld, RoarPyRemoteWorldObsInfo, RoarPyRemoteWorldObsInfoRequest, RoarPyRemoteWorldInitInfo
+from conftest import circle_waypoints
+
+# Messages as sent / decoded by peers from before RoarPyWaypointArray
+@serde
+@dataclass
+class _LegacyWorldInitInfo:
+    maneuverable_waypoints: typing.Optional[typing.List[RoarPyWaypoint]]
+    comprehensive_waypoints: typing.Optional[typing.Dict[typing.Union[int, str, typing.Any], typing.List[RoarPyWaypoint]]]
+    is_asynchronous: bool
+
+@serde
+@dataclass
+class _LegacyWorldObsInfo:
+    init_info: typing.Optional[_LegacyWorldInitInfo]
+    stepped: bool
+    stepped_dt : float
+    actor_info_map : typing.Dict[int, typing.Any]
+    sensor_info_map : typing.Dict[int, typing.Any]
+    last_step_t : float
+
+@serde
+@dataclass
+class _LegacyWorldObsInfoRequest:
+    need_init_info: bool
+    step: bool
+    actor_request_map : typing.Dict[int, typing.Any]
+    sensor_request_map : typing.Dict[int, typing.Any]
+
+class _WaypointsWorld(RoarPyWorld):
+    def __init__(self):
+        self._maneuverable_waypoints = circle_waypoints(20)
+        self._comprehensive_waypoints = {3: circle_waypoints(5, 10.0), 7: circle_waypoints(6, 20.0)}
+
+    @property
+    def is_asynchronous(self):
+        return False
+
+    def get_actors(self):
+        return []
+
+    def get_sensors(self):
+        return []
+
+    @property
+    def maneuverable_waypoints(self):
+        return self._maneuverable_waypoints
+
+    @property
+    def comprehensive_waypoints(self):
+        return self._comprehensive_waypoints
+
+    @property
+    def last_tick_elapsed_seconds(self) -> float:
+        return 0.0
+
+def _assert_waypoints_equal(waypoints, expected : RoarPyWaypointArray):
+    waypoints = RoarPyWaypointArray.from_waypoints(waypoints)
+    np.testing.assert_allclose(waypoints.locations, expected.locations)
+    np.testing.assert_allclose(waypoints.roll_pitch_yaws, expected.roll_pitch_yaws)
+    np.testing.assert_allclose(waypoints.lane_widths, expected.lane_widths)
+
+def _server_reply(request_message : bytes) -> bytes:
+    server = RoarPyRemoteServerWorldWrapper(_WaypointsWorld())
+    server._depack_info(from_msgpack(RoarPyRemoteWorldObsInfoRequest, request_message, strict_map_key=False))
+    return to_msgpack(server._pack_info())
+
+def test_new_client_gets_waypoint_arrays():
+    world = _WaypointsWorld()
+    client = RoarPyRemoteClientWorld(from_msgpack(RoarPyRemoteWorldObsInfo, _server_reply(to_msgpack(RoarPyRemoteWorldObsInfoRequest(True, False, {}, {}, accepts_waypoint_arrays=True))), strict_map_key=False))
+    assert isinstance(client.maneuverable_waypoints, RoarPyWaypointArray)
+    _assert_waypoints_equal(client.maneuverable_waypoints, world.maneuverable_waypoints)
+    assert client.comprehensive_waypoints.keys() == world.comprehensive_waypoints.keys()
+    for key, waypoints in world.comprehensive_waypoints.items():
+        _assert_waypoints_equal(client.comprehensive_waypoints[key], waypoints)
+    # The client asks for the arrays, older servers ignore the flag and send waypoint lists
+    request_message = to_msgpack(client._pack_info())
+    assert from_msgpack(RoarPyRemoteWorldObsInfoRequest, request_message, strict_map_key=False).accepts_waypoint_arrays
+    assert from_msgpack(_LegacyWorldObsInfoRequest, request_message, strict_map_key=False).need_init_info is False
+
+def test_legacy_client_gets_waypoint_lists():
+    world = _WaypointsWorld()
+    reply = from_msgpack(_LegacyWorldObsInfo, _server_reply(to_msgpack(_LegacyWorldObsInfoRequest(True, False, {}, {}))), strict_map_key=False)
+    assert isinstance(reply.init_info.maneuverable_waypoints, list)
+    assert all(isinstance(waypoint, RoarPyWaypoint) for waypoint in reply.init_info.maneuverable_waypoints)
+    _assert_waypoints_equal(reply.init_info.maneuverable_waypoints, world.maneuverable_waypoints)
+    for key, waypoints in world.comprehensive_waypoints.items():
+        _assert_waypoints_equal(reply.init_info.comprehensive_waypoints[key], waypoints)
+
+def test_new_client_decodes_legacy_server():
+    world = _WaypointsWorld()
+    legacy_reply = _LegacyWorldObsInfo(
+        _LegacyWorldInitInfo(list(world.maneuverable_waypoints), {key: list(value) for key, value in world.comprehensive_waypoints.items()}, False),
+        False, 0.0, {}, {}, 0.0
+    )
+    info = from_msgpack(RoarPyRemoteWorldObsInfo, to_msgpack(legacy_reply), strict_map_key=False)
+    assert isinstance(info.init_info, RoarPyRemoteWorldInitInfo) and info.init_info.maneuverable_waypoint_array is None
+    client = RoarPyRemoteClientWorld(info)
+    assert isinstance(client.maneuverable_waypoints, RoarPyWaypointArray)
+    _assert_waypoints_equal(client.maneuverable_waypoints, world.maneuverable_waypoints)
+    for key, waypoints in world.comprehensive_waypoints.items():
+        assert isinstance(client.comprehensive_waypoints[key], RoarPyWaypointArray)
+        _assert_waypoints_equal(client.comprehensive_waypoints[key], waypoints)
@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+from roar_py_interface import RoarPyRemoteSupportedSensorSerializationScheme
+from roar_py_interface.sensors.camera_sensor import RoarPyCameraSensorDataSemanticSegmentation, RoarPyCameraSensorDataInstanceSegmentation
+
+SCHEME = RoarPyRemoteSupportedSensorSerializationScheme.MSGPACK_COMPRESSED
+
+def _label_color_map(labels) -> dict:
+    rng = np.random.default_rng(0)
+    return {int(label): (rng.integers(0, 256, 3).astype(np.uint8), "class_{}".format(label)) for label in labels}
+
+def _semantic_data(dtype = np.uint8, num_labels : int = 23) -> RoarPyCameraSensorDataSemanticSegmentation:
+    labels = np.random.default_rng(1).integers(0, num_labels, (24, 32, 1)).astype(dtype)
+    # Label 5 has no color, label num_labels - 1 is the largest one in the frame
+    return RoarPyCameraSensorDataSemanticSegmentation(labels, _label_color_map(label for label in range(num_labels - 1) if label != 5))
+
+@pytest.mark.parametrize("dtype, num_labels", [(np.uint8, 23), (np.uint16, 300)])
+def test_colorize_matches_per_pixel_lookup(dtype, num_labels : int):
+    data = _semantic_data(dtype, num_labels)
+    image = np.asarray(data.get_image())
+    assert image.shape == (24, 32, 3) and image.dtype == np.uint8
+    for y in range(24):
+        for x in range(32):
+            label = int(data.image_ss[y, x, 0])
+            expected = data.ss_label_color_map[label][0] if label in data.ss_label_color_map else np.zeros(3, dtype=np.uint8)
+            np.testing.assert_array_equal(image[y, x], expected)
+
+def test_class_mask_and_one_hot():
+    data = _semantic_data()
+    assert data.num_classes == 22
+    for label in (0, 5, 21, 22, 200):
+        np.testing.assert_array_equal(data.get_class_mask(label), [[pixel[0] == label for pixel in row] for row in data.image_ss])
+
+    one_hot = data.to_one_hot()
+    assert one_hot.shape == (24, 32, 22) and one_hot.dtype == np.uint8
+    for label in range(22):
+        np.testing.assert_array_equal(one_hot[:, :, label], data.get_class_mask(label))
+    # Labels beyond num_classes have no channel
+    np.testing.assert_array_equal(one_hot.sum(axis=2), data.image_ss[:, :, 0] < 22)
+    assert data.to_one_hot(30).shape == (24, 32, 30)
+
+@pytest.mark.parametrize("dtype, num_labels", [(np.uint8, 23), (np.uint16, 300)])
+def test_semantic_round_trip(dtype, num_labels : int):
+    data = _semantic_data(dtype, num_labels)
+    spec = data.get_gym_observation_spec()
+    assert spec.dtype == dtype and spec.contains(data.to_gym())
+
+    decoded = RoarPyCameraSensorDataSemanticSegmentation.from_data(data.to_data(SCHEME), SCHEME)
+    assert decoded.image_ss.dtype == dtype
+    np.testing.assert_array_equal(decoded.image_ss, data.image_ss)
+    assert decoded.ss_label_color_map.keys() == data.ss_label_color_map.keys()
+    for label, (color, name) in data.ss_label_color_map.items():
+        np.testing.assert_array_equal(decoded.ss_label_color_map[label][0], color)
+        assert decoded.ss_label_color_map[label][1] == name
+    np.testing.assert_array_equal(np.asarray(decoded.get_image()), np.asarray(data.get_image()))
+
+def _instance_data() -> RoarPyCameraSensorDataInstanceSegmentation:
+    # Rectangles of random objects painted over each other on a background of id 0, with sparse and large ids
+    rng = np.random.default_rng(2)
+    image_ss = np.zeros((40, 50, 1), dtype=np.uint8)
+    image_instance = np.zeros((40, 50, 1), dtype=np.uint16)
+    for instance_id in rng.choice(np.arange(1, 65536), 12, replace=False):
+        x0, y0 = rng.integers(0, 45), rng.integers(0, 35)
+        x1, y1 = x0 + rng.integers(1, 20), y0 + rng.integers(1, 20)
+        image_instance[y0:y1, x0:x1] = instance_id
+        image_ss[y0:y1, x0:x1] = rng.integers(1, 23)
+    return RoarPyCameraSensorDataInstanceSegmentation(image_ss, _label_color_map(range(23)), image_instance)
+
+def test_instances_match_per_instance_reference():
+    data = _instance_data()
+    instance_ids, labels, pixel_counts, bounding_boxes = data.get_instances()
+    np.testing.assert_array_equal(instance_ids, np.unique(data.image_instance))
+    np.testing.assert_array_equal(data.get_instance_pixel_counts()[0], instance_ids)
+    np.testing.assert_array_equal(data.get_instance_pixel_counts()[1], pixel_counts)
+    for instance_id, label, pixel_count, bounding_box in zip(instance_ids, labels, pixel_counts, bounding_boxes):
+        mask = data.get_instance_mask(instance_id)
+        np.testing.assert_array_equal(mask, data.image_instance[:, :, 0] == instance_id)
+        rows, columns = np.nonzero(mask)
+        assert pixel_count == len(rows)
+        np.testing.assert_array_equal(bounding_box, [columns.min(), rows.min(), columns.max(), rows.max()])
+        # Every pixel of an object carries the object's label
+        assert np.all(data.image_ss[:, :, 0][mask] == label)
+
+def test_instance_round_trip():
+    data = _instance_data()
+    gym_obs = data.to_gym()
+    assert gym_obs.shape == (40, 50, 2)
+    assert data.get_gym_observation_spec().contains(gym_obs)
+    np.testing.assert_array_equal(gym_obs[:, :, 0], data.image_ss[:, :, 0])
+    np.testing.assert_array_equal(gym_obs[:, :, 1], data.image_instance[:, :, 0])
+
+    decoded = RoarPyCameraSensorDataInstanceSegmentation.from_data(data.to_data(SCHEME), SCHEME)
+    assert decoded.image_ss.dtype == np.uint8 and decoded.image_instance.dtype == np.uint16
+    np.testing.assert_array_equal(decoded.image_ss, data.image_ss)
+    np.testing.assert_array_equal(decoded.image_instance, data.image_instance)
+    assert decoded.ss_label_color_map.keys() == data.ss_label_color_map.keys()
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+from roar_py_interface import RoarPyWaypoint, RoarPyWaypointArray
+
+@pytest.fixture
+def random_waypoints() -> RoarPyWaypointArray:
+    rng = np.random.default_rng(0)
+    return RoarPyWaypointArray(
+        rng.uniform(-100, 100, (50, 3)),
+        rng.uniform(-np.pi, np.pi, (50, 3)),
+        rng.uniform(2, 5, 50)
+    )
+
+def test_indexing_returns_views(random_waypoints : RoarPyWaypointArray):
+    waypoint = random_waypoints[3]
+    assert isinstance(waypoint, RoarPyWaypoint)
+    assert np.shares_memory(waypoint.location, random_waypoints.locations)
+    assert waypoint.lane_width == pytest.approx(random_waypoints.lane_widths[3])
+
+    sliced = random_waypoints[10:20]
+    assert isinstance(sliced, RoarPyWaypointArray)
+    assert len(sliced) == 10
+    assert np.shares_memory(sliced.locations, random_waypoints.locations)
+    assert sliced[0] == random_waypoints[10]
+
+def test_behaves_like_a_list(random_waypoints : RoarPyWaypointArray):
+    waypoint_list = random_waypoints.to_list()
+    assert len(waypoint_list) == len(random_waypoints)
+    assert all(a == b for a, b in zip(waypoint_list, random_waypoints))
+    assert RoarPyWaypointArray.from_waypoints(waypoint_list) == random_waypoints
+    assert len(RoarPyWaypointArray.from_waypoints([])) == 0
+
+def test_line_representations_match_waypoints(random_waypoints : RoarPyWaypointArray):
+    line_pos, line_neg = random_waypoints.line_representations
+    for i, waypoint in enumerate(random_waypoints.to_list()):
+        expected_pos, expected_neg = waypoint.line_representation
+        np.testing.assert_allclose(line_pos[i], expected_pos, atol=1e-9)
+        np.testing.assert_allclose(line_neg[i], expected_neg, atol=1e-9)
+
+def test_segment_quads_wrap_around(random_waypoints : RoarPyWaypointArray):
+    quads = random_waypoints.segment_quads
+    assert quads.shape == (len(random_waypoints), 4, 2)
+    for i in (0, len(random_waypoints) - 1):
+        p1, p2 = random_waypoints[i].line_representation
+        p3, p4 = random_waypoints[(i + 1) % len(random_waypoints)].line_representation
+        # Same corner order as RoarPyWaypoint.distance_to_waypoint_polygon
+        np.testing.assert_allclose(quads[i], np.stack([p1[:2], p2[:2], p4[:2], p3[:2]]), atol=1e-9)
+
+def test_concatenate(random_waypoints : RoarPyWaypointArray):
+    concatenated = RoarPyWaypointArray.concatenate([random_waypoints[:20], random_waypoints[20:].to_list()])
+    assert concatenated == random_waypoints
+
+def test_save_and_load_dir(random_waypoints : RoarPyWaypointArray, tmp_path):
+    RoarPyWaypointArray.save_waypoint_dir(random_waypoints, str(tmp_path))
+    loaded = RoarPyWaypointArray.load_waypoint_dir(str(tmp_path))
+    assert loaded == random_waypoints
+    # Memory mapped read-only by default
+    assert not loaded.locations.flags.writeable
+    assert RoarPyWaypointArray.load_waypoint_dir(str(tmp_path), mmap_mode=None).locations.flags.writeable
+
+def test_save_and_load_list(random_waypoints : RoarPyWaypointArray):
+    waypoint_dict = RoarPyWaypoint.save_waypoint_list(random_waypoints.to_list())
+    assert RoarPyWaypointArray.load_waypoint_list(waypoint_dict) == random_waypoints
+    assert RoarPyWaypoint.load_waypoint_list(waypoint_dict) == random_waypoints.to_list()
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+from roar_py_interface import RoarPyWaypoint, RoarPyWaypointsTracker
+from roar_py_interface.worlds.waypoint import RoarPyWaypointsProjection
+
+@pytest.fixture
+def square_tracker() -> RoarPyWaypointsTracker:
+    # 10m x 10m square track, every waypoint has its own lane width so that the interpolation direction shows
+    return RoarPyWaypointsTracker([
+        RoarPyWaypoint(np.array([0.0, 0.0, 0.0]), np.array([0.0, 0.0, 0.0]), 2.0),
+        RoarPyWaypoint(np.array([10.0, 0.0, 0.0]), np.array([0.0, 0.0, np.pi / 2]), 4.0),
+        RoarPyWaypoint(np.array([10.0, 10.0, 0.0]), np.array([0.0, 0.0, np.pi / 2]), 6.0),
+        RoarPyWaypoint(np.array([0.0, 10.0, 0.0]), np.array([0.0, 0.0, np.pi / 2]), 8.0),
+    ])
+
+@pytest.mark.parametrize("waypoint_idx, distance_from_waypoint, location, lane_width", [
+    # Distance 0 is the waypoint itself
+    (0, 0.0, [0.0, 0.0], 2.0),
+    (2, 0.0, [10.0, 10.0], 6.0),
+    # alpha = distance_from_waypoint / segment length goes from the waypoint (alpha 0) to the next one (alpha 1)
+    (0, 2.5, [2.5, 0.0], 2.5),
+    (1, 5.0, [10.0, 5.0], 5.0),
+    (0, 10.0, [10.0, 0.0], 4.0),
+    # The last segment goes back to the first waypoint
+    (3, 7.5, [0.0, 2.5], 3.5),
+])
+def test_interpolated_waypoint_alpha_convention(square_tracker : RoarPyWaypointsTracker, waypoint_idx : int, distance_from_waypoint : float, location, lane_width : float):
+    waypoint = square_tracker.get_interpolated_waypoint(RoarPyWaypointsProjection(waypoint_idx, distance_from_waypoint))
+    np.testing.assert_allclose(waypoint.location[:2], location, atol=1e-9)
+    assert waypoint.lane_width == pytest.approx(lane_width)
+
+def test_interpolate_weights_the_first_waypoint_by_alpha(square_tracker : RoarPyWaypointsTracker):
+    first, second = square_tracker.waypoints[0], square_tracker.waypoints[1]
+    waypoint = RoarPyWaypoint.interpolate(first, second, 0.75)
+    np.testing.assert_allclose(waypoint.location, [2.5, 0.0, 0.0])
+    assert waypoint.lane_width == pytest.approx(2.5)
+    assert waypoint.roll_pitch_yaw[2] == pytest.approx(np.pi / 8)
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+from roar_py_interface import RoarPyWaypoint, RoarPyWaypointArray
+from roar_py_interface.worlds.waypoint_spatial_index import RoarPyWaypointsSpatialIndex
+from conftest import circle_waypoints
+
+def _wavy_track() -> RoarPyWaypointArray:
+    # Circle with a radial wobble and varying lane widths, so segments differ in size and orientation
+    track = circle_waypoints(300, 80.0)
+    angles = np.linspace(0.0, 2 * np.pi, len(track), endpoint=False)
+    locations = track.locations * (1.0 + 0.2 * np.sin(5 * angles))[:, np.newaxis]
+    return RoarPyWaypointArray(locations, track.roll_pitch_yaws, 3.0 + np.cos(3 * angles))
+
+def _brute_force_distances(waypoints : RoarPyWaypointArray, point : np.ndarray) -> np.ndarray:
+    waypoint_list = waypoints.to_list()
+    return np.array([
+        RoarPyWaypoint.distance_to_waypoint_polygon(waypoint_list[i], waypoint_list[(i + 1) % len(waypoint_list)], point)
+        for i in range(len(waypoint_list))
+    ])
+
+@pytest.mark.parametrize("cell_size", [None, 0.5, 40.0])
+def test_nearest_segment_matches_brute_force(cell_size):
+    waypoints = _wavy_track()
+    index = RoarPyWaypointsSpatialIndex(waypoints.segment_quads, cell_size)
+    rng = np.random.default_rng(1)
+    # Points on and around the track as well as far outside of the grid
+    points = np.concatenate([
+        waypoints.locations[rng.integers(0, len(waypoints), 20), :2] + rng.normal(0, 3, (20, 2)),
+        rng.uniform(-400, 400, (10, 2))
+    ])
+    for point in points:
+        expected = _brute_force_distances(waypoints, point)
+        segment, distance = index.nearest_segment(point)
+        assert distance == pytest.approx(expected.min(), abs=1e-6)
+        assert expected[segment] == pytest.approx(expected.min(), abs=1e-6)
+
+def test_nearest_segments_tolerance():
+    waypoints = _wavy_track()
+    index = waypoints.spatial_index
+    point = waypoints.locations[42, :2] + np.array([0.3, -0.2])
+    expected = _brute_force_distances(waypoints, point)
+    segments, distance = index.nearest_segments(point, tolerance=2.0)
+    np.testing.assert_array_equal(segments, np.flatnonzero(expected <= expected.min() + 2.0))
+    assert distance == pytest.approx(expected.min(), abs=1e-6)
+
+@pytest.mark.parametrize("cell_size", [None, 2.0])
+def test_query_box_matches_brute_force(cell_size):
+    waypoints = _wavy_track()
+    index = RoarPyWaypointsSpatialIndex.from_waypoints(waypoints, cell_size)
+    bbox_min, bbox_max = waypoints.segment_quads.min(axis=1), waypoints.segment_quads.max(axis=1)
+    rng = np.random.default_rng(2)
+    for _ in range(30):
+        box_min = rng.uniform(-120, 100, 2)
+        box_max = box_min + rng.uniform(0, 60, 2)
+        expected = np.flatnonzero(np.all((bbox_min <= box_max) & (bbox_max >= box_min), axis=1))
+        np.testing.assert_array_equal(index.query_box(box_min, box_max), expected)
+    assert len(index.query_box(np.array([1000.0, 1000.0]), np.array([1001.0, 1001.0]))) == 0
+
+def test_spatial_index_is_cached_on_the_array(circle_track : RoarPyWaypointArray):
+    assert circle_track.spatial_index is circle_track.spatial_index
+    assert len(circle_track.spatial_index) == len(circle_track)
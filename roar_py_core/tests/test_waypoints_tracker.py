@@ -0,0 +1,157 @@
+import numpy as np
+import pytest
+from roar_py_interface import RoarPyWaypoint, RoarPyWaypointsTracker, RoarPyWaypointArray
+from roar_py_interface.worlds.waypoint import RoarPyWaypointsProjection
+from conftest import circle_waypoints
+
+@pytest.fixture
+def track() -> RoarPyWaypointArray:
+    # Uneven waypoint spacing, so that arc lengths differ from index * spacing
+    waypoints = circle_waypoints(120, 40.0)
+    angles = np.linspace(0.0, 2 * np.pi, len(waypoints), endpoint=False)
+    angles = angles + 0.02 * np.sin(3 * angles)
+    return RoarPyWaypointArray(
+        np.stack([40.0 * np.cos(angles), 40.0 * np.sin(angles), np.zeros_like(angles)], axis=1),
+        np.stack([np.zeros_like(angles), np.zeros_like(angles), angles + np.pi / 2], axis=1),
+        waypoints.lane_widths
+    )
+
+def _segment_distance(track : RoarPyWaypointArray, segment : int, point : np.ndarray) -> float:
+    # Reference: distance to the polygon spanned by the two waypoints of the segment
+    return RoarPyWaypoint.distance_to_waypoint_polygon(track[segment], track[(segment + 1) % len(track)], point[:2])
+
+def _walk_forward(tracker : RoarPyWaypointsTracker, waypoint_idx : int, distance_from_waypoint : float, distance : float):
+    # Reference: step segment by segment around the closed track
+    segment_lengths = np.linalg.norm(np.roll(tracker.waypoints.locations, -1, axis=0) - tracker.waypoints.locations, axis=1)
+    remaining = distance_from_waypoint + distance
+    idx = waypoint_idx
+    while remaining < 0:
+        idx = (idx - 1) % len(segment_lengths)
+        remaining += segment_lengths[idx]
+    while remaining >= segment_lengths[idx]:
+        remaining -= segment_lengths[idx]
+        idx = (idx + 1) % len(segment_lengths)
+    return idx, remaining
+
+def test_windowed_trace_matches_global_lookup(track : RoarPyWaypointArray):
+    tracker = RoarPyWaypointsTracker(track)
+    assert tracker.search_radius == RoarPyWaypointsTracker.DEFAULT_SEARCH_RADIUS
+    rng = np.random.default_rng(0)
+    traced_idx = 0
+    for i in range(3 * len(track)):
+        segment = i % len(track)
+        point = (track.locations[segment] + track.locations[(segment + 1) % len(track)]) / 2 + np.append(rng.normal(0, 0.5, 2), 0.0)
+        windowed = tracker.trace_point(point, traced_idx)
+        global_lookup = tracker.trace_point(point, traced_idx, search_radius=None)
+        assert windowed.waypoint_idx == global_lookup.waypoint_idx
+        # The noise may push the point into a neighbouring segment, but never outside of the traced one
+        assert abs((windowed.waypoint_idx - segment + 1) % len(track) - 1) <= 1
+        assert _segment_distance(track, windowed.waypoint_idx, point) == 0.0
+        assert windowed.distance_from_waypoint == pytest.approx(global_lookup.distance_from_waypoint)
+        traced_idx = windowed.waypoint_idx
+
+def test_window_wraps_around_the_track_end(track : RoarPyWaypointArray):
+    tracker = RoarPyWaypointsTracker(track, search_radius=4)
+    point = (track.locations[1] + track.locations[2]) / 2
+    assert tracker.trace_point(point, len(track) - 1).waypoint_idx == 1
+    point = (track.locations[-2] + track.locations[-1]) / 2
+    assert tracker.trace_point(point, 1).waypoint_idx == len(track) - 2
+
+def test_point_outside_the_window_is_relocalized(track : RoarPyWaypointArray):
+    tracker = RoarPyWaypointsTracker(track, search_radius=2)
+    point = (track.locations[60] + track.locations[61]) / 2
+    assert tracker.trace_point(point, 0).waypoint_idx == 60
+    assert tracker.trace_point(point, None).waypoint_idx == 60
+
+def test_trace_points_matches_trace_point(track : RoarPyWaypointArray):
+    tracker = RoarPyWaypointsTracker(track, search_radius=8)
+    rng = np.random.default_rng(1)
+    segments = rng.integers(0, len(track), 40)
+    points = track.locations[segments] + np.concatenate([rng.normal(0, 1.0, (40, 2)), np.zeros((40, 1))], axis=1)
+    start_idx = (segments + rng.integers(-20, 20, 40)) % len(track)
+    batched = tracker.trace_points(points, start_idx)
+    for i in range(len(points)):
+        single = tracker.trace_point(points[i], int(start_idx[i]))
+        assert batched.waypoint_idx[i] == single.waypoint_idx
+        assert batched.distance_from_waypoint[i] == pytest.approx(single.distance_from_waypoint)
+    unknown_start = tracker.trace_points(points)
+    np.testing.assert_array_equal(unknown_start.waypoint_idx, [tracker.trace_point(point, None).waypoint_idx for point in points])
+
+@pytest.mark.parametrize("waypoint_idx, distance", [(0, 5.0), (0, -0.5), (118, 7.3), (119, 0.1), (3, -10.0), (50, 1000.0), (50, -1000.0)])
+def test_trace_forward_projection_wraps_around(track : RoarPyWaypointArray, waypoint_idx : int, distance : float):
+    tracker = RoarPyWaypointsTracker(track)
+    projection = tracker.trace_forward_projection(RoarPyWaypointsProjection(waypoint_idx, 0.2), distance)
+    expected_idx, expected_distance = _walk_forward(tracker, waypoint_idx, 0.2, distance)
+    assert projection.waypoint_idx == expected_idx
+    assert projection.distance_from_waypoint == pytest.approx(expected_distance, abs=1e-6)
+
+def test_trace_forward_projections_matches_scalar(track : RoarPyWaypointArray):
+    tracker = RoarPyWaypointsTracker(track)
+    projection_idx = np.array([0, 57, 119])
+    projection_distance = np.array([0.0, 0.7, 1.1])
+    distances = np.array([-30.0, 0.0, 2.5, 300.0])
+    batched = tracker.trace_forward_projections(projection_idx, projection_distance, distances)
+    assert batched.waypoint_idx.shape == (3, 4)
+    for i in range(3):
+        for j in range(4):
+            single = tracker.trace_forward_projection(RoarPyWaypointsProjection(projection_idx[i], projection_distance[i]), distances[j])
+            assert batched.waypoint_idx[i, j] == single.waypoint_idx
+            assert batched.distance_from_waypoint[i, j] == pytest.approx(single.distance_from_waypoint)
+
+    interpolated = tracker.get_interpolated_waypoints(batched)
+    assert len(interpolated) == 12
+    for k, (i, j) in enumerate(np.ndindex(3, 4)):
+        assert interpolated[k] == tracker.get_interpolated_waypoint(RoarPyWaypointsProjection(batched.waypoint_idx[i, j], batched.distance_from_waypoint[i, j]))
+
+def test_delta_distance_takes_the_short_way_around(track : RoarPyWaypointArray):
+    tracker = RoarPyWaypointsTracker(track)
+    perimeter = np.sum(np.linalg.norm(np.roll(track.locations, -1, axis=0) - track.locations, axis=1))
+    end = RoarPyWaypointsProjection(len(track) - 1, 0.0)
+    start = RoarPyWaypointsProjection(1, 0.0)
+    forward = tracker.delta_distance_projection(end, start)
+    assert 0 < forward < perimeter / 2
+    assert tracker.delta_distance_projection(start, end) == pytest.approx(-forward)
+    assert tracker.total_distance_from_first_waypoint(tracker.trace_forward_projection(RoarPyWaypointsProjection(0, 0.0), perimeter)) == pytest.approx(0.0, abs=1e-6)
+
+def _interpolation_reference(tracker : RoarPyWaypointsTracker, waypoint_idx : int, alpha : float) -> RoarPyWaypoint:
+    # Reference: the scalar interpolation between the waypoint and the next one, weighting the next one by alpha
+    waypoints = tracker.waypoints
+    return RoarPyWaypoint.interpolate(waypoints[(waypoint_idx + 1) % len(waypoints)], waypoints[waypoint_idx], alpha)
+
+@pytest.mark.parametrize("waypoint_idx, alpha", [
+    (0, 0.0), (0, 1.0), (0, 0.5),
+    (57, 0.0), (57, 0.25), (57, 0.5), (57, 1.0),
+    # The last segment closes the loop, from the last waypoint back to the first one
+    (119, 0.0), (119, 0.5), (119, 0.9), (119, 1.0),
+])
+def test_interpolated_waypoints_match_waypoint_interpolate(track : RoarPyWaypointArray, waypoint_idx : int, alpha : float):
+    # Varying lane widths, so that swapping the two ends of a segment shows up
+    track = RoarPyWaypointArray(track.locations, track.roll_pitch_yaws, np.linspace(3.0, 6.0, len(track)))
+    tracker = RoarPyWaypointsTracker(track)
+    segment_length = np.linalg.norm(track.locations[(waypoint_idx + 1) % len(track)] - track.locations[waypoint_idx])
+    projection = RoarPyWaypointsProjection(waypoint_idx, alpha * segment_length)
+    expected = _interpolation_reference(tracker, waypoint_idx, alpha)
+
+    assert tracker.get_interpolated_waypoint(projection) == expected
+    batched = tracker.get_interpolated_waypoints(RoarPyWaypointsProjection(np.array([waypoint_idx]), np.array([alpha * segment_length])))
+    assert len(batched) == 1
+    assert batched[0] == expected
+
+def test_interpolated_waypoints_across_the_wrap(track : RoarPyWaypointArray):
+    track = RoarPyWaypointArray(track.locations, track.roll_pitch_yaws, np.linspace(3.0, 6.0, len(track)))
+    tracker = RoarPyWaypointsTracker(track)
+    segment_lengths = np.linalg.norm(np.roll(track.locations, -1, axis=0) - track.locations, axis=1)
+    # Trace from the middle of the second to last segment, over the end of the track and into the first segments
+    distances = np.linspace(0.0, segment_lengths[-2:].sum() + segment_lengths[:2].sum(), 17)
+    projections = tracker.trace_forward_projections(np.array([118]), np.array([segment_lengths[118] / 2]), distances)
+    interpolated = tracker.get_interpolated_waypoints(projections)
+    assert len(interpolated) == len(distances)
+    assert set(projections.waypoint_idx[0]) >= {119, 0}
+
+    for k, (waypoint_idx, distance_from_waypoint) in enumerate(zip(projections.waypoint_idx[0], projections.distance_from_waypoint[0])):
+        expected = _interpolation_reference(tracker, waypoint_idx, distance_from_waypoint / segment_lengths[waypoint_idx])
+        assert interpolated[k] == expected
+        assert tracker.get_interpolated_waypoint(RoarPyWaypointsProjection(waypoint_idx, distance_from_waypoint)) == expected
+    # The end of the last segment is the first waypoint
+    end_of_loop = tracker.get_interpolated_waypoints(RoarPyWaypointsProjection(np.array([119]), np.array([segment_lengths[119]])))
+    assert end_of_loop[0] == track[0]